@@ -0,0 +1,55 @@
+"""Times importing each module of the package, and loading the Don Quixote test model from its
+Mallet output files, each in a fresh interpreter (the startup cost of a short filtering job).
+Exits with status 1 if any median time exceeds max_seconds, to catch import time regressions.
+
+Usage: python import_benchmark.py [runs] [max_seconds]"""
+import os
+import statistics
+import subprocess
+import sys
+
+WHEAT_FILTRATION = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "wheat_filtration")
+TEST_FILES = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "test", "test_files")
+
+LOAD_MODEL = """mallet.TopicModel(
+    "{0}/quixote.txt", "{0}/mallet_outputs/dq_doc_topics.txt",
+    "{0}/mallet_outputs/dq_topic_wordcounts.txt", "{0}/mallet_outputs/split_quixote.mallet",
+    "{0}/split_quixote.txt")""".format(TEST_FILES)
+
+# (name, setup statements, timed statements)
+CASES = [(module, "", "import " + module)
+         for module in ["munge", "keywords", "inference", "mallet", "filter", "server", "sweep"]] + \
+    [("load Mallet outputs", "import mallet", LOAD_MODEL)]
+
+TIMER = """import time
+{}
+start = time.perf_counter()
+{}
+print(time.perf_counter() - start)"""
+
+
+def time_fresh(setup, statements):
+    output = subprocess.run([sys.executable, "-c", TIMER.format(setup, statements)],
+                            env=dict(os.environ, PYTHONPATH=WHEAT_FILTRATION),
+                            stdout=subprocess.PIPE, check=True).stdout
+    return float(output.decode("utf-8").split()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    max_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    too_slow = []
+    for name, setup, statements in CASES:
+        seconds = statistics.median(time_fresh(setup, statements) for _ in range(runs))
+        print("{}: {:.3f}s".format(name, seconds))
+        if max_seconds is not None and seconds > max_seconds:
+            too_slow.append(name)
+    if too_slow:
+        print("slower than {}s: {}".format(max_seconds, ", ".join(too_slow)))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
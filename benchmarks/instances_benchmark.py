@@ -0,0 +1,51 @@
+"""Compares reading a Mallet instance list file directly (instances.load_document_store)
+with printing it through "mallet info --print-instances" (the Mallet command line path).
+
+Usage: python instances_benchmark.py [mallet_instance_filepath] [path_to_mallet]"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "wheat_filtration"))
+
+from docstore import DocumentStore  # noqa: E402
+import instances  # noqa: E402
+import util  # noqa: E402
+
+TEST_FILES = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "test", "test_files")
+
+
+def time_native(mallet_instance_filepath):
+    start = time.perf_counter()
+    docs = instances.load_document_store(mallet_instance_filepath, [])
+    return time.perf_counter() - start, docs
+
+
+def time_mallet_info(mallet_instance_filepath, path_to_mallet):
+    start = time.perf_counter()
+    command = "{} info --input {} --print-instances".format(path_to_mallet,
+                                                            mallet_instance_filepath)
+    doc_ids, doc_tokens = instances.read_printed_instances(
+        util.stream_command_line(command))
+    docs = DocumentStore.from_token_lists(doc_ids, doc_tokens)
+    return time.perf_counter() - start, docs
+
+
+if __name__ == "__main__":
+    mallet_instance_filepath = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        TEST_FILES, "mallet_outputs", "split_quixote.mallet")
+    path_to_mallet = sys.argv[2] if len(sys.argv) > 2 else "mallet"
+
+    native_seconds, docs = time_native(mallet_instance_filepath)
+    print("native reader:  {:.3f}s ({} docs, {} tokens)".format(
+        native_seconds, len(docs), len(docs.token_ids)))
+    try:
+        info_seconds, info_docs = time_mallet_info(
+            mallet_instance_filepath, path_to_mallet)
+    except OSError:
+        print("mallet info:    skipped, {} not found".format(path_to_mallet))
+    else:
+        print("mallet info:    {:.3f}s ({} docs, same documents: {})".format(
+            info_seconds, len(info_docs), list(docs.items()) == list(info_docs.items())))
@@ -0,0 +1,41 @@
+"""Times munge.sentences_to_doc_tokens on synthetic corpora of increasing size, to check
+that document splitting scales linearly with the number of words. Each size is run once
+with regular sentences and once as a single sentence-less run of words.
+
+Usage: python munge_benchmark.py [max_million_words]"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "wheat_filtration"))
+
+import munge  # noqa: E402
+
+SENTENCE = "the great big whale splashed the timid blue fox and swam away."
+
+
+def regular_sentences(n_words):
+    n_sentence_words = len(SENTENCE.split())
+    for _ in range(n_words // n_sentence_words):
+        yield SENTENCE
+
+
+def sentenceless_run(n_words):
+    yield "whale " * n_words
+    yield "fox."
+
+
+if __name__ == "__main__":
+    max_million_words = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    million_words = 1
+    while million_words <= max_million_words:
+        n_words = million_words * 10**6
+        for name, sentences in [("sentences", regular_sentences), ("no sentences", sentenceless_run)]:
+            start = time.perf_counter()
+            n_docs = sum(
+                1 for _ in munge.sentences_to_doc_tokens(sentences(n_words)))
+            seconds = time.perf_counter() - start
+            print("{:>4}M words, {:<12}: {:7.3f}s ({:.3f}s per million words, {} docs)".format(
+                million_words, name, seconds, seconds / million_words, n_docs))
+        million_words *= 2
@@ -0,0 +1,35 @@
+"""Times munge.corpus_to_doc_tokens on a directory corpus with increasing numbers of
+worker processes, and checks that the documents match the serial path.
+
+Usage: python parallel_munge_benchmark.py corpus_directory [max_processes]"""
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "wheat_filtration"))
+
+import munge  # noqa: E402
+
+
+if __name__ == "__main__":
+    corpus_directory = sys.argv[1]
+    max_processes = int(sys.argv[2]) if len(
+        sys.argv) > 2 else multiprocessing.cpu_count()
+
+    start = time.perf_counter()
+    serial_docs = munge.corpus_to_doc_tokens(corpus_directory)
+    serial_seconds = time.perf_counter() - start
+    print("serial:      {:8.2f}s ({} docs)".format(
+        serial_seconds, len(serial_docs)))
+
+    processes = 2
+    while processes <= max_processes:
+        start = time.perf_counter()
+        docs = munge.corpus_to_doc_tokens(
+            corpus_directory, processes=processes)
+        seconds = time.perf_counter() - start
+        print("{:3} processes: {:8.2f}s (speedup {:.1f}x, same documents: {})".format(
+            processes, seconds, serial_seconds / seconds, docs == serial_docs))
+        processes *= 2
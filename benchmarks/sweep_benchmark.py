@@ -0,0 +1,46 @@
+"""Compares choosing the number of topics by constructing mallet.TopicModel once per candidate,
+one after another, with sweep.sweep_topic_models, which preprocesses the corpus once and trains
+the candidates in parallel worker processes.
+
+Usage: python sweep_benchmark.py [backend] [processes] [num_topics ...]"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "wheat_filtration"))
+
+import mallet  # noqa: E402
+import sweep  # noqa: E402
+
+TEST_FILES = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "test", "test_files")
+
+
+def time_sequential(corpus_filepath, backend, candidates):
+    start = time.perf_counter()
+    for num_topics in candidates:
+        mallet.TopicModel(corpus_filepath, num_topics=num_topics, backend=backend)
+    return time.perf_counter() - start
+
+
+def main():
+    backend = sys.argv[1] if len(sys.argv) > 1 else "gibbs"
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    candidates = [int(arg) for arg in sys.argv[3:]] or [5, 10, 15, 20]
+    corpus_filepath = os.path.join(TEST_FILES, "quixote.txt")
+
+    sequential_seconds = time_sequential(corpus_filepath, backend, candidates)
+    print("sequential TopicModel: {:.2f}s".format(sequential_seconds))
+    result = sweep.sweep_topic_models(corpus_filepath, candidates, backend=backend,
+                                      processes=processes)
+    print("sweep: {:.2f}s ({:.2f}s preprocessing)".format(result["wall_seconds"],
+                                                          result["preprocess_seconds"]))
+    for model_result in result["models"]:
+        print("  num_topics={}: {:.2f}s training, log likelihood {:.3f}, coherence {:.3f}".format(
+            model_result["settings"]["num_topics"], model_result["train_seconds"],
+            model_result["log_likelihood"], model_result["coherence"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Times training a topic model on Don Quixote with each training backend of mallet.TopicModel,
+in tokens per second. The "mallet" backend is skipped if Mallet cannot be found.
+
+Usage: python training_benchmark.py [num_topics] [iterations]"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "wheat_filtration"))
+
+import mallet  # noqa: E402
+
+TEST_FILES = os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), "..", "test", "test_files")
+
+# keyword arguments of each backend for the given number of iterations
+BACKEND_KWARGS = {
+    "mallet": lambda iterations: {"iterations": iterations},
+    "gensim": lambda iterations: {"iterations": iterations, "passes": 10},
+    "gibbs": lambda iterations: {"iterations": iterations},
+}
+
+
+def time_backend(backend, num_topics, iterations):
+    start = time.perf_counter()
+    model = mallet.TopicModel(os.path.join(TEST_FILES, "quixote.txt"), num_topics=num_topics,
+                              backend=backend, **BACKEND_KWARGS[backend](iterations))
+    return time.perf_counter() - start, model
+
+
+def main():
+    num_topics = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    for backend in mallet.TRAINING_BACKENDS:
+        try:
+            seconds, model = time_backend(backend, num_topics, iterations)
+        except RuntimeError as error:
+            print("{}: skipped ({})".format(backend, " ".join(str(error).split())))
+            continue
+        n_tokens = len(model.docs.token_ids)
+        print("{}: {:.2f}s for {} docs, {} tokens ({:.0f} tokens/s)".format(
+            backend, seconds, model.n_docs, n_tokens, n_tokens / seconds))
+
+
+if __name__ == "__main__":
+    main()
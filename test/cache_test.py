@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+import cache
+
+
+class TestCacheMethods(unittest.TestCase):
+    """Test class for methods in cache.py: cache_path, save_arrays, load_arrays"""
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.source_filepath = os.path.join(self.cache_dir, "source.txt")
+        with open(self.source_filepath, "w") as out:
+            out.write("0 whale 0:3 1:2\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_round_trip(self):
+        """Tests that cached arrays, string lists and metadata are loaded as they were saved"""
+        path = cache.cache_path(self.cache_dir, [self.source_filepath])
+        self.assertIsNone(cache.load_arrays(path, [self.source_filepath]))
+
+        cache.save_arrays(path, cache.source_fingerprint([self.source_filepath]),
+                          {"counts": np.array([[3, 2]], dtype=np.int32)},
+                          {"vocabulary": ["whale"], "empty": []}, {"n_topics": 2})
+        arrays, string_lists, metadata = cache.load_arrays(
+            path, [self.source_filepath])
+        self.assertIsInstance(arrays["counts"], np.memmap)
+        self.assertEqual(arrays["counts"].dtype, np.int32)
+        self.assertEqual(arrays["counts"].tolist(), [[3, 2]])
+        self.assertEqual(string_lists, {"vocabulary": ["whale"], "empty": []})
+        self.assertEqual(metadata, {"n_topics": 2})
+
+    def test_invalidation(self):
+        """Tests that a cache is not loaded after its source file changes, and that options
+        give separate caches"""
+        path = cache.cache_path(self.cache_dir, [self.source_filepath])
+        self.assertNotEqual(path, cache.cache_path(
+            self.cache_dir, [self.source_filepath], dtype="float32"))
+
+        cache.save_arrays(path, cache.source_fingerprint([self.source_filepath]), {}, {})
+        self.assertIsNotNone(cache.load_arrays(path, [self.source_filepath]))
+        with open(self.source_filepath, "a") as out:
+            out.write("1 fox 1:1\n")
+        self.assertIsNone(cache.load_arrays(path, [self.source_filepath]))
+
+        # a source changed while it was parsed leaves a cache that is not loaded
+        fingerprint = cache.source_fingerprint([self.source_filepath])
+        with open(self.source_filepath, "a") as out:
+            out.write("2 sea 2:1\n")
+        cache.save_arrays(path, fingerprint, {}, {})
+        self.assertIsNone(cache.load_arrays(path, [self.source_filepath]))
+
+    def test_rebuild_while_mapped(self):
+        """Tests that rebuilding a cache leaves memory maps of the old cache intact, and no
+        temporary files behind"""
+        path = cache.cache_path(self.cache_dir, [self.source_filepath])
+        cache.save_arrays(path, cache.source_fingerprint([self.source_filepath]),
+                          {"counts": np.arange(1000, dtype=np.int64)}, {})
+        old_counts = cache.load_arrays(path, [self.source_filepath])[0]["counts"]
+
+        with open(self.source_filepath, "a") as out:
+            out.write("1 fox 1:1\n")
+        cache.save_arrays(path, cache.source_fingerprint([self.source_filepath]),
+                          {"counts": np.array([7], dtype=np.int64)}, {})
+        self.assertEqual(old_counts.sum(), 499500)
+        new_counts = cache.load_arrays(path, [self.source_filepath])[0]["counts"]
+        self.assertEqual(new_counts.tolist(), [7])
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         sorted([os.path.basename(path), "source.txt"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
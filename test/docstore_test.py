@@ -0,0 +1,87 @@
+from collections import OrderedDict
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+
+from docstore import DocumentStore, MalletInputDocuments
+
+
+class TestDocumentStore(unittest.TestCase):
+    """Test class for DocumentStore in docstore.py"""
+
+    @classmethod
+    def setUpClass(self):
+        self.doc_tokens = [["the", "big", "whale"], ["the", "fox", "the"], []]
+        self.store = DocumentStore.from_token_lists(
+            ["doc0", "doc1", "doc2"], self.doc_tokens, ["whale", "the"])
+
+    def test_mapping(self):
+        """Tests that the store behaves like an ordered dictionary of document strings"""
+        self.assertEqual(list(self.store), ["doc0", "doc1", "doc2"])
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual(list(self.store.values()), [
+                         " ".join(doc) for doc in self.doc_tokens])
+        self.assertTrue("doc1" in self.store)
+        self.assertFalse("doc3" in self.store)
+        with self.assertRaises(KeyError):
+            self.store["doc3"]
+
+    def test_token_ids(self):
+        """Tests that token IDs follow the given vocabulary, with new words appended"""
+        self.assertEqual(self.store.vocabulary, ["whale", "the", "big", "fox"])
+        self.assertEqual(self.store.token_ids.dtype, np.int32)
+        self.assertEqual(list(self.store.offsets), [0, 3, 6, 6])
+        self.assertEqual(list(self.store.doc_token_ids(1)), [1, 3, 1])
+        self.assertEqual(list(self.store.doc_lengths), [3, 3, 0])
+
+    def test_doc_term_matrix(self):
+        """Tests that the document term matrix counts repeated tokens"""
+        self.assertEqual(self.store.doc_term_matrix.toarray().tolist(),
+                         [[1, 1, 1, 0], [0, 2, 0, 1], [0, 0, 0, 0]])
+        # building the matrix leaves the token order intact
+        self.assertEqual(list(self.store.doc_token_ids(0)), [1, 2, 0])
+
+
+class TestMalletInputDocuments(unittest.TestCase):
+    """Test class for MalletInputDocuments in docstore.py"""
+
+    def test_mallet_input_documents(self):
+        """Tests that texts read through the offset index match the lines of the input file"""
+        with open("test_files/split_quixote.txt", "r") as in_file:
+            full_docs = OrderedDict((line.split("\t")[0], line.split("\t")[2].strip())
+                                    for line in in_file)
+        indexed_docs = MalletInputDocuments.from_file(
+            "test_files/split_quixote.txt")
+        self.assertEqual(list(indexed_docs), list(full_docs))
+        self.assertEqual(indexed_docs, full_docs)
+        with open("test_files/split_quixote.txt", "rb") as in_file:
+            self.assertEqual(indexed_docs.line_bytes("new_split_quixote-0"),
+                             in_file.readline())
+
+        # the memory map is reopened after pickling
+        unpickled_docs = pickle.loads(pickle.dumps(indexed_docs))
+        indexed_docs.close()
+        self.assertEqual(unpickled_docs["new_split_quixote-3"],
+                         full_docs["new_split_quixote-3"])
+        self.assertEqual(indexed_docs["new_split_quixote-3"],
+                         full_docs["new_split_quixote-3"])
+
+    def test_line_bytes(self):
+        """Tests that whole lines are returned, including fields after the text and a last line
+        without a newline"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filepath = os.path.join(temp_dir, "input.txt")
+            with open(filepath, "wb") as out:
+                out.write(b"a\tdoc\twhale sea\textra field\nb\tdoc\tfox den")
+            indexed_docs = MalletInputDocuments.from_file(filepath)
+            self.assertEqual(indexed_docs["a"], "whale sea")
+            self.assertEqual(indexed_docs.line_bytes("a"), b"a\tdoc\twhale sea\textra field\n")
+            self.assertEqual(indexed_docs.line_bytes("b"), b"b\tdoc\tfox den\n")
+            indexed_docs.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,7 @@
 import csv
+import json
+import os
+import multiprocessing
 import numpy as np
 from collections import OrderedDict
 import unittest
@@ -183,6 +186,213 @@ class TestFilterMalletIntegration(unittest.TestCase):
         print(f1)  # getting .6 ... the best i was getting before was .8 ..
 
 
+class TestFilterMallet(unittest.TestCase):
+    """Test class for batch filtering, ranking and export in filter.py, on the Don Quixote
+    Mallet model in test_files/"""
+
+    @classmethod
+    def setUpClass(self):
+        self.mallet_dq_model = mallet.TopicModel(
+            "test_files/quixote.txt", "test_files/mallet_outputs/dq_doc_topics.txt",
+            "test_files/mallet_outputs/dq_topic_wordcounts.txt", "test_files/mallet_outputs/split_quixote.mallet",
+            "test_files/split_quixote.txt")
+        self.mallet_dq_filter = filter.FilterHelper(
+            self.mallet_dq_model, [0, 1], superkeywords=["Dulcinea"])  # choose topics relating to fair maidens
+
+    def test_batch_filter(self):
+        # batch filtering matches the per-document reference functions
+        model = self.mallet_dq_model
+        filter_helper = self.mallet_dq_filter
+        keyword_props = filter.keyword_proportions(
+            model.doc_term_matrix, model.term_index, filter_helper.keyword_list)
+        for i, doc in enumerate(model.docs.values()):
+            self.assertAlmostEqual(keyword_props[i], filter.keyword_proportion(
+                doc, filter_helper.keyword_list))
+        self.assertEqual(filter.filter_corpus(model, filter_helper),
+                         filter.filter_corpus(model, filter_helper, batch=False))
+        # worker processes give the same relevance
+        np.testing.assert_array_equal(filter.relevance_mask(model, filter_helper, processes=2),
+                                      filter.relevance_mask(model, filter_helper))
+        # a pool of worker processes can be reused across filters
+        other_filter_helper = filter.FilterHelper(model, [2], superkeywords=["Sancho"])
+        with multiprocessing.Pool(2) as pool:
+            for helper in [filter_helper, other_filter_helper, filter_helper]:
+                np.testing.assert_array_equal(filter.relevance_mask(model, helper, pool=pool),
+                                              filter.relevance_mask(model, helper))
+            self.assertEqual(filter.filter_corpus(model, other_filter_helper, pool=pool),
+                             filter.filter_corpus(model, other_filter_helper))
+        # workers map memory-mapped arrays from their file, and other arrays from a copy
+        # written once per model
+        mapped_array = np.load("test_files/total_topic_props_out.npy", mmap_mode="r")
+        for array in [mapped_array, np.asarray(mapped_array[10:20])]:
+            spec = filter._mapped_array_spec(array)
+            self.assertEqual(spec["filename"], os.path.abspath("test_files/total_topic_props_out.npy"))
+            np.testing.assert_array_equal(np.memmap(mode="r", **spec), array)
+        self.assertIsNone(filter._mapped_array_spec(mapped_array[::2]))
+        array_specs = filter._worker_array_specs(model)
+        self.assertEqual(filter._worker_array_specs(model), array_specs)
+        np.testing.assert_array_equal(np.memmap(mode="r", **array_specs["token_ids"]),
+                                      model.docs.token_ids)
+
+    def test_filter_result(self):
+        # the filter result holds the subcorpus of filter_corpus and exports it
+        model = self.mallet_dq_model
+        result = filter.filter_result(model, self.mallet_dq_filter)
+        subcorpus = filter.filter_corpus(model, self.mallet_dq_filter)
+        self.assertEqual(result.to_subcorpus(), subcorpus)
+        self.assertEqual(result.doc_ids, list(subcorpus))
+        self.assertTrue((result.mask == (result.has_superkeyword | result.passes_total_topic_thresh |
+                                         result.passes_keyword_thresh)).all())
+
+        output_filepath = "test_files/filtered_split_quixote.txt"
+        try:
+            # Mallet input lines are copied unchanged
+            result.to_mallet_input(output_filepath)
+            with open("test_files/split_quixote.txt", "r") as in_file:
+                input_lines = {line.split("\t")[0]: line for line in in_file}
+            with open(output_filepath, "r") as in_file:
+                self.assertEqual(in_file.readlines(), [
+                                 input_lines[doc_id] for doc_id in subcorpus])
+
+            result.to_jsonl(output_filepath)
+            with open(output_filepath, "r") as in_file:
+                records = [json.loads(line) for line in in_file]
+            self.assertEqual([(record["id"], record["text"]) for record in records],
+                             list(subcorpus.items()))
+            self.assertEqual(sum(record["has_superkeyword"] for record in records),
+                             result.has_superkeyword.sum())
+        finally:
+            os.remove(output_filepath)
+
+    def test_filter_new_docs(self):
+        # the preprocessed training documents are mostly filtered like in filter_corpus
+        # when their topic proportions are inferred as new documents
+        model = self.mallet_dq_model
+        docs = dict(model.docs.items())
+        new_subcorpus = filter.filter_new_docs(model, self.mallet_dq_filter, docs)
+        subcorpus = filter.filter_corpus(model, self.mallet_dq_filter)
+        self.assertTrue(set(new_subcorpus) <= set(docs))
+        self.assertLess(len(set(new_subcorpus) ^ set(subcorpus)), 0.1 * len(docs))
+        # superkeywords are applied to the new document texts
+        new_docs = {"new0": "", "new1": "some unseen words and Dulcinea"}
+        self.assertEqual(list(filter.filter_new_docs(model, self.mallet_dq_filter, new_docs)),
+                         ["new1"])
+
+    def test_filter_mallet_files(self):
+        # filtering straight from the Mallet files writes the input lines of the filtered corpus
+        output_filepath = "test_files/filtered_split_quixote.txt"
+        try:
+            n_relevant = filter.filter_mallet_files(
+                self.mallet_dq_filter, "test_files/mallet_outputs/dq_doc_topics.txt",
+                "test_files/mallet_outputs/split_quixote.mallet", "test_files/split_quixote.txt",
+                output_filepath, chunk_size=2**12)
+            with open(output_filepath, "r") as in_file:
+                filtered_docs = OrderedDict((line.split("\t")[0], line.split("\t")[2].strip())
+                                            for line in in_file)
+        finally:
+            os.remove(output_filepath)
+        subcorpus = filter.filter_corpus(self.mallet_dq_model, self.mallet_dq_filter)
+        self.assertEqual(n_relevant, len(subcorpus))
+        self.assertEqual(list(filtered_docs.items()), list(subcorpus.items()))
+
+    def test_cached_proportions(self):
+        # changing a threshold reuses the cached proportions, changing a list recomputes its column
+        model = self.mallet_dq_model
+        filter_helper = filter.FilterHelper(
+            model, [0, 1], keyword_list=self.mallet_dq_filter.keyword_list, superkeywords=["Dulcinea"])
+        filter.filter_corpus(model, filter_helper)
+        keyword_props = filter_helper.keyword_props
+        has_superkeyword = filter_helper.has_superkeyword
+
+        filter_helper.keyword_prop_threshold = 0.05
+        filter_helper.relevant_topics = [2, 3]
+        self.assertIs(filter_helper.keyword_props, keyword_props)
+        self.assertEqual(filter.filter_corpus(model, filter_helper),
+                         filter.filter_corpus(model, filter_helper, batch=False))
+
+        filter_helper.keyword_list = filter_helper.keyword_list[:10]
+        self.assertIsNot(filter_helper.keyword_props, keyword_props)
+        self.assertIs(filter_helper.has_superkeyword, has_superkeyword)
+        self.assertEqual(filter.filter_corpus(model, filter_helper),
+                         filter.filter_corpus(model, filter_helper, batch=False))
+
+    def test_multiple_filters(self):
+        # filtering with many filters at once matches filtering with each filter
+        model = self.mallet_dq_model
+        keyword_list = self.mallet_dq_filter.keyword_list
+        filter_helpers = [filter.FilterHelper(model, relevant_topics, keyword_list=keyword_list[:n_keywords],
+                                              superkeywords=superkeywords)
+                          for relevant_topics, n_keywords, superkeywords in [
+                              ([0, 1], 100, ["Dulcinea"]), ([2], 10, []), ([3, 4, 5], 50, ["Sancho"])]]
+        subcorpora = filter.filter_corpora(model, filter_helpers)
+        for filter_helper, subcorpus in zip(filter_helpers, subcorpora):
+            self.assertEqual(subcorpus, filter.filter_corpus(
+                model, filter_helper, batch=False))
+
+        # the proportions cached for all filters at once match those of each filter alone
+        for filter_helper in filter_helpers:
+            single_helper = filter.FilterHelper(model, filter_helper.relevant_topics,
+                                                keyword_list=filter_helper.keyword_list,
+                                                superkeywords=filter_helper.superkeywords)
+            np.testing.assert_allclose(filter_helper.keyword_props, single_helper.keyword_props)
+            np.testing.assert_array_equal(filter_helper.has_superkeyword,
+                                          single_helper.has_superkeyword)
+
+    def test_rank_corpus(self):
+        # top k and pages follow a full sort of the scores, with ties in corpus order
+        model = self.mallet_dq_model
+        scores = filter.relevance_scores(model, self.mallet_dq_filter)
+        ranked_doc_ids = [list(model.docs)[i]
+                          for i in sorted(range(len(scores)), key=lambda i: -scores[i])]
+        top_docs = filter.rank_corpus(model, self.mallet_dq_filter, 10)
+        self.assertEqual([doc_id for doc_id, _ in top_docs], ranked_doc_ids[:10])
+        pages = filter.iter_ranked_pages(
+            model, self.mallet_dq_filter, page_size=100)
+        self.assertEqual([doc_id for doc_id, _ in next(pages)],
+                         ranked_doc_ids[:100])
+        self.assertEqual([doc_id for page in pages for doc_id, _ in page],
+                         ranked_doc_ids[100:])
+
+    def test_rank_corpus_ties(self):
+        # scores with many ties rank in corpus order, across every page and block boundary
+        model = self.mallet_dq_model
+        weights = {"topic_weight": 0, "keyword_weight": 0}
+        scores = filter.relevance_scores(model, self.mallet_dq_filter, **weights)
+        self.assertGreater(len(scores) - len(np.unique(scores)), len(scores) // 2)
+        ranked_doc_ids = [list(model.docs)[i]
+                          for i in sorted(range(len(scores)), key=lambda i: -scores[i])]
+        self.assertEqual([doc_id for doc_id, _ in filter.rank_corpus(
+            model, self.mallet_dq_filter, 25, **weights)], ranked_doc_ids[:25])
+        for page_size in [1, 7, 100, len(scores) + 1]:
+            pages = filter.iter_ranked_pages(
+                model, self.mallet_dq_filter, page_size=page_size, **weights)
+            self.assertEqual([doc_id for page in pages for doc_id, _ in page],
+                             ranked_doc_ids)
+
+        rounded_scores = np.random.RandomState(0).randint(0, 5, 1000).astype(float)
+        ranked = sorted(range(len(rounded_scores)), key=lambda i: -rounded_scores[i])
+        for start, stop in [(0, 10), (150, 260), (195, 805), (990, 1100)]:
+            self.assertEqual(list(filter._ranked_positions(rounded_scores, start, stop)),
+                             ranked[start:stop])
+
+    def test_threshold_sweep(self):
+        # labeling the subcorpus of the default thresholds as relevant makes them a perfect threshold pair
+        model = self.mallet_dq_model
+        filter_helper = self.mallet_dq_filter
+        subcorpus = filter.filter_corpus(model, filter_helper)
+        labels = {doc_id: int(doc_id in subcorpus) for doc_id in model.docs}
+        quality = filter.subset_quality(model, filter_helper, labels,
+                                        [0.1, 0.25, 0.5], [0.05, 0.15, 0.3])
+        self.assertEqual(quality["best"][:2], (0.25, 0.15))
+        self.assertEqual(quality["f1"][1, 1], 1)
+        self.assertTrue((quality["true_pos"] + quality["false_neg"] == len(subcorpus)).all())
+
+        info = filter.subset_info(model, filter_helper, labels, 0.5, 0.3)
+        self.assertEqual(info["true_pos"] | info["false_neg"], set(subcorpus))
+        self.assertEqual(info["n_true_pos"], quality["true_pos"][2, 2])
+        self.assertEqual(info["n_false_pos"], 0)
+
+
 class TestFilterGensimIntegration(unittest.TestCase):
     """Test class for methods in mallet.py and filter.py"""
 
@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# modules that must not import gensim or nltk until a code path needs them
+LIGHT_MODULES = ["mallet", "filter", "inference", "keywords", "munge", "server", "sweep"]
+
+
+class TestImports(unittest.TestCase):
+    """Test class for the imports of the package"""
+
+    def test_lazy_heavy_dependencies(self):
+        """Tests that importing the package modules in a fresh interpreter does not import gensim
+        or nltk, which are slow to import and only needed to train topic models and split text"""
+        env = dict(os.environ, PYTHONPATH=os.path.join(os.pardir, "wheat_filtration"))
+        output = subprocess.run(
+            [sys.executable, "-c", "import sys\nimport {}\nprint(' '.join(sorted(".format(
+                ", ".join(LIGHT_MODULES)) +
+             "name for name in sys.modules if name.split('.')[0] in ('gensim', 'nltk'))))"],
+            env=env, stdout=subprocess.PIPE, check=True).stdout.decode("utf-8")
+        self.assertEqual(output.strip(), "")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+import inference
+
+
+class TestInference(unittest.TestCase):
+    """Test class for fold-in inference in inference.py"""
+
+    @classmethod
+    def setUpClass(self):
+        # two topics over four words: "whale" and "sea" belong to topic 0, "fox" and "den" to topic 1
+        self.vocabulary = ["whale", "sea", "fox", "den"]
+        self.topic_wordcounts = csr_matrix(np.array([[50, 50, 0, 0], [0, 0, 50, 50]]))
+        self.docs = {"doc0": "The whale, the sea!", "doc1": "fox den fox",
+                     "doc2": "whale fox", "doc3": "", "doc4": "the"}
+
+    def test_prepare_docs(self):
+        """Tests that new documents are tokenized like model documents, with unknown words
+        numbered after the vocabulary"""
+        doc_store = inference.prepare_docs(
+            self.docs, self.vocabulary, stop_words=["the"])
+        self.assertEqual(list(doc_store), list(self.docs))
+        self.assertEqual(doc_store["doc0"], "whale sea")
+        self.assertEqual(list(doc_store.doc_lengths), [2, 3, 2, 0, 0])
+        self.assertEqual(doc_store.vocabulary, self.vocabulary)
+        doc_store = inference.prepare_docs(self.docs, self.vocabulary)
+        self.assertEqual(doc_store.vocabulary, self.vocabulary + ["the"])
+
+    def test_infer_doc_topic_proportions(self):
+        """Tests that inferred topic proportions follow the topics of the words of each document"""
+        doc_term_matrix = inference.prepare_docs(
+            self.docs, self.vocabulary).doc_term_matrix
+        doc_topic_proportions = inference.infer_doc_topic_proportions(
+            doc_term_matrix, self.topic_wordcounts, alpha=0.2)
+        self.assertEqual(doc_topic_proportions.shape, (5, 2))
+        np.testing.assert_allclose(doc_topic_proportions.sum(axis=1), 1)
+        # the smoothed counts of the topic of every token
+        np.testing.assert_allclose(doc_topic_proportions[0], [2.1 / 2.2, 0.1 / 2.2], atol=1e-4)
+        np.testing.assert_allclose(doc_topic_proportions[1], [0.1 / 3.2, 3.1 / 3.2], atol=1e-4)
+        np.testing.assert_allclose(doc_topic_proportions[2], [0.5, 0.5])
+        # documents without vocabulary words get uniform proportions
+        np.testing.assert_allclose(doc_topic_proportions[3:], 0.5)
+
+        # batches are inferred independently
+        np.testing.assert_allclose(inference.infer_doc_topic_proportions(
+            doc_term_matrix, self.topic_wordcounts, alpha=0.2, batch_size=2), doc_topic_proportions)
+
+    def test_estimate_alpha(self):
+        """Tests that alpha is recovered from topic proportions smoothed with a symmetric prior"""
+        doc_topic_counts = np.array([[10, 0, 0], [4, 5, 0], [3, 3, 3]])
+        alpha = 0.6
+        doc_topic_proportions = (doc_topic_counts + alpha / 3) / \
+            (doc_topic_counts.sum(axis=1, keepdims=True) + alpha)
+        self.assertAlmostEqual(inference.estimate_alpha(
+            doc_topic_proportions, doc_topic_counts.sum(axis=1)), alpha, delta=0.05)
+        # documents that are empty or have uniform proportions give no estimate
+        with self.assertRaises(ValueError):
+            inference.estimate_alpha(np.full((3, 2), .5), [4, 5, 6])
+        with self.assertRaises(ValueError):
+            inference.estimate_alpha(doc_topic_proportions, [0, 0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
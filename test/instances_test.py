@@ -0,0 +1,64 @@
+import unittest
+
+import instances
+
+
+class TestInstanceMethods(unittest.TestCase):
+    """Test class for methods in instances.py: iter_instances, read_instance_list,
+    read_printed_instances, load_document_store"""
+
+    @classmethod
+    def setUpClass(self):
+        self.instance_filepath = "test_files/mallet_outputs/split_quixote.mallet"
+        with open("test_files/mallet_outputs/dq_topic_wordcounts.txt", "r") as in_file:
+            self.vocabulary = [line.split()[1] for line in in_file]
+        with open("test_files/mallet_outputs/dq_doc_topics.txt", "r") as in_file:
+            self.doc_topic_ids = [line.split()[1] for line in in_file]
+
+    def test_read_instance_list(self):
+        """Tests that instances are read in the order and with the alphabet Mallet used"""
+        doc_ids, token_ids, offsets, alphabet = instances.read_instance_list(
+            self.instance_filepath)
+        self.assertEqual(doc_ids, self.doc_topic_ids)
+        self.assertEqual(alphabet, self.vocabulary)
+        self.assertEqual(len(offsets), len(doc_ids) + 1)
+        self.assertEqual(offsets[-1], len(token_ids))
+        self.assertEqual([alphabet[token_id] for token_id in token_ids[:4]],
+                         ["commendatory", "verses", "urganda", "unknown"])
+
+        with self.assertRaises(ValueError):
+            instances.read_instance_list("test_files/the_raven.txt")
+
+    def test_iter_instances(self):
+        """Tests that streamed instances match the instances read at once"""
+        doc_ids, token_ids, offsets, alphabet = instances.read_instance_list(
+            self.instance_filepath)
+        streamed_instances = list(instances.iter_instances(self.instance_filepath))
+        self.assertEqual([doc_id for doc_id, _, _ in streamed_instances], doc_ids)
+        for i, (_, doc_token_ids, doc_alphabet) in enumerate(streamed_instances):
+            self.assertEqual(list(doc_token_ids), list(
+                token_ids[offsets[i]:offsets[i + 1]]))
+            self.assertEqual(doc_alphabet, alphabet)
+
+    def test_read_printed_instances(self):
+        """Tests parsing of "mallet info --print-instances" output"""
+        lines = ["doc0 label 0: great (0)\n", "1: whale (1)\n", "\n",
+                 "doc1 label \n", "\n",
+                 "doc2 label 0: fox (2)\n", "\n"]
+        doc_ids, doc_tokens = instances.read_printed_instances(lines)
+        # documents without tokens are kept, so that they line up with the doc topics rows
+        self.assertEqual(doc_ids, ["doc0", "doc1", "doc2"])
+        self.assertEqual(doc_tokens, [["great", "whale"], [], ["fox"]])
+
+    def test_load_document_store(self):
+        """Tests that token IDs of the document store follow the given vocabulary"""
+        docs = instances.load_document_store(
+            self.instance_filepath, self.vocabulary)
+        self.assertEqual(docs.vocabulary, self.vocabulary)
+        shuffled_docs = instances.load_document_store(
+            self.instance_filepath, self.vocabulary[::-1])
+        self.assertEqual(list(docs.items()), list(shuffled_docs.items()))
+
+
+if __name__ == '__main__':
+    unittest.main()
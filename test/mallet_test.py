@@ -1,7 +1,13 @@
+import shutil
+import tempfile
 import unittest
 import warnings
 
+import gensim.corpora as corpora
+import numpy as np
+
 import mallet
+import munge
 
 
 class TestMalletMethods(unittest.TestCase):
@@ -62,15 +68,130 @@ class TestMalletMethods(unittest.TestCase):
         self.assertEqual(self.mallet_dq_model.n_topics, 20)
         self.assertEqual(self.mallet_dq_model.topic_wordcounts.get_shape()[1],
                          self.mallet_dq_model.n_voc_words)
+        # word counts are stored as sparse integer counts
+        self.assertTrue(np.issubdtype(
+            self.mallet_dq_model.topic_wordcounts.dtype, np.integer))
 
         # checking that doc topic props for each doc sum to 1
         self.assertAlmostEqual(
             self.mallet_dq_model.doc_topic_proportions.sum(), self.mallet_dq_model.n_docs)
 
+        # doc topic props can be loaded at single precision
+        float32_model = mallet.TopicModel(
+            "test_files/quixote.txt", "test_files/mallet_outputs/dq_doc_topics.txt",
+            "test_files/mallet_outputs/dq_topic_wordcounts.txt", "test_files/mallet_outputs/split_quixote.mallet",
+            "test_files/split_quixote.txt", doc_topic_dtype=np.float32)
+        self.assertEqual(float32_model.doc_topic_proportions.dtype, np.float32)
+        np.testing.assert_allclose(float32_model.doc_topic_proportions,
+                                   self.mallet_dq_model.doc_topic_proportions, atol=1e-6)
+
         # check that there are same number of full_docs as processed docs
         self.assertEqual(len(self.mallet_dq_model.full_docs),
                          len(self.mallet_dq_model.docs))
 
+        # a model loaded from the binary cache matches the parsed model
+        cache_dir = tempfile.mkdtemp()
+        try:
+            for _ in range(2):  # build, then load the cache
+                cached_model = mallet.TopicModel(
+                    "test_files/quixote.txt", "test_files/mallet_outputs/dq_doc_topics.txt",
+                    "test_files/mallet_outputs/dq_topic_wordcounts.txt", "test_files/mallet_outputs/split_quixote.mallet",
+                    "test_files/split_quixote.txt", cache_dir=cache_dir)
+                np.testing.assert_array_equal(cached_model.doc_topic_proportions,
+                                              self.mallet_dq_model.doc_topic_proportions)
+                self.assertEqual(cached_model.vocabulary,
+                                 self.mallet_dq_model.vocabulary)
+                self.assertEqual(list(cached_model.docs.items()),
+                                 list(self.mallet_dq_model.docs.items()))
+        finally:
+            shutil.rmtree(cache_dir)
+
+        # check that stored token IDs index into the model vocabulary
+        docs = self.mallet_dq_model.docs
+        first_doc_id = next(iter(docs))
+        self.assertEqual(docs[first_doc_id].split(), [self.mallet_dq_model.vocabulary[token_id]
+                                                      for token_id in docs.doc_token_ids(0)])
+
+        # documents that don't line up with the doc topics rows are an error
+        doc_topic_dir = tempfile.mkdtemp()
+        try:
+            doc_topic_filepath = doc_topic_dir + "/dq_doc_topics.txt"
+            with open("test_files/mallet_outputs/dq_doc_topics.txt", "r") as in_file:
+                doc_topic_lines = in_file.readlines()
+            with open(doc_topic_filepath, "w") as out:
+                out.writelines(doc_topic_lines[:-1])
+            with self.assertRaises(ValueError):
+                mallet.TopicModel(
+                    "test_files/quixote.txt", doc_topic_filepath,
+                    "test_files/mallet_outputs/dq_topic_wordcounts.txt", "test_files/mallet_outputs/split_quixote.mallet",
+                    "test_files/split_quixote.txt")
+        finally:
+            shutil.rmtree(doc_topic_dir)
+
+    def test_preprocess_corpus(self):
+        """Tests that the single pass of mallet.preprocess_corpus gives the dictionary,
+        bag-of-words corpus and documents of a separate pass for each"""
+        docs, full_docs, id_to_word, term_document_frequency = mallet.preprocess_corpus(
+            "test_files/quixote.txt")
+        prepped_corpus = [[word.lower() for word in doc]
+                          for doc in munge.corpus_to_doc_tokens("test_files/quixote.txt")]
+        two_pass_id_to_word = corpora.Dictionary(prepped_corpus)
+
+        self.assertEqual(id_to_word.token2id, two_pass_id_to_word.token2id)
+        self.assertEqual(id_to_word.dfs, two_pass_id_to_word.dfs)
+        self.assertEqual(term_document_frequency,
+                         [two_pass_id_to_word.doc2bow(doc) for doc in prepped_corpus])
+        self.assertEqual(docs.vocabulary, list(two_pass_id_to_word.values()))
+        self.assertEqual(len(docs), len(prepped_corpus))
+        for i, doc in enumerate(prepped_corpus):
+            self.assertEqual(list(docs.doc_token_ids(i)),
+                             [two_pass_id_to_word.token2id[word] for word in doc])
+        self.assertEqual(list(full_docs.values()),
+                         munge.corpus_to_documents("test_files/quixote.txt"))
+
+    def test_make_topic_model_in_process(self):
+        """Tests that mallet.TopicModel trains topic models in process with the gensim and
+        gibbs backends"""
+        for backend, kwargs in [("gibbs", {"iterations": 20, "random_seed": 1}),
+                                ("gensim", {"workers": 1, "random_state": 1})]:
+            model = mallet.TopicModel(
+                "test_files/quixote.txt", num_topics=5, backend=backend, **kwargs)
+            self.assertEqual(model.n_topics, 5)
+            self.assertEqual(model.topic_wordcounts.get_shape(),
+                             (5, model.n_voc_words))
+            self.assertEqual(model.doc_topic_proportions.shape, (model.n_docs, 5))
+            self.assertAlmostEqual(
+                model.doc_topic_proportions.sum(), model.n_docs)
+            self.assertEqual(len(model.full_docs), len(model.docs))
+
+        # the gibbs backend assigns every token to a topic
+        gibbs_model = mallet.TopicModel("test_files/quixote.txt", num_topics=5, backend="gibbs",
+                                        iterations=5, random_seed=1)
+        self.assertEqual(gibbs_model.topic_wordcounts.sum(),
+                         len(gibbs_model.docs.token_ids))
+
+        with self.assertRaises(ValueError):
+            mallet.TopicModel("test_files/quixote.txt", backend="sklearn")
+
+    def test_chunk_index(self):
+        """Tests that the chunk index maps words and phrase chunks to vocabulary IDs"""
+        chunk_index = self.mallet_dq_model.chunk_index
+        for word_id, word in enumerate(self.mallet_dq_model.vocabulary):
+            for chunk in word.split("_"):
+                self.assertIn(word_id, chunk_index[chunk])
+            self.assertIn(word_id, chunk_index[word])
+        # the index is built once
+        self.assertIs(self.mallet_dq_model.chunk_index, chunk_index)
+
+    def test_word_distribution(self):
+        """Tests that the cached corpus word distribution follows the topic wordcounts"""
+        word_distribution = self.mallet_dq_model.word_distribution
+        self.assertAlmostEqual(word_distribution.sum(), 1)
+        word_counts = self.mallet_dq_model.topic_wordcounts.toarray().sum(axis=0)
+        np.testing.assert_allclose(
+            word_distribution, word_counts / word_counts.sum())
+        self.assertIs(self.mallet_dq_model.word_distribution, word_distribution)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,9 @@
+import gzip
 import os
+import re
+import shutil
 import string
+import tempfile
 import unittest
 
 import munge
@@ -160,5 +164,77 @@ class TestMungeMethods(MungeUnitTestClass):
                 self.assertEqual(len(features), 3)
 
 
+class TestCorpusStreaming(unittest.TestCase):
+    """Test class for streaming a corpus in munge.py: iter_corpus, sentences_to_doc_tokens, and
+    corpus_to_doc_tokens on a stream of files or with worker processes"""
+
+    def setUp(self):
+        """Creates a temporary corpus directory"""
+        self.sample_sentence_whale = "the great big whale splashed the timid blue fox.\n"
+        self.sample_sentence_angel = "the big white angel was on fire, and the black angel put him out and said \"hey idiot\".\n"
+        self.corpus_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.corpus_dir)
+
+    def write_file(self, filename, text):
+        """Writes text to filename in the corpus directory"""
+        with open(os.path.join(self.corpus_dir, filename), "w") as out:
+            out.write(text)
+
+    def test_iter_corpus_simple(self):
+        """Tests munge.iter_corpus on a directory of plain and compressed files. checks:
+        -file contents are yielded one file at a time, in filename order
+        -.gz files are decompressed
+        -include filters files by glob pattern or regular expression"""
+        self.write_file("a.txt", self.sample_sentence_whale)
+        with gzip.open(os.path.join(self.corpus_dir, "b.txt.gz"), "wt") as out:
+            out.write(self.sample_sentence_angel)
+        self.write_file(".hidden", "system file")
+
+        self.assertEqual(list(munge.iter_corpus(self.corpus_dir)),
+                         [self.sample_sentence_whale, self.sample_sentence_angel])
+        self.assertEqual(list(munge.iter_corpus(self.corpus_dir, include="*.gz")),
+                         [self.sample_sentence_angel])
+        self.assertEqual(list(munge.iter_corpus(self.corpus_dir, include=re.compile(r"\.txt$"))),
+                         [self.sample_sentence_whale])
+        self.assertEqual(munge.import_corpus(self.corpus_dir),
+                         self.sample_sentence_whale + self.sample_sentence_angel)
+        # downstream functions accept the stream of file contents
+        self.assertEqual(munge.corpus_to_doc_tokens(munge.iter_corpus(self.corpus_dir)),
+                         munge.corpus_to_doc_tokens(self.corpus_dir))
+
+    def test_sentences_per_file(self):
+        """Tests that sentences are split within each corpus file: a file that doesn't end on
+        punctuation ends a sentence, and its last word is not joined with the next file"""
+        self.write_file("a.txt", "the great whale")
+        self.write_file("b.txt", "swam away. the fox ran.")
+        # "the great whale" is a document, the sentence after it is skipped,
+        # and the last sentence is added to the last document
+        self.assertEqual(munge.corpus_to_doc_tokens(self.corpus_dir, (1, 5)),
+                         [["the", "great", "whale", "the", "fox", "ran"]])
+
+    def test_corpus_to_doc_tokens_parallel(self):
+        """Tests that munge.corpus_to_doc_tokens gives the same documents with worker processes
+        as without"""
+        self.write_file("simple_whale_100.txt", self.sample_sentence_whale * 100)
+        self.write_file("simple_angel_50.txt", self.sample_sentence_angel * 50)
+        shutil.copy("test_files/quixote.txt", self.corpus_dir)
+        self.assertEqual(munge.corpus_to_doc_tokens(self.corpus_dir, processes=2),
+                         munge.corpus_to_doc_tokens(self.corpus_dir))
+
+    def test_sentences_to_doc_tokens_simple(self):
+        """Tests munge.sentences_to_doc_tokens on a stream of sentences. checks:
+        -documents are emitted once they reach the minimum size, and the following sentence is skipped
+        -runs longer than the maximum size are split into documents of the maximum size
+        -leftover words are added to the last document"""
+        sentences = iter(["a b c.", "d e.", "f g h i j k l.", "m.", "n o."])
+        self.assertEqual(list(munge.sentences_to_doc_tokens(sentences, (2, 3))),
+                         [["a", "b", "c"], ["f", "g", "h"], ["i", "j", "k"], ["l", "m"]])
+        # an empty corpus gives one empty document
+        self.assertEqual(
+            list(munge.sentences_to_doc_tokens([], (2, 3))), [[]])
+
+
 if __name__ == '__main__':
     unittest.main()
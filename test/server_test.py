@@ -0,0 +1,85 @@
+import asyncio
+import json
+import unittest
+
+import filter
+import mallet
+import server
+
+
+async def post(host, port, path, request=None, method="POST", content_length=None):
+    """Sends one HTTP request to the server and returns the status code and JSON response.
+    The Content-Length header is the length of the body unless content_length is given."""
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(request).encode("utf-8") if request is not None else b""
+    if content_length is None:
+        content_length = len(body)
+    writer.write("{} {} HTTP/1.1\r\nContent-Length: {}\r\nConnection: close\r\n\r\n".format(
+        method, path, content_length).encode("latin-1") + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+class TestScoringServer(unittest.TestCase):
+    """Test class for ScoringServer in server.py"""
+
+    @classmethod
+    def setUpClass(self):
+        self.mallet_dq_model = mallet.TopicModel(
+            "test_files/quixote.txt", "test_files/mallet_outputs/dq_doc_topics.txt",
+            "test_files/mallet_outputs/dq_topic_wordcounts.txt", "test_files/mallet_outputs/split_quixote.mallet",
+            "test_files/split_quixote.txt")
+        self.mallet_dq_filter = filter.FilterHelper(
+            self.mallet_dq_model, [0, 1], superkeywords=["Dulcinea"])
+
+    def test_score(self):
+        """Tests that concurrent requests are batched and scored like relevance_mask"""
+        model = self.mallet_dq_model
+        doc_ids = list(model.docs)
+        mask = filter.relevance_mask(model, self.mallet_dq_filter)
+
+        async def run():
+            scoring_server = server.ScoringServer(
+                model, {"maidens": self.mallet_dq_filter}, port=0)
+            await scoring_server.start()
+            host, port = scoring_server.address
+            try:
+                responses = await asyncio.gather(*[
+                    post(host, port, "/score", {"doc_ids": doc_ids[i:i + 3], "texts": {"new": "Dulcinea"}})
+                    for i in range(0, 60, 3)])
+                for i, (status, response) in zip(range(0, 60, 3), responses):
+                    self.assertEqual(status, 200)
+                    results = response["results"]
+                    self.assertEqual([result["id"] for result in results],
+                                     doc_ids[i:i + 3] + ["new"])
+                    self.assertEqual([result["relevant"] for result in results],
+                                     [bool(relevant) for relevant in mask[i:i + 3]] + [True])
+                    self.assertTrue(results[-1]["has_superkeyword"])
+                # concurrent requests share scoring calls
+                self.assertLess(scoring_server.metrics.n_batches, 20)
+
+                status, response = await post(host, port, "/score", {"doc_ids": ["unknown"]})
+                self.assertEqual(status, 400)
+                status, response = await post(host, port, "/score", {"filter": "unknown"})
+                self.assertEqual(status, 400)
+                for content_length in ["many", "-1"]:
+                    status, response = await post(host, port, "/score", {"doc_ids": doc_ids[:1]},
+                                                  content_length=content_length)
+                    self.assertEqual(status, 400)
+
+                status, metrics = await post(host, port, "/metrics", method="GET")
+                self.assertEqual(status, 200)
+                self.assertEqual(metrics["requests"], 20)
+                self.assertEqual(metrics["docs"], 80)
+                self.assertIn("p95", metrics["latency_ms"])
+            finally:
+                await scoring_server.close()
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
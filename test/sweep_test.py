@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+import mallet
+import sweep
+
+
+class TestSweep(unittest.TestCase):
+    """Test class for methods in sweep.py"""
+
+    def test_sweep_topic_models(self):
+        """Tests that models trained in worker processes match models trained one at a time,
+        in the order of the settings"""
+        settings = [{"num_topics": 5, "iterations": 10, "random_seed": 1},
+                    {"num_topics": 3, "iterations": 10, "random_seed": 1}]
+        parallel_sweep = sweep.sweep_topic_models(
+            "test_files/quixote.txt", settings, backend="gibbs", processes=2)
+        serial_sweep = sweep.sweep_topic_models(
+            "test_files/quixote.txt", settings, backend="gibbs", processes=1)
+        self.assertEqual([result["settings"] for result in parallel_sweep["models"]], settings)
+        for parallel_result, serial_result in zip(parallel_sweep["models"], serial_sweep["models"]):
+            model = parallel_result["model"]
+            self.assertEqual(model.n_topics, parallel_result["settings"]["num_topics"])
+            np.testing.assert_array_equal(model.doc_topic_proportions,
+                                          serial_result["model"].doc_topic_proportions)
+            self.assertTrue(np.isfinite(parallel_result["log_likelihood"]))
+            self.assertTrue(np.isfinite(parallel_result["coherence"]))
+        self.assertLessEqual(parallel_sweep["preprocess_seconds"], parallel_sweep["wall_seconds"])
+
+        # a model of the sweep is the model TopicModel trains with the same setting
+        model = mallet.TopicModel("test_files/quixote.txt", backend="gibbs", **settings[0])
+        np.testing.assert_array_equal(model.doc_topic_proportions,
+                                      serial_sweep["models"][0]["model"].doc_topic_proportions)
+        self.assertEqual(model.vocabulary, serial_sweep["models"][0]["model"].vocabulary)
+
+        with self.assertRaises(ValueError):
+            sweep.sweep_topic_models("test_files/quixote.txt", [5], backend="sklearn")
+
+    def test_model_summaries(self):
+        """Tests the log likelihood and coherence of a model of the corpus"""
+        model = mallet.TopicModel("test_files/quixote.txt", num_topics=4, backend="gibbs",
+                                  iterations=10, random_seed=1)
+        self.assertLess(sweep.log_likelihood(model), 0)
+        # evaluating in batches of documents gives the same likelihood
+        self.assertAlmostEqual(sweep.log_likelihood(model, batch_size=100),
+                               sweep.log_likelihood(model))
+        self.assertEqual(sweep.umass_coherence(model, n_words=5).shape, (4,))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import subprocess
+import sys
+import unittest
+
+import util
+
+
+class TestUtilMethods(unittest.TestCase):
+    """Test class for methods in util.py"""
+
+    def test_stream_command_line(self):
+        """Tests that util.stream_command_line yields the output lines of a command, and raises
+        if the command fails"""
+        command = "{} -c print('a');print('b')".format(sys.executable)
+        self.assertEqual(list(util.stream_command_line(command)), ["a\n", "b\n"])
+        with self.assertRaises(subprocess.CalledProcessError):
+            list(util.stream_command_line(
+                "{} -c print('a');exit(3)".format(sys.executable)))
+
+
+if __name__ == '__main__':
+    unittest.main()
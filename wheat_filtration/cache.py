@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# bump when the layout of cached files changes
+CACHE_VERSION = 1
+INDEX_FILENAME = "index.json"
+
+
+def source_fingerprint(source_filepaths):
+    """Return a list of [absolute path, size, modification time in ns] for each file in
+    source_filepaths. A cache is only valid for sources with the same fingerprint."""
+    fingerprint = []
+    for filepath in source_filepaths:
+        file_stat = os.stat(filepath)
+        fingerprint.append([os.path.abspath(filepath),
+                            file_stat.st_size, file_stat.st_mtime_ns])
+    return fingerprint
+
+
+def cache_path(cache_dir, source_filepaths, **options):
+    """Return the directory within cache_dir where arrays parsed from source_filepaths
+    with the given options are cached. The directory only depends on the paths and options,
+    so a changed source file overwrites its stale cache instead of adding a new one."""
+    key = [os.path.abspath(filepath) for filepath in source_filepaths]
+    key += ["{}={}".format(name, options[name]) for name in sorted(options)]
+    return os.path.join(cache_dir, hashlib.sha1("\n".join(key).encode("utf-8")).hexdigest())
+
+
+def _strings_filepath(path, name):
+    return os.path.join(path, name + ".txt")
+
+
+def load_arrays(path, source_filepaths, mmap_mode="r"):
+    """Loads arrays cached in path by save_arrays.
+    Arguments:
+        path (str): the cache directory, see cache_path.
+        source_filepaths (iterable of str): the files the arrays were parsed from.
+        mmap_mode (str, optional): mmap_mode for numpy.load. Default is "r" (read-only memory map).
+    Returns:
+        (arrays, string_lists, metadata): dictionaries of the cached numpy arrays, lists of
+        strings and metadata, or None if there is no cache for the current version of the
+        source files."""
+    try:
+        with open(os.path.join(path, INDEX_FILENAME), "r") as in_file:
+            index = json.load(in_file)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != CACHE_VERSION or \
+            index.get("sources") != source_fingerprint(source_filepaths):
+        return None
+
+    try:
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)
+                  for name in index["arrays"]}
+        string_lists = {}
+        for name in index["string_lists"]:
+            with open(_strings_filepath(path, name), "r", encoding="utf-8") as in_file:
+                strings = in_file.read()
+            string_lists[name] = strings.split("\n") if strings else []
+    except OSError:
+        # the cache was replaced by another process while it was being loaded
+        return None
+    return arrays, string_lists, index["metadata"]
+
+
+def save_arrays(path, fingerprint, arrays, string_lists, metadata=None):
+    """Caches arrays parsed from source files in path, as one .npy file per array,
+    one text file per list of strings, and an index file recording the source fingerprint.
+    The files are written to a temporary directory next to path, which then replaces path,
+    so an interrupted save leaves no valid cache, memory maps of a replaced cache stay valid,
+    and concurrent saves to the same path each write their own files.
+    Arguments:
+        path (str): the cache directory, see cache_path.
+        fingerprint (list): the source_fingerprint of the files the arrays were parsed from,
+            taken before they were parsed, so that a file changed while it was parsed leaves
+            a cache that is not loaded.
+        arrays (dict): numpy arrays to cache, by name.
+        string_lists (dict): lists of strings to cache, by name. Strings must not contain newlines.
+        metadata (dict, optional): JSON serializable values to cache. Default is None."""
+    parent_dir, name = os.path.split(os.path.abspath(path))
+    os.makedirs(parent_dir, exist_ok=True)
+    temp_path = tempfile.mkdtemp(prefix="." + name + ".", dir=parent_dir)
+    try:
+        for array_name, array in arrays.items():
+            np.save(os.path.join(temp_path, array_name + ".npy"), np.asarray(array))
+        for list_name, strings in string_lists.items():
+            with open(_strings_filepath(temp_path, list_name), "w", encoding="utf-8") as out:
+                out.write("\n".join(strings))
+
+        index = {"version": CACHE_VERSION,
+                 "sources": fingerprint,
+                 "arrays": sorted(arrays),
+                 "string_lists": sorted(string_lists),
+                 "metadata": metadata if metadata is not None else {}}
+        with open(os.path.join(temp_path, INDEX_FILENAME), "w") as out:
+            json.dump(index, out)
+        _replace_dir(temp_path, path)
+    finally:
+        # left behind if the save failed, or if another process replaced path first
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+
+def _replace_dir(new_path, path):
+    """Moves the directory new_path to path. An existing directory at path is moved aside and
+    removed; its files are unlinked rather than overwritten, so open memory maps keep their data.
+    If another process moves its own directory to path first, new_path is left in place."""
+    stale_path = None
+    if os.path.exists(path):
+        stale_path = new_path + ".stale"
+        try:
+            os.replace(path, stale_path)
+        except FileNotFoundError:
+            stale_path = None
+    try:
+        os.replace(new_path, path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+    if stale_path is not None:
+        shutil.rmtree(stale_path, ignore_errors=True)
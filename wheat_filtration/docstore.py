@@ -0,0 +1,269 @@
+from array import array
+from collections.abc import Mapping
+import mmap
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+class DocumentStore(Mapping):
+    """Stores preprocessed documents as a single array of token IDs over a vocabulary
+    and an array of document offsets (CSR-style). Behaves like a read-only ordered
+    dictionary with document unique IDs as keys and document strings as values; the
+    strings are only built when a document is accessed.
+
+    Arguments:
+        doc_ids (iterable of str): the unique IDs of the documents, in corpus order.
+        token_ids (numpy.ndarray of int32): the token IDs of all documents, one document
+            after the other.
+        offsets (numpy.ndarray of int64): the position of the first token of each
+            document in token_ids, followed by the total number of tokens. The tokens of
+            document i are token_ids[offsets[i]:offsets[i + 1]].
+        vocabulary (iterable of str): the word corresponding with each token ID.
+
+    Attributes:
+        doc_ids (list of str): the unique IDs of the documents, in corpus order.
+        token_ids (numpy.ndarray of int32): the token IDs of all documents.
+        offsets (numpy.ndarray of int64): the document offsets into token_ids.
+        vocabulary (list of str): the word corresponding with each token ID.
+        term_index (dict): a dictionary mapping each vocabulary word to its token ID.
+        doc_lengths (numpy.ndarray of int64): the number of tokens in each document.
+        doc_term_matrix (scipy.sparse.csr_matrix): a CSR sparse matrix containing the counts
+            of each token ID in each document. Shape: (number of documents, vocabulary size)
+
+    Raises:
+        ValueError: If offsets does not contain one entry per document plus one.
+    """
+
+    def __init__(self, doc_ids, token_ids, offsets, vocabulary):
+        self._doc_ids = list(doc_ids)
+        self._positions = {doc_id: i for i, doc_id in enumerate(self._doc_ids)}
+        self._token_ids = np.asarray(token_ids, dtype=np.int32)
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._vocabulary = list(vocabulary)
+        if len(self._offsets) != len(self._doc_ids) + 1:
+            raise ValueError(
+                "offsets must contain one entry per document plus one.")
+        # built on first access
+        self._term_index = None
+        self._doc_term_matrix = None
+
+    @classmethod
+    def from_token_lists(cls, doc_ids, token_lists, vocabulary=()):
+        """Return a DocumentStore built from an iterable of tokenized documents.
+        Token IDs are the indices of words in vocabulary; words that are not in
+        vocabulary are appended to (a copy of) it in order of appearance.
+        Arguments:
+            doc_ids (iterable of str): the unique IDs of the documents.
+            token_lists (iterable of iterable of str): the tokens of each document.
+            vocabulary (iterable of str, optional): the initial vocabulary. Default is empty."""
+        vocabulary = list(vocabulary)
+        term_index = {word: i for i, word in enumerate(vocabulary)}
+        token_ids = []
+        offsets = [0]
+        for tokens in token_lists:
+            for word in tokens:
+                token_id = term_index.get(word)
+                if token_id is None:
+                    token_id = term_index[word] = len(vocabulary)
+                    vocabulary.append(word)
+                token_ids.append(token_id)
+            offsets.append(len(token_ids))
+        return cls(doc_ids, token_ids, offsets, vocabulary)
+
+    def __getitem__(self, doc_id):
+        return " ".join(self.doc_tokens(self._positions[doc_id]))
+
+    def __contains__(self, doc_id):
+        return doc_id in self._positions
+
+    def __iter__(self):
+        return iter(self._doc_ids)
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def position(self, doc_id):
+        """Return the position of the document with unique ID doc_id in the corpus."""
+        return self._positions[doc_id]
+
+    def doc_token_ids(self, position):
+        """Return the token IDs of the document at position (a view into token_ids)."""
+        return self._token_ids[self._offsets[position]:self._offsets[position + 1]]
+
+    def doc_tokens(self, position):
+        """Return the list of words of the document at position."""
+        return [self._vocabulary[token_id] for token_id in self.doc_token_ids(position)]
+
+    @property
+    def doc_ids(self):
+        """Get the document unique IDs"""
+        return self._doc_ids
+
+    @property
+    def token_ids(self):
+        """Get the token IDs of all documents"""
+        return self._token_ids
+
+    @property
+    def offsets(self):
+        """Get the document offsets into token_ids"""
+        return self._offsets
+
+    @property
+    def vocabulary(self):
+        """Get the words corresponding with the token IDs"""
+        return self._vocabulary
+
+    @property
+    def term_index(self):
+        """Get the dictionary mapping vocabulary words to token IDs"""
+        if self._term_index is None:
+            self._term_index = {word: i for i,
+                                word in enumerate(self._vocabulary)}
+        return self._term_index
+
+    @property
+    def doc_lengths(self):
+        """Get the number of tokens in each document"""
+        return np.diff(self._offsets)
+
+    @property
+    def doc_term_matrix(self):
+        """Get the document term count matrix"""
+        if self._doc_term_matrix is None:
+            # copy, since sum_duplicates sorts the indices in place
+            doc_term_matrix = csr_matrix((np.ones(len(self._token_ids), dtype=np.int32),
+                                          self._token_ids, self._offsets),
+                                         shape=(len(self), len(self._vocabulary)), copy=True)
+            doc_term_matrix.sum_duplicates()
+            self._doc_term_matrix = doc_term_matrix
+        return self._doc_term_matrix
+
+
+class MalletInputDocuments(Mapping):
+    """Read-only ordered mapping of document unique IDs to the full document text in a Mallet
+    input file (lines of the form <unique_id>\t<orig_doc_id>\t<text>). Only the byte offset
+    and length of each text are kept in memory; texts are read on access from a memory map
+    of the file.
+
+    Arguments:
+        filepath (str): the filepath of the Mallet input file.
+        doc_ids (iterable of str): the unique IDs of the documents, in file order.
+        starts (numpy.ndarray of int64): the byte offset of each document text in the file.
+        lengths (numpy.ndarray of int64): the length in bytes of each document text.
+        encoding (str, optional): the encoding of the file. Default is "utf-8".
+
+    Attributes:
+        filepath (str): the filepath of the Mallet input file.
+        doc_ids (list of str): the unique IDs of the documents, in file order.
+        starts (numpy.ndarray of int64): the byte offset of each document text in the file.
+        lengths (numpy.ndarray of int64): the length in bytes of each document text.
+    """
+
+    def __init__(self, filepath, doc_ids, starts, lengths, encoding="utf-8"):
+        self._filepath = filepath
+        self._doc_ids = list(doc_ids)
+        self._positions = {doc_id: i for i, doc_id in enumerate(self._doc_ids)}
+        self._starts = np.asarray(starts, dtype=np.int64)
+        self._lengths = np.asarray(lengths, dtype=np.int64)
+        self._encoding = encoding
+        # opened on first access
+        self._file = None
+        self._mmap = None
+
+    @classmethod
+    def from_file(cls, filepath, encoding="utf-8"):
+        """Return a MalletInputDocuments indexing filepath in one scan of the file.
+        If a unique ID appears more than once, the last text is used."""
+        doc_ids = []
+        positions = {}
+        starts = array("q")
+        lengths = array("q")
+        offset = 0
+        with open(filepath, "rb") as in_file:
+            for line in in_file:
+                unique_id, orig_doc_id, text = line.split(b"\t", 3)[:3]
+                doc_id = unique_id.decode(encoding)
+                start = offset + len(unique_id) + len(orig_doc_id) + 2
+                if doc_id in positions:
+                    starts[positions[doc_id]] = start
+                    lengths[positions[doc_id]] = len(text)
+                else:
+                    positions[doc_id] = len(doc_ids)
+                    doc_ids.append(doc_id)
+                    starts.append(start)
+                    lengths.append(len(text))
+                offset += len(line)
+        return cls(filepath, doc_ids, np.frombuffer(starts, dtype=np.int64),
+                   np.frombuffer(lengths, dtype=np.int64), encoding)
+
+    def _open(self):
+        self._file = open(self._filepath, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        """Close the memory map of the input file. It is reopened on the next access."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    def __getstate__(self):
+        # memory maps can't be pickled; reopen in the unpickled copy
+        state = self.__dict__.copy()
+        state["_file"] = None
+        state["_mmap"] = None
+        return state
+
+    def __getitem__(self, doc_id):
+        position = self._positions[doc_id]
+        if self._mmap is None:
+            self._open()
+        start = self._starts[position]
+        text = self._mmap[start:start + self._lengths[position]]
+        return text.decode(self._encoding).strip()
+
+    def __contains__(self, doc_id):
+        return doc_id in self._positions
+
+    def __iter__(self):
+        return iter(self._doc_ids)
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def line_bytes(self, doc_id):
+        """Return the line of the input file containing the document with unique ID doc_id,
+        as bytes, ending with a newline. The whole line is returned, including any fields
+        after the document text."""
+        position = self._positions[doc_id]
+        if self._mmap is None:
+            self._open()
+        start = self._starts[position]
+        end = self._mmap.find(b"\n", start)
+        if end == -1:
+            # the last line of a file without a final newline
+            return self._mmap[self._mmap.rfind(b"\n", 0, start) + 1:] + b"\n"
+        return self._mmap[self._mmap.rfind(b"\n", 0, start) + 1:end + 1]
+
+    @property
+    def filepath(self):
+        """Get the filepath of the Mallet input file"""
+        return self._filepath
+
+    @property
+    def doc_ids(self):
+        """Get the document unique IDs"""
+        return self._doc_ids
+
+    @property
+    def starts(self):
+        """Get the byte offsets of the document texts"""
+        return self._starts
+
+    @property
+    def lengths(self):
+        """Get the byte lengths of the document texts"""
+        return self._lengths
@@ -1,4 +1,19 @@
+import itertools
+import json
+import mmap
+import multiprocessing
+import os
+import tempfile
+import weakref
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from docstore import MalletInputDocuments
+import inference
+import instances
 import keywords
+import util
 
 
 def total_topic_proportion(document_topics, relevant_topics):
@@ -22,12 +37,75 @@ def keyword_proportion(document, keyword_list):
 
 def superkeyword_presence(document, superkeywords):
     """Return 1 if document contains any superkeywords, 0 if not."""
+    doc_tokens = set(document.split())
     for word in superkeywords:
-        if word in document.split():
+        if word in doc_tokens:
             return True
     return False
 
 
+def total_topic_proportions(doc_topic_proportions, relevant_topics):
+    """Return an array of the sum of relevant topic proportions for every document.
+    Batch version of total_topic_proportion.
+    Arguments:
+        doc_topic_proportions (numpy.ndarray): a matrix containing the topic
+            proportions of each document. Shape: (number of documents, number of topics)
+        relevant topics (iterable of int): a list of the numbers corresponding
+            with the topics considered relevant by the user."""
+    return doc_topic_proportions[:, list(relevant_topics)].sum(axis=1)
+
+
+def _term_indicator(term_index, words):
+    """Return a vector over the columns of term_index with a 1 for each column
+    belonging to a word in words. Words that are not in term_index are ignored."""
+    indicator = np.zeros(len(term_index))
+    columns = [term_index[word] for word in words if word in term_index]
+    indicator[columns] = 1
+    return indicator
+
+
+def _term_indicators(term_index, word_lists):
+    """Return a sparse matrix over the columns of term_index with one column per word list
+    in word_lists, holding a 1 for each column belonging to a word of that list (see
+    _term_indicator). Shape: (number of terms, number of word lists)"""
+    rows = []
+    columns = []
+    for column, words in enumerate(word_lists):
+        word_rows = {term_index[word] for word in words if word in term_index}
+        rows.extend(word_rows)
+        columns.extend([column] * len(word_rows))
+    return csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(term_index), len(word_lists)))
+
+
+def keyword_proportions(doc_term_matrix, term_index, keyword_list):
+    """Return an array of the proportion of words in each document that are present
+    in keyword_list. Batch version of keyword_proportion; documents without words
+    have a keyword proportion of 0.
+    Arguments:
+        doc_term_matrix (scipy.sparse.csr_matrix): counts of each term in each document.
+            Shape: (number of documents, number of terms)
+        term_index (dict): maps each term to its column in doc_term_matrix.
+        keyword_list (iterable of str): list of keywords."""
+    doc_lengths = np.asarray(doc_term_matrix.sum(axis=1)).ravel()
+    keyword_counts = doc_term_matrix.dot(
+        _term_indicator(term_index, keyword_list))
+    proportions = np.zeros(len(doc_lengths))
+    np.divide(keyword_counts, doc_lengths,
+              out=proportions, where=doc_lengths > 0)
+    return proportions
+
+
+def superkeyword_presences(doc_term_matrix, term_index, superkeywords):
+    """Return a boolean array that is True for each document containing any superkeywords.
+    Batch version of superkeyword_presence.
+    Arguments:
+        doc_term_matrix (scipy.sparse.csr_matrix): counts of each term in each document.
+            Shape: (number of documents, number of terms)
+        term_index (dict): maps each term to its column in doc_term_matrix.
+        superkeywords (iterable of str): list of superkeywords."""
+    return doc_term_matrix.dot(_term_indicator(term_index, superkeywords)) > 0
+
+
 class FilterHelper():
     """Creates a filter object containing filter criteria such as keyword list,
     superkeyword list, total topic proportion threshold, and keyword proportion
@@ -65,6 +143,15 @@ class FilterHelper():
         keyword_prop_threshold (float): the threshold of relevance for the proportion of words
             on the keyword list that appear in a document. If a document surpases the threshold,
             it is considered relevant. Default is 0.15.
+        total_topic_props (numpy.ndarray of float): total relevant topic proportion of each
+            document in topic_model.docs.
+        keyword_props (numpy.ndarray of float): keyword proportion of each document in topic_model.docs.
+        has_superkeyword (numpy.ndarray of bool): superkeyword presence of each document in
+            topic_model.docs.
+        The per-document arrays are computed when first used and cached. Setting relevant_topics,
+        keyword_list or superkeywords only discards the array that depends on it, and setting
+        a threshold discards nothing. Lists must be replaced through the setters, not modified
+        in place, for the cache to stay up to date.
 
     Raises:
         RuntimeError: if user enters both keyword list and n_keywords when using the
@@ -79,19 +166,23 @@ class FilterHelper():
                 topic_model, n_keywords, relevant_topics)
         self._keyword_list = keyword_list
 
-        lower_superkeys = [word.lower() for word in superkeywords]
         # TODO: deal with this appropriately when making lowercasing optional
-        extended_superkeys = [
-            word for word in topic_model.vocabulary if
-            word in lower_superkeys or
-            any([(chunk in lower_superkeys) for chunk in word.split('_')])
-        ]
-        self._superkeywords = extended_superkeys
+        lower_superkeys = {word.lower() for word in superkeywords}
+        # vocabulary words that are superkeywords or contain one as a chunk, in vocabulary order
+        superkeyword_ids = set()
+        for word in lower_superkeys:
+            superkeyword_ids.update(topic_model.chunk_index.get(word, ()))
+        self._superkeywords = [topic_model.vocabulary[word_id]
+                               for word_id in sorted(superkeyword_ids)]
 
         self._total_topic_prop_threshold = total_topic_prop_threshold
         self._keyword_prop_threshold = keyword_prop_threshold
         self._topic_model = topic_model
 
+        self._total_topic_props = None
+        self._keyword_props = None
+        self._has_superkeyword = None
+
     @property
     def topic_model(self):
         """Get topic_model used to create filter"""
@@ -99,9 +190,14 @@ class FilterHelper():
 
     @property
     def relevant_topics(self):
-        """Get list of relevant topics"""
+        """Get or set list of relevant topics"""
         return self._relevant_topics
 
+    @relevant_topics.setter
+    def relevant_topics(self, relevant_topics):
+        self._relevant_topics = relevant_topics
+        self._total_topic_props = None
+
     @property
     def keyword_list(self):
         """Get or set keyword list. Input either a list of keywords, or input an integer n
@@ -112,9 +208,11 @@ class FilterHelper():
     def keyword_list(self, keyword_list=None, n_keywords=None):
         if keyword_list is not None:
             self._keyword_list = keyword_list
+            self._keyword_props = None
         elif n_keywords is not None:
             self._keyword_list = keywords.rel_ent_key_list(
                 self.topic_model, n_keywords, self.relevant_topics)
+            self._keyword_props = None
         else:
             raise RuntimeError(
                 "Enter either a keyword list or an integer for number of keywords")
@@ -126,6 +224,7 @@ class FilterHelper():
     @superkeywords.setter
     def superkeywords(self, superkeywords):
         self._superkeywords = superkeywords
+        self._has_superkeyword = None
 
     @property
     def total_topic_prop_threshold(self):
@@ -143,6 +242,47 @@ class FilterHelper():
     def keyword_prop_threshold(self, keyword_prop_threshold):
         self._keyword_prop_threshold = keyword_prop_threshold
 
+    @property
+    def total_topic_props(self):
+        """Get the total relevant topic proportion of each document in topic_model.docs"""
+        if self._total_topic_props is None:
+            self._total_topic_props = total_topic_proportions(
+                self._topic_model.doc_topic_proportions, self._relevant_topics)
+        return self._total_topic_props
+
+    @property
+    def keyword_props(self):
+        """Get the keyword proportion of each document in topic_model.docs"""
+        if self._keyword_props is None:
+            self._keyword_props = keyword_proportions(
+                self._topic_model.doc_term_matrix, self._topic_model.term_index, self._keyword_list)
+        return self._keyword_props
+
+    @property
+    def has_superkeyword(self):
+        """Get the superkeyword presence of each document in topic_model.docs"""
+        if self._has_superkeyword is None:
+            self._has_superkeyword = superkeyword_presences(
+                self._topic_model.doc_term_matrix, self._topic_model.term_index, self._superkeywords)
+        return self._has_superkeyword
+
+    @property
+    def _empty_caches(self):
+        """Get the names of the proportions that are not cached yet"""
+        caches = [("total_topic_props", self._total_topic_props), ("keyword_props", self._keyword_props),
+                  ("has_superkeyword", self._has_superkeyword)]
+        return {name for name, cached in caches if cached is None}
+
+    def _fill_caches(self, total_topic_props=None, keyword_props=None, has_superkeyword=None):
+        """Cache the proportions given for the caches that are still empty, such as those
+        computed for several filters at once by _fill_proportion_caches."""
+        if self._total_topic_props is None:
+            self._total_topic_props = total_topic_props
+        if self._keyword_props is None:
+            self._keyword_props = keyword_props
+        if self._has_superkeyword is None:
+            self._has_superkeyword = has_superkeyword
+
 
 def is_relevant(doc, doc_topics, filter_helper):
     """Returns a boolean for relevance of given document. A document is considered
@@ -168,18 +308,248 @@ def is_relevant(doc, doc_topics, filter_helper):
     return has_superkeyword or passes_total_topic_thresh or passes_keyword_thresh
 
 
-def filter_corpus(topic_model, filter_helper):
+def _passed_thresholds(filter_helper, total_topic_props, keyword_props,
+                       total_topic_prop_threshold=None, keyword_prop_threshold=None):
+    """Return whether each document passes the total topic proportion threshold and the keyword
+    proportion threshold, as two boolean arrays. The thresholds default to those of filter_helper."""
+    if total_topic_prop_threshold is None:
+        total_topic_prop_threshold = filter_helper.total_topic_prop_threshold
+    if keyword_prop_threshold is None:
+        keyword_prop_threshold = filter_helper.keyword_prop_threshold
+    return total_topic_props > total_topic_prop_threshold, keyword_props > keyword_prop_threshold
+
+
+def _passes(filter_helper, total_topic_props, keyword_props, has_superkeyword,
+            total_topic_prop_threshold=None, keyword_prop_threshold=None):
+    """Return the relevance of each document from its proportions, by the criteria of is_relevant:
+    it contains a superkeyword, or passes either proportion threshold (see _passed_thresholds)."""
+    passes_total_topic_thresh, passes_keyword_thresh = _passed_thresholds(
+        filter_helper, total_topic_props, keyword_props, total_topic_prop_threshold, keyword_prop_threshold)
+    return has_superkeyword | passes_total_topic_thresh | passes_keyword_thresh
+
+
+def proportion_lists(topic_model, filter_helper, doc_positions=None):
+    """Return the total topic proportion, keyword proportion and superkeyword presence
+    of the documents in topic_model.docs, the features used to decide relevance.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter
+        properties.
+        doc_positions (array of int, optional): positions of the documents to compute the
+        features for. Default is None (all documents), in which case the arrays cached by
+        filter_helper are used if it was made for topic_model.
+    Returns:
+        total_topic_props (numpy.ndarray of float): total relevant topic proportion of each document.
+        keyword_props (numpy.ndarray of float): keyword proportion of each document.
+        has_superkeyword (numpy.ndarray of bool): superkeyword presence of each document."""
+    if doc_positions is None and filter_helper.topic_model is topic_model:
+        return filter_helper.total_topic_props, filter_helper.keyword_props, filter_helper.has_superkeyword
+
+    doc_term_matrix = topic_model.doc_term_matrix
+    term_index = topic_model.term_index
+    doc_topic_proportions = topic_model.doc_topic_proportions
+    if doc_positions is not None:
+        doc_term_matrix = doc_term_matrix[doc_positions]
+        doc_topic_proportions = doc_topic_proportions[doc_positions]
+
+    total_topic_props = total_topic_proportions(
+        doc_topic_proportions, filter_helper.relevant_topics)
+    keyword_props = keyword_proportions(
+        doc_term_matrix, term_index, filter_helper.keyword_list)
+    has_superkeyword = superkeyword_presences(
+        doc_term_matrix, term_index, filter_helper.superkeywords)
+    return total_topic_props, keyword_props, has_superkeyword
+
+
+# arrays memory-mapped by each worker process of _parallel_relevance_mask, and their numpy.memmap
+# keyword arguments, kept while the worker evaluates documents of the same model
+_worker_arrays = {}
+_worker_array_mapped_specs = {}
+
+# temporary files with the arrays of topic models that are not memory-mapped from a file, written
+# once per model for the worker processes of _parallel_relevance_mask and removed with the model
+_array_copies = weakref.WeakKeyDictionary()
+
+
+def _mapped_array_spec(array):
+    """Return the file region that array is memory-mapped from, as keyword arguments of
+    numpy.memmap, or None if array is not a C-contiguous view of a memory-mapped file."""
+    base = array
+    while isinstance(base, np.ndarray) and not (isinstance(base, np.memmap) and
+                                                isinstance(base.base, mmap.mmap)):
+        base = base.base
+    if not isinstance(base, np.memmap) or base.filename is None or not array.flags.c_contiguous:
+        return None
+    return {"filename": base.filename, "dtype": array.dtype.str, "shape": array.shape,
+            "offset": base.offset + array.ctypes.data - base.ctypes.data}
+
+
+def _worker_array_specs(topic_model):
+    """Return the numpy.memmap keyword arguments of the arrays of topic_model read by the worker
+    processes of _parallel_relevance_mask. Arrays memory-mapped from a file, like those of a
+    cached model, are mapped from the same file; other arrays are copied to a temporary file once
+    per model."""
+    arrays = {"doc_topic_proportions": topic_model.doc_topic_proportions,
+              "token_ids": topic_model.docs.token_ids, "offsets": topic_model.docs.offsets}
+    specs = {name: _mapped_array_spec(array) for name, array in arrays.items()}
+    if None in specs.values():
+        if topic_model not in _array_copies:
+            _array_copies[topic_model] = (tempfile.TemporaryDirectory(), {})
+        array_dir, copy_specs = _array_copies[topic_model]
+        for name, array in arrays.items():
+            if specs[name] is None and name not in copy_specs:
+                array = np.ascontiguousarray(array)
+                filepath = os.path.join(array_dir.name, name + ".bin")
+                array.tofile(filepath)
+                copy_specs[name] = {"filename": filepath, "dtype": array.dtype.str,
+                                    "shape": array.shape, "offset": 0}
+            if specs[name] is None:
+                specs[name] = copy_specs[name]
+    return specs
+
+
+def _map_worker_arrays(array_specs):
+    """Memory-maps the model arrays described by array_specs (see _worker_array_specs), unless
+    they are already mapped. Runs in each worker process."""
+    for name, spec in array_specs.items():
+        if _worker_array_mapped_specs.get(name) == spec:
+            continue
+        if np.prod(spec["shape"]) == 0:
+            # empty files cannot be memory-mapped
+            _worker_arrays[name] = np.zeros(spec["shape"], dtype=spec["dtype"])
+        else:
+            _worker_arrays[name] = np.memmap(mode="r", **spec)
+        _worker_array_mapped_specs[name] = spec
+
+
+def _relevance_criteria(filter_helper, term_index):
+    """Return the criteria of filter_helper used by _token_relevance, with keywords and
+    superkeywords as indicators over the token IDs of term_index."""
+    return {"relevant_topics": list(filter_helper.relevant_topics),
+            "keyword_indicator": _term_indicator(term_index, filter_helper.keyword_list) > 0,
+            "superkeyword_indicator": _term_indicator(term_index, filter_helper.superkeywords) > 0,
+            "total_topic_prop_threshold": filter_helper.total_topic_prop_threshold,
+            "keyword_prop_threshold": filter_helper.keyword_prop_threshold}
+
+
+def _token_relevance(token_ids, offsets, doc_topic_proportions, criteria):
+    """Return the relevance of consecutive documents computed from their token IDs, exactly
+    like relevance_mask.
+    Arguments:
+        token_ids (numpy.ndarray of int): the token IDs of the documents, one after the other.
+        offsets (numpy.ndarray of int): the position of the first token of each document in
+            token_ids, followed by the position after the last token. May start above 0.
+        doc_topic_proportions (numpy.ndarray): the topic proportions of each document.
+        criteria (dict): see _relevance_criteria."""
+    doc_starts = offsets[:-1] - offsets[0]
+    doc_ends = offsets[1:] - offsets[0]
+    doc_lengths = doc_ends - doc_starts
+
+    # number of keywords and superkeywords in each document, from running counts over the tokens
+    keyword_counts = np.concatenate(
+        ([0], np.cumsum(criteria["keyword_indicator"][token_ids])))
+    keyword_counts = keyword_counts[doc_ends] - keyword_counts[doc_starts]
+    superkeyword_counts = np.concatenate(
+        ([0], np.cumsum(criteria["superkeyword_indicator"][token_ids])))
+    superkeyword_counts = superkeyword_counts[doc_ends] - superkeyword_counts[doc_starts]
+
+    keyword_props = np.zeros(len(doc_lengths))
+    np.divide(keyword_counts, doc_lengths, out=keyword_props, where=doc_lengths > 0)
+    total_topic_props = total_topic_proportions(
+        doc_topic_proportions, criteria["relevant_topics"])
+    return (superkeyword_counts > 0) | (total_topic_props > criteria["total_topic_prop_threshold"]) | \
+        (keyword_props > criteria["keyword_prop_threshold"])
+
+
+def _doc_range_relevance(task):
+    """Return the relevance of the documents in the range (start, stop) of task, a tuple
+    (array_specs, criteria, start, stop) (see _worker_array_specs and _relevance_criteria).
+    Runs in the worker processes of _parallel_relevance_mask."""
+    array_specs, criteria, start, stop = task
+    _map_worker_arrays(array_specs)
+    offsets = np.asarray(_worker_arrays["offsets"][start:stop + 1])
+    return _token_relevance(_worker_arrays["token_ids"][offsets[0]:offsets[-1]], offsets,
+                            _worker_arrays["doc_topic_proportions"][start:stop], criteria)
+
+
+def _parallel_relevance_mask(topic_model, filter_helper, processes=None, docs_per_task=None, pool=None):
+    """Returns relevance_mask(topic_model, filter_helper), computed by a pool of worker processes
+    on contiguous ranges of documents. Every worker memory-maps the doc topic proportions and
+    token IDs from a file (see _worker_array_specs), instead of receiving a pickled copy, and keeps
+    them mapped for the next ranges of the same model. A new pool of processes workers is started
+    unless pool is given."""
+    docs = topic_model.docs
+    n_docs = len(docs)
+    if processes is None:
+        processes = os.cpu_count()
+    if docs_per_task is None:
+        docs_per_task = max(1, -(-n_docs // (4 * processes)))
+    array_specs = _worker_array_specs(topic_model)
+    criteria = _relevance_criteria(filter_helper, docs.term_index)
+
+    tasks = [(array_specs, criteria, start, min(start + docs_per_task, n_docs))
+             for start in range(0, n_docs, docs_per_task)]
+    if pool is None:
+        with multiprocessing.Pool(processes) as pool:
+            masks = list(pool.imap(_doc_range_relevance, tasks))
+    else:
+        masks = list(pool.imap(_doc_range_relevance, tasks))
+    return np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+
+
+def relevance_mask(topic_model, filter_helper, processes=1, pool=None):
+    """Returns a boolean array with the relevance of every document in topic_model.docs,
+    computed for all documents at once. Same criteria as is_relevant.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter
+        properties.
+        processes (int, optional): number of worker processes evaluating ranges of documents
+        in parallel. The result is the same for any number of processes, but the proportions
+        cached by filter_helper are only used without worker processes. None means one per CPU.
+        Default is 1 (no worker processes).
+        pool (multiprocessing.pool.Pool, optional): a pool of worker processes to evaluate the
+        documents, so that repeated calls reuse its processes instead of starting new ones. The
+        documents are split into ranges for processes workers, or one per CPU if processes is 1
+        or None. Default is None (no pool).
+    Returns:
+        (numpy.ndarray of bool): relevance of each document, in the order of topic_model.docs"""
+    if pool is not None:
+        return _parallel_relevance_mask(topic_model, filter_helper,
+                                        None if processes == 1 else processes, pool=pool)
+    if processes != 1:
+        return _parallel_relevance_mask(topic_model, filter_helper, processes)
+    total_topic_props, keyword_props, has_superkeyword = proportion_lists(
+        topic_model, filter_helper)
+    return _passes(filter_helper, total_topic_props, keyword_props, has_superkeyword)
+
+
+def filter_corpus(topic_model, filter_helper, batch=True, processes=1, pool=None):
     """Filters corpus used to make topic_model according to criteria entered in filter_helper.
     Arguments:
         topic_model (TopicModel): a TopicModel object instantiated with a corpus or
         files from a Mallet topic model.
         filter_helper (FilterHelper): a FilterHelper object instantiated with filter
         properties.
+        batch (bool, optional): Whether to evaluate all documents at once with relevance_mask.
+        If False, each document is evaluated with is_relevant. Default is True.
+        processes (int, optional): number of worker processes for relevance_mask, if batch is True.
+        Default is 1 (no worker processes).
+        pool (multiprocessing.pool.Pool, optional): a pool of worker processes for relevance_mask,
+        if batch is True. Default is None (no pool).
     Returns:
         subcorpus (dict): a dictionary containing the subset of the corpus that passed
         the relevance filter. keys are the unique document ids and values are the (unprocessed)
         document text"""
     subcorpus = {}
+    if batch:
+        doc_ids = list(topic_model.docs)
+        for i in np.flatnonzero(relevance_mask(topic_model, filter_helper, processes, pool)):
+            subcorpus[doc_ids[i]] = topic_model.full_docs[doc_ids[i]]
+        return subcorpus
+
     for i, doc_id in enumerate(topic_model.docs):
         doc = topic_model.docs[doc_id]
         doc_topics = topic_model.doc_topic_proportions[i, :]
@@ -188,28 +558,555 @@ def filter_corpus(topic_model, filter_helper):
             subcorpus[doc_id] = topic_model.full_docs[doc_id]
     return subcorpus
 
-#####################################################
-######### under this line are things it would be nice to add later #############
-# TODO (faunam|6/20/19): implement
 
+class FilterResult():
+    """The result of filtering the corpus used to make a topic model: which documents are
+    relevant and which criteria each document passed. Only boolean arrays are held; the full
+    texts of relevant documents are read from topic_model.full_docs as they are exported.
+
+    Arguments:
+        topic_model (TopicModel): the topic model of the filtered corpus.
+        has_superkeyword (numpy.ndarray of bool): superkeyword presence of each document.
+        passes_total_topic_thresh (numpy.ndarray of bool): whether each document passes the
+            total topic proportion threshold.
+        passes_keyword_thresh (numpy.ndarray of bool): whether each document passes the
+            keyword proportion threshold.
+
+    Attributes:
+        topic_model (TopicModel): the topic model of the filtered corpus.
+        mask (numpy.ndarray of bool): relevance of each document, in the order of topic_model.docs.
+        indices (numpy.ndarray of int): positions of the relevant documents in topic_model.docs.
+        doc_ids (list of str): unique IDs of the relevant documents.
+        has_superkeyword, passes_total_topic_thresh, passes_keyword_thresh (numpy.ndarray of bool):
+            the criteria passed by each document, in the order of topic_model.docs.
+    """
+
+    def __init__(self, topic_model, has_superkeyword, passes_total_topic_thresh, passes_keyword_thresh):
+        self._topic_model = topic_model
+        self._has_superkeyword = has_superkeyword
+        self._passes_total_topic_thresh = passes_total_topic_thresh
+        self._passes_keyword_thresh = passes_keyword_thresh
+        self._mask = has_superkeyword | passes_total_topic_thresh | passes_keyword_thresh
+        self._indices = np.flatnonzero(self._mask)
+
+    def __len__(self):
+        return len(self._indices)
+
+    @property
+    def topic_model(self):
+        """Get the topic model of the filtered corpus"""
+        return self._topic_model
+
+    @property
+    def mask(self):
+        """Get the relevance of each document"""
+        return self._mask
+
+    @property
+    def indices(self):
+        """Get the positions of the relevant documents"""
+        return self._indices
+
+    @property
+    def doc_ids(self):
+        """Get the unique IDs of the relevant documents"""
+        all_doc_ids = self._topic_model.docs.doc_ids
+        return [all_doc_ids[i] for i in self._indices]
+
+    @property
+    def has_superkeyword(self):
+        """Get the superkeyword presence of each document"""
+        return self._has_superkeyword
+
+    @property
+    def passes_total_topic_thresh(self):
+        """Get whether each document passes the total topic proportion threshold"""
+        return self._passes_total_topic_thresh
+
+    @property
+    def passes_keyword_thresh(self):
+        """Get whether each document passes the keyword proportion threshold"""
+        return self._passes_keyword_thresh
 
-def proportion_lists():
-    """makes a matrix or list of ttp, superkeyword, and keyword proportion for the docs in corpus
-    and sets the respective topic model attributes"""
-    pass
+    def iter_docs(self):
+        """Yield the unique ID and full text of each relevant document, in corpus order."""
+        full_docs = self._topic_model.full_docs
+        for doc_id in self.doc_ids:
+            yield doc_id, full_docs[doc_id]
 
+    def to_subcorpus(self):
+        """Return the relevant documents as a dictionary of unique IDs and full texts, see filter_corpus."""
+        return dict(self.iter_docs())
 
-def subset_quality(threshs, labeled_subset):  # also had args word_list_gen and scorefun
-    """Calculate F1 score for the array of thresholds threshs
-    (max topic prop, total topic prop, vocab prop, and number of words
-    in vocabulary list) on labeled subset"""
-    pass
+    def _iter_records(self):
+        """Yield the unique ID, full text and criteria flags of each relevant document."""
+        all_doc_ids = self._topic_model.docs.doc_ids
+        full_docs = self._topic_model.full_docs
+        for i in self._indices:
+            yield (all_doc_ids[i], full_docs[all_doc_ids[i]], bool(self._has_superkeyword[i]),
+                   bool(self._passes_total_topic_thresh[i]), bool(self._passes_keyword_thresh[i]))
 
+    def to_mallet_input(self, output_filepath):
+        """Write the relevant documents to output_filepath in the Mallet input format,
+        "<unique_id>\t<orig_doc_id>\t<text>". If the full documents were read from a Mallet
+        input file, their lines are copied from it unchanged; otherwise the unique ID is also
+        used as the original document ID."""
+        full_docs = self._topic_model.full_docs
+        with open(output_filepath, "wb") as out:
+            if isinstance(full_docs, MalletInputDocuments):
+                for doc_id in self.doc_ids:
+                    out.write(full_docs.line_bytes(doc_id))
+            else:
+                for doc_id, text in self.iter_docs():
+                    out.write("{}\t{}\t{}\n".format(doc_id, doc_id, text).encode("utf-8"))
+
+    def to_jsonl(self, output_filepath):
+        """Write the relevant documents to output_filepath as JSON lines with the keys "id",
+        "text", "has_superkeyword", "passes_total_topic_thresh" and "passes_keyword_thresh"."""
+        keys = ["id", "text", "has_superkeyword",
+                "passes_total_topic_thresh", "passes_keyword_thresh"]
+        with open(output_filepath, "w", encoding="utf-8") as out:
+            for record in self._iter_records():
+                out.write(json.dumps(dict(zip(keys, record))) + "\n")
+
+    def to_parquet(self, output_filepath, batch_size=10000):
+        """Write the relevant documents to output_filepath as a Parquet file with the columns
+        of to_jsonl, batch_size documents at a time. Requires pyarrow.
+        Raises:
+            ImportError: if pyarrow is not installed."""
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Writing Parquet files requires pyarrow (pip install pyarrow).")
+        schema = pyarrow.schema([("id", pyarrow.string()), ("text", pyarrow.string()),
+                                 ("has_superkeyword", pyarrow.bool_()),
+                                 ("passes_total_topic_thresh", pyarrow.bool_()),
+                                 ("passes_keyword_thresh", pyarrow.bool_())])
+        with pyarrow.parquet.ParquetWriter(output_filepath, schema) as writer:
+            records = self._iter_records()
+            batch = list(itertools.islice(records, batch_size))
+            while batch:
+                writer.write_batch(pyarrow.record_batch(
+                    [list(column) for column in zip(*batch)], schema=schema))
+                batch = list(itertools.islice(records, batch_size))
+
+
+def filter_result(topic_model, filter_helper):
+    """Filters corpus used to make topic_model according to criteria entered in filter_helper,
+    like filter_corpus, without copying any document text.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter
+        properties.
+    Returns:
+        (FilterResult): the relevant documents and the criteria each document passed."""
+    total_topic_props, keyword_props, has_superkeyword = proportion_lists(
+        topic_model, filter_helper)
+    return FilterResult(topic_model, has_superkeyword,
+                        *_passed_thresholds(filter_helper, total_topic_props, keyword_props))
+
+
+def filter_mallet_files(filter_helper, mallet_doctopic_filepath, mallet_instance_filepath,
+                        mallet_input_filepath, output_filepath, chunk_size=2**24):
+    """Filters a corpus modeled with Mallet straight from the Mallet files, without loading it,
+    and writes the lines of the relevant documents in the Mallet input file to output_filepath.
+    The doc topics file, the instance list and the input file are read in lockstep, one chunk
+    of documents at a time, so memory use depends on chunk_size and not on the corpus size.
+    The criteria are those of filter_corpus (empty documents are evaluated too).
+    Arguments:
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter properties.
+        Only its keyword list, superkeywords, relevant topics and thresholds are used.
+        mallet_doctopic_filepath (str): the Mallet doc topics file.
+        mallet_instance_filepath (str): the Mallet instance list file (".mallet") the model was trained on.
+        mallet_input_filepath (str): the Mallet input file the instance list was imported from.
+        output_filepath (str): the file to write the relevant lines of the input file to.
+        chunk_size (int, optional): number of bytes of the doc topics file to read at a time.
+        Default is 2**24.
+    Returns:
+        (int): the number of relevant documents.
+    Raises:
+        ValueError: if the files do not list the same documents in the same order."""
+    doc_instances = instances.iter_instances(mallet_instance_filepath)
+    criteria = None
+    n_relevant = 0
+    with open(mallet_input_filepath, "rb") as in_file, open(output_filepath, "wb") as out:
+        for doc_ids, doc_topic_proportions in util.iter_doctopic_chunks(
+                mallet_doctopic_filepath, chunk_size=chunk_size):
+            doc_token_ids = []
+            lines = []
+            for doc_id in doc_ids:
+                instance_id, token_ids, alphabet = next(doc_instances, (None, None, None))
+                line = in_file.readline()
+                if instance_id != doc_id or \
+                        line.split(b"\t", 1)[0].decode("utf-8").strip() != doc_id:
+                    raise ValueError(
+                        "The Mallet files do not match at document {}".format(doc_id))
+                doc_token_ids.append(token_ids)
+                lines.append(line if line.endswith(b"\n") else line + b"\n")
+            if criteria is None:
+                criteria = _relevance_criteria(
+                    filter_helper, {word: i for i, word in enumerate(alphabet)})
+
+            offsets = np.zeros(len(doc_ids) + 1, dtype=np.int64)
+            np.cumsum([len(token_ids) for token_ids in doc_token_ids], out=offsets[1:])
+            mask = _token_relevance(np.concatenate(doc_token_ids), offsets,
+                                    doc_topic_proportions, criteria)
+            for i in np.flatnonzero(mask):
+                out.write(lines[i])
+            n_relevant += int(mask.sum())
+    return n_relevant
+
+
+def new_doc_proportion_lists(filter_helper, docs, inferencer):
+    """Return the total topic proportion, keyword proportion and superkeyword presence of new
+    documents that were not used to make the topic model, like proportion_lists. The topic
+    proportions of the new documents are inferred with the topics of the model held fixed.
+    Arguments:
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter
+        properties. Only its keyword list, superkeywords and relevant topics are used.
+        docs (dict): an ordered mapping of unique document IDs to the new document texts.
+        inferencer (inference.TopicInferencer): infers topic proportions with the topic model.
+    Returns:
+        total_topic_props (numpy.ndarray of float): total relevant topic proportion of each document.
+        keyword_props (numpy.ndarray of float): keyword proportion of each document.
+        has_superkeyword (numpy.ndarray of bool): superkeyword presence of each document."""
+    doc_store = inferencer.prepare_docs(docs)
+    doc_term_matrix = doc_store.doc_term_matrix
+    total_topic_props = total_topic_proportions(
+        inferencer.infer(doc_term_matrix), filter_helper.relevant_topics)
+    keyword_props = keyword_proportions(
+        doc_term_matrix, doc_store.term_index, filter_helper.keyword_list)
+    has_superkeyword = superkeyword_presences(
+        doc_term_matrix, doc_store.term_index, filter_helper.superkeywords)
+    return total_topic_props, keyword_props, has_superkeyword
+
+
+def filter_new_docs(topic_model, filter_helper, docs, stop_words=(), inferencer=None, **kwargs):
+    """Filters new documents that were not used to make topic_model, without retraining it:
+    the topic proportions of the new documents are inferred with the topics of topic_model held
+    fixed (see inference.infer_doc_topic_proportions), and the criteria of filter_corpus are
+    applied to them.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter
+        properties. Only its keyword list, superkeywords, relevant topics and thresholds are used.
+        docs (dict): an ordered mapping of unique document IDs to the new document texts.
+        The texts are preprocessed with inference.prepare_docs.
+        stop_words (iterable of str, optional): words to remove from the new documents. Should
+        match the stopwords removed when making topic_model. Default is empty.
+        inferencer (inference.TopicInferencer, optional): infers topic proportions with
+        topic_model; reuse one to filter many batches of new documents. Default is None (one
+        is made from topic_model, stop_words and the other keyword arguments).
+        Other keyword arguments (alpha, beta, iterations, tolerance, batch_size) are passed to
+        inference.TopicInferencer. By default, alpha is estimated from the topic
+        proportions of topic_model with inference.estimate_alpha.
+    Returns:
+        subcorpus (dict): a dictionary containing the new documents that passed the relevance
+        filter. keys are the unique document ids and values are the document text"""
+    if inferencer is None:
+        inferencer = inference.TopicInferencer(
+            topic_model, stop_words=stop_words, **kwargs)
+    total_topic_props, keyword_props, has_superkeyword = new_doc_proportion_lists(
+        filter_helper, docs, inferencer)
+    mask = _passes(filter_helper, total_topic_props, keyword_props, has_superkeyword)
+    doc_ids = list(docs)
+    return {doc_ids[i]: docs[doc_ids[i]] for i in np.flatnonzero(mask)}
+
+
+def _fill_proportion_caches(topic_model, filter_helpers):
+    """Compute the per-document proportions missing from the caches of filter_helpers for all
+    of them at once: the doc term counts are read once, and the keyword and superkeyword
+    indicators of all filters are multiplied with them as the columns of one sparse matrix.
+    Total topic proportions are summed per filter, exactly like total_topic_proportions."""
+    doc_term_matrix = topic_model.doc_term_matrix
+    term_index = topic_model.term_index
+
+    doc_topic_proportions = topic_model.doc_topic_proportions
+    for helper in filter_helpers:
+        if "total_topic_props" in helper._empty_caches:
+            helper._fill_caches(total_topic_props=total_topic_proportions(
+                doc_topic_proportions, helper.relevant_topics))
+
+    missing_keywords = [helper for helper in filter_helpers if "keyword_props" in helper._empty_caches]
+    if missing_keywords:
+        doc_lengths = np.asarray(doc_term_matrix.sum(axis=1)).ravel()
+        keyword_counts = doc_term_matrix.dot(_term_indicators(
+            term_index, [helper.keyword_list for helper in missing_keywords])).toarray()
+        keyword_props = np.zeros(keyword_counts.shape)
+        np.divide(keyword_counts, doc_lengths[:, None], out=keyword_props,
+                  where=doc_lengths[:, None] > 0)
+        for column, helper in enumerate(missing_keywords):
+            helper._fill_caches(keyword_props=keyword_props[:, column])
+
+    missing_superkeywords = [helper for helper in filter_helpers if "has_superkeyword" in helper._empty_caches]
+    if missing_superkeywords:
+        superkeyword_counts = doc_term_matrix.dot(_term_indicators(
+            term_index, [helper.superkeywords for helper in missing_superkeywords])).toarray()
+        for column, helper in enumerate(missing_superkeywords):
+            helper._fill_caches(has_superkeyword=superkeyword_counts[:, column] > 0)
+
+
+def relevance_masks(topic_model, filter_helpers):
+    """Returns one boolean relevance array (see relevance_mask) per filter, evaluating all
+    filters in one pass over the corpus. Proportions already cached by a filter are reused.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helpers (iterable of FilterHelper): FilterHelper objects made for topic_model.
+    Returns:
+        (list of numpy.ndarray of bool): relevance of each document for each filter, in the
+        order of filter_helpers.
+    Raises:
+        ValueError: if a filter was not made for topic_model."""
+    filter_helpers = list(filter_helpers)
+    if any(helper.topic_model is not topic_model for helper in filter_helpers):
+        raise ValueError("All filters must be made for the given topic model")
+    _fill_proportion_caches(topic_model, filter_helpers)
+    return [relevance_mask(topic_model, helper) for helper in filter_helpers]
+
+
+def filter_corpora(topic_model, filter_helpers):
+    """Filters the corpus used to make topic_model with each of filter_helpers, evaluating all
+    filters in one pass over the corpus (see relevance_masks). The full text of a document is
+    read once, however many filters it passes.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helpers (iterable of FilterHelper): FilterHelper objects made for topic_model.
+    Returns:
+        (list of dict): one subcorpus (see filter_corpus) per filter, in the order of filter_helpers.
+    Raises:
+        ValueError: if a filter was not made for topic_model."""
+    masks = relevance_masks(topic_model, filter_helpers)
+    doc_ids = topic_model.docs.doc_ids
+    subcorpora = [{} for _ in masks]
+    if not masks:
+        return subcorpora
+    passing_filters = np.stack(masks, axis=1)
+    for i in np.flatnonzero(passing_filters.any(axis=1)):
+        doc_text = topic_model.full_docs[doc_ids[i]]
+        for filter_number in np.flatnonzero(passing_filters[i]):
+            subcorpora[filter_number][doc_ids[i]] = doc_text
+    return subcorpora
+
+
+def relevance_scores(topic_model, filter_helper, topic_weight=1.0, keyword_weight=1.0,
+                     superkeyword_weight=1.0):
+    """Return a combined relevance score for every document in topic_model.docs: the weighted
+    sum of its total topic proportion, keyword proportion and superkeyword presence (1 or 0).
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter
+        properties.
+        topic_weight (float, optional): weight of the total topic proportion. Default is 1.0.
+        keyword_weight (float, optional): weight of the keyword proportion. Default is 1.0.
+        superkeyword_weight (float, optional): weight of superkeyword presence. Default is 1.0,
+        which ranks documents containing superkeywords first.
+    Returns:
+        (numpy.ndarray of float): the score of each document, in the order of topic_model.docs"""
+    total_topic_props, keyword_props, has_superkeyword = proportion_lists(
+        topic_model, filter_helper)
+    return topic_weight * total_topic_props + keyword_weight * keyword_props + \
+        superkeyword_weight * has_superkeyword
+
+
+def _ranked_positions(scores, start, stop):
+    """Return the positions of the documents ranked start to stop - 1 by descending score,
+    with ties ranked by position, without sorting all scores: the scores at both ends of the
+    ranks are found by partitioning, and only the documents scoring strictly between them are
+    sorted. Documents tied at either end are already in position order, so they are sliced."""
+    n_docs = len(scores)
+    stop = min(stop, n_docs)
+    if start >= stop:
+        return np.zeros(0, dtype=np.int64)
+    upper, lower = np.partition(scores, [n_docs - stop, n_docs - 1 - start])[
+        [n_docs - 1 - start, n_docs - stop]]
+    upper_ties = np.flatnonzero(scores == upper)
+    upper_ties = upper_ties[start - np.count_nonzero(scores > upper):]
+    if lower == upper:
+        return upper_ties[:stop - start]
+    between = np.flatnonzero((scores > lower) & (scores < upper))
+    between = between[np.lexsort((between, -scores[between]))]
+    lower_ties = np.flatnonzero(scores == lower)
+    lower_ties = lower_ties[:stop - np.count_nonzero(scores > lower)]
+    return np.concatenate((upper_ties, between, lower_ties))
+
+
+def rank_corpus(topic_model, filter_helper, k, **weights):
+    """Return the k most relevant documents of the corpus used to make topic_model, ranked by
+    relevance_scores. Ties are ranked in corpus order.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter
+        properties.
+        k (int): number of documents to return.
+        **weights: topic_weight, keyword_weight and superkeyword_weight for relevance_scores.
+    Returns:
+        (list of tuple): (unique document id, score) of the top k documents, most relevant first.
+        Full document texts are in topic_model.full_docs."""
+    scores = relevance_scores(topic_model, filter_helper, **weights)
+    doc_ids = topic_model.docs.doc_ids
+    return [(doc_ids[i], float(scores[i])) for i in _ranked_positions(scores, 0, k)]
+
+
+def iter_ranked_pages(topic_model, filter_helper, page_size=100, **weights):
+    """Yield the documents of the corpus used to make topic_model ranked by relevance_scores,
+    one page at a time. The ranking is selected in blocks as the pages are read, each block
+    twice as deep as the one before, so reading the whole ranking partitions the scores only
+    about log2(n_docs / page_size) times, and reading a few pages never sorts the whole corpus.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter
+        properties.
+        page_size (int, optional): number of documents per page. Default is 100.
+        **weights: topic_weight, keyword_weight and superkeyword_weight for relevance_scores.
+    Yields:
+        (list of tuple): (unique document id, score) of the documents on the next page."""
+    scores = relevance_scores(topic_model, filter_helper, **weights)
+    doc_ids = topic_model.docs.doc_ids
+    # positions of the documents ranked block_start to block_stop - 1
+    block = np.zeros(0, dtype=np.int64)
+    block_start = block_stop = 0
+    for start in range(0, len(scores), page_size):
+        stop = start + page_size
+        if stop > block_stop:
+            depth = max(stop, 2 * block_stop)
+            block = np.concatenate((block[start - block_start:],
+                                    _ranked_positions(scores, block_stop, depth)))
+            block_start, block_stop = start, depth
+        yield [(doc_ids[i], float(scores[i])) for i in block[start - block_start:stop - block_start]]
+
+
+def _labeled_features(topic_model, filter_helper, labels):
+    """Return the features (see proportion_lists) and the labels of the labeled documents
+    in topic_model.docs, in corpus order, as well as their doc IDs. Labeled documents that
+    are not in topic_model.docs are ignored."""
+    docs = topic_model.docs
+    labeled = sorted((docs.position(doc_id), doc_id)
+                     for doc_id in labels if doc_id in docs)
+    doc_positions = np.array([position for position, _ in labeled], dtype=np.int64)
+    doc_ids = [doc_id for _, doc_id in labeled]
+    is_relevant_label = np.array([labels[doc_id] == 1 for doc_id in doc_ids], dtype=bool)
+    features = proportion_lists(topic_model, filter_helper, doc_positions)
+    return features, is_relevant_label, doc_ids
+
+
+def _safe_divide(numerator, denominator):
+    """Elementwise numerator/denominator, with 0 where the denominator is 0 (guards against 0/0)."""
+    quotient = np.zeros(np.broadcast(numerator, denominator).shape)
+    np.divide(numerator, denominator, out=quotient, where=denominator > 0)
+    return quotient
+
+
+def _count_below(total_topic_props, keyword_props, total_topic_prop_thresholds,
+                 keyword_prop_thresholds, weights):
+    """Return a matrix whose element [i, j] is the total weight of the documents with
+    total_topic_props <= total_topic_prop_thresholds[i] and keyword_props <= keyword_prop_thresholds[j],
+    i.e. the documents that pass neither threshold. Thresholds must be sorted.
+    Each document is counted once in a 2d histogram over threshold bins, and the cumulative
+    sums of the histogram give the counts for every threshold pair."""
+    n_ttp, n_kp = len(total_topic_prop_thresholds), len(keyword_prop_thresholds)
+    # index of the smallest threshold that each document does not pass
+    ttp_bins = np.searchsorted(total_topic_prop_thresholds, total_topic_props, side="left")
+    kp_bins = np.searchsorted(keyword_prop_thresholds, keyword_props, side="left")
+    histogram = np.bincount(ttp_bins * (n_kp + 1) + kp_bins, weights=weights,
+                            minlength=(n_ttp + 1) * (n_kp + 1)).reshape(n_ttp + 1, n_kp + 1)
+    return histogram.cumsum(axis=0).cumsum(axis=1)[:n_ttp, :n_kp]
+
+
+def subset_quality(topic_model, filter_helper, labels, total_topic_prop_thresholds,
+                   keyword_prop_thresholds):
+    """Calculate precision, recall and F1 score on labeled documents for every pair of
+    total topic proportion and keyword proportion thresholds, using the keyword list,
+    superkeywords and relevant topics of filter_helper. The features of the labeled documents
+    are computed once, and all threshold pairs are scored at once with cumulative counts.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter
+        properties.
+        labels (dict): maps the unique IDs of labeled documents to 1 (relevant) or 0 (not relevant).
+        Documents that are not in topic_model.docs are ignored.
+        total_topic_prop_thresholds (iterable of float): total topic proportion thresholds to try.
+        keyword_prop_thresholds (iterable of float): keyword proportion thresholds to try.
+    Returns:
+        (dict): a dictionary containing:
+            "total_topic_prop_thresholds", "keyword_prop_thresholds" (numpy.ndarray): the sorted,
+            unique thresholds, which index the rows and columns of the tables.
+            "true_pos", "false_pos", "true_neg", "false_neg" (numpy.ndarray of int): the counts
+            of labeled documents for each threshold pair.
+            "precision", "recall", "f1" (numpy.ndarray of float): scores for each threshold pair.
+            "best" (tuple): (total topic prop threshold, keyword prop threshold, F1 score) of
+            the threshold pair with the highest F1 score."""
+    total_topic_prop_thresholds = np.unique(np.asarray(total_topic_prop_thresholds, dtype=float))
+    keyword_prop_thresholds = np.unique(np.asarray(keyword_prop_thresholds, dtype=float))
+    if len(total_topic_prop_thresholds) == 0 or len(keyword_prop_thresholds) == 0:
+        raise ValueError("Enter at least one threshold of each kind")
+    (total_topic_props, keyword_props, has_superkeyword), is_relevant_label, _ = \
+        _labeled_features(topic_model, filter_helper, labels)
+
+    # documents with superkeywords are relevant for every threshold pair
+    candidates = ~has_superkeyword
+    n_relevant = int(is_relevant_label.sum())
+    n_irrelevant = len(is_relevant_label) - n_relevant
+    # documents that pass neither threshold, all and labeled relevant, for each threshold pair
+    rejected = _count_below(total_topic_props[candidates], keyword_props[candidates],
+                            total_topic_prop_thresholds, keyword_prop_thresholds, None)
+    false_neg = np.rint(_count_below(
+        total_topic_props[candidates], keyword_props[candidates], total_topic_prop_thresholds,
+        keyword_prop_thresholds, is_relevant_label[candidates].astype(float))).astype(np.int64)
+    true_neg = np.rint(rejected).astype(np.int64) - false_neg
+    true_pos = n_relevant - false_neg
+    false_pos = n_irrelevant - true_neg
+
+    precision = _safe_divide(true_pos, true_pos + false_pos)
+    recall = _safe_divide(true_pos, np.full(true_pos.shape, n_relevant))
+    f1 = _safe_divide(2 * precision * recall, precision + recall)
+    best_ttp, best_kp = np.unravel_index(np.argmax(f1), f1.shape)
+    return {"total_topic_prop_thresholds": total_topic_prop_thresholds,
+            "keyword_prop_thresholds": keyword_prop_thresholds,
+            "true_pos": true_pos, "false_pos": false_pos,
+            "true_neg": true_neg, "false_neg": false_neg,
+            "precision": precision, "recall": recall, "f1": f1,
+            "best": (total_topic_prop_thresholds[best_ttp], keyword_prop_thresholds[best_kp],
+                     f1[best_ttp, best_kp])}
+
+
+def subset_info(topic_model, filter_helper, labels, total_topic_prop_threshold=None,
+                keyword_prop_threshold=None):
+    """Return the sets of true positives, false positives, true negatives and false negatives
+    among the labeled documents, as well as their sizes and the size of the set predicted
+    as relevant, for one pair of thresholds. Sets contain unique document IDs.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object instantiated with a corpus or
+        files from a Mallet topic model.
+        filter_helper (FilterHelper): a FilterHelper object instantiated with filter
+        properties.
+        labels (dict): maps the unique IDs of labeled documents to 1 (relevant) or 0 (not relevant).
+        Documents that are not in topic_model.docs are ignored.
+        total_topic_prop_threshold (float, optional): Default is filter_helper.total_topic_prop_threshold.
+        keyword_prop_threshold (float, optional): Default is filter_helper.keyword_prop_threshold.
+    Returns:
+        (dict): a dictionary containing the sets "true_pos", "false_pos", "true_neg", "false_neg",
+        their sizes "n_true_pos", "n_false_pos", "n_true_neg", "n_false_neg", and
+        "n_predicted_relevant"."""
+    (total_topic_props, keyword_props, has_superkeyword), is_relevant_label, doc_ids = \
+        _labeled_features(topic_model, filter_helper, labels)
 
-def subset_info(threshs):  # seems like a cool feature to include
-    """Return set of false positives, true positives, false negatives, and true negatives, as
-    well as the sizes of the false neg and false pos sets, as well as the size of set
-    predicted as relevant, about the subset created by the given set of thresholds
-    (mtp, ttp, voc prop, and voc list length, in that order).
-    This function can be edited to output any kind of info about the subset, eg the filenames."""
-    pass
+    predicted_relevant = _passes(filter_helper, total_topic_props, keyword_props, has_superkeyword,
+                                 total_topic_prop_threshold, keyword_prop_threshold)
+    info = {}
+    for name, selection in [("true_pos", predicted_relevant & is_relevant_label),
+                            ("false_pos", predicted_relevant & ~is_relevant_label),
+                            ("true_neg", ~predicted_relevant & ~is_relevant_label),
+                            ("false_neg", ~predicted_relevant & is_relevant_label)]:
+        info[name] = {doc_ids[i] for i in np.flatnonzero(selection)}
+        info["n_" + name] = len(info[name])
+    info["n_predicted_relevant"] = int(predicted_relevant.sum())
+    return info
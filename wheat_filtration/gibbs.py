@@ -0,0 +1,78 @@
+import numpy as np
+
+
+def train_lda(token_ids, offsets, n_words, n_topics, alpha=50.0, beta=0.01, iterations=1000,
+              block_size=2**14, random_seed=0):
+    """Trains an LDA topic model in process with a collapsed Gibbs sampler vectorized with NumPy.
+    The tokens are sampled in blocks of block_size consecutive tokens: the topics of all tokens
+    of a block are drawn at once, each from the counts of all other tokens as they were before
+    the block. Like the parallel sampler of Mallet, this approximates sequential sampling;
+    smaller blocks are closer to it but slower.
+    Arguments:
+        token_ids (numpy.ndarray of int): the token IDs of all documents, one document after
+            the other. Token IDs are below n_words.
+        offsets (numpy.ndarray of int): the position of the first token of each document in
+            token_ids, followed by the total number of tokens.
+        n_words (int): number of vocabulary words.
+        n_topics (int): number of topics.
+        alpha (float, optional): sum of the symmetric Dirichlet prior over the topics of a
+            document, like the alpha of Mallet. Default is 50.0.
+        beta (float, optional): Dirichlet prior over the words of a topic. Default is 0.01.
+        iterations (int, optional): number of sampling passes over the corpus. Default is 1000.
+        block_size (int, optional): number of tokens sampled at once. Default is 2**14.
+        random_seed (int, optional): Random seed to ensure consistent results, if 0 - use
+            system clock. Default is 0.
+    Returns:
+        doc_topic_proportions (numpy.ndarray of float64): the smoothed topic proportions of each
+            document, computed like the doc topics output of Mallet. Shape: (number of documents, n_topics)
+        topic_wordcounts (numpy.ndarray of int64): the number of tokens of each word assigned to
+            each topic. Shape: (n_topics, n_words)"""
+    token_ids = np.asarray(token_ids, dtype=np.int64)
+    doc_lengths = np.diff(offsets)
+    n_docs = len(doc_lengths)
+    n_tokens = len(token_ids)
+    rng = np.random.default_rng(random_seed if random_seed != 0 else None)
+    doc_alpha = alpha / n_topics
+
+    doc_of_token = np.repeat(np.arange(n_docs), doc_lengths)
+    topics = rng.integers(n_topics, size=n_tokens)
+    doc_topic_counts = np.bincount(doc_of_token * n_topics + topics,
+                                   minlength=n_docs * n_topics).reshape(n_docs, n_topics)
+    # words as rows, so the counts of the words of a block are gathered as rows
+    word_topic_counts = np.bincount(token_ids * n_topics + topics,
+                                    minlength=n_words * n_topics).reshape(n_words, n_topics)
+    topic_counts = np.bincount(topics, minlength=n_topics)
+
+    topic_range = np.arange(n_topics)
+    for _ in range(iterations):
+        for start in range(0, n_tokens, block_size):
+            block = slice(start, start + block_size)
+            docs = doc_of_token[block]
+            words = token_ids[block]
+            old_topics = topics[block]
+            # the counts of the other tokens: the current counts without each token's own topic
+            own_topics = topic_range == old_topics[:, None]
+            weights = (doc_topic_counts[docs] - own_topics + doc_alpha) * \
+                (word_topic_counts[words] - own_topics + beta) / \
+                (topic_counts - own_topics + n_words * beta)
+            cumulative_weights = np.cumsum(weights, axis=1)
+            draws = rng.random(len(cumulative_weights)) * cumulative_weights[:, -1]
+            new_topics = (cumulative_weights < draws[:, None]).sum(axis=1)
+
+            # the documents of a block are consecutive
+            first_doc = docs[0]
+            block_docs = slice(first_doc, docs[-1] + 1)
+            block_doc_topics = (docs - first_doc) * n_topics
+            n_block_doc_topics = (docs[-1] + 1 - first_doc) * n_topics
+            doc_topic_counts[block_docs] += (
+                np.bincount(block_doc_topics + new_topics, minlength=n_block_doc_topics) -
+                np.bincount(block_doc_topics + old_topics, minlength=n_block_doc_topics)).reshape(-1, n_topics)
+            np.subtract.at(word_topic_counts, (words, old_topics), 1)
+            np.add.at(word_topic_counts, (words, new_topics), 1)
+            topic_counts += np.bincount(new_topics, minlength=n_topics) - \
+                np.bincount(old_topics, minlength=n_topics)
+            topics[block] = new_topics
+
+    doc_topic_proportions = (doc_topic_counts + doc_alpha) / \
+        (doc_lengths[:, None] + alpha)
+    return doc_topic_proportions, word_topic_counts.T.copy()
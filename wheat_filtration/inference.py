@@ -0,0 +1,201 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from docstore import DocumentStore
+import munge
+
+
+def prepare_docs(docs, vocabulary, stop_words=()):
+    """Return a DocumentStore of new documents, preprocessed like the documents of a topic model:
+    cleaned of punctuation, lowercased, split on whitespace and stopword filtered. Token IDs
+    follow vocabulary; words outside of it are numbered after it, so they count towards
+    document lengths (and keyword proportions) but not towards topic proportions.
+    Arguments:
+        docs (dict): an ordered mapping of unique document IDs to document texts.
+        vocabulary (iterable of str): the vocabulary of the topic model.
+        stop_words (iterable of str, optional): words to remove. Should match the stopwords
+        removed when making the topic model. Default is empty."""
+    stop_words = set(stop_words)
+    token_lists = ([word for word in munge.clean_punc(text).lower().split()
+                    if word not in stop_words] for text in docs.values())
+    return DocumentStore.from_token_lists(docs.keys(), token_lists, vocabulary)
+
+
+def topic_word_distributions(topic_wordcounts, beta=0.01):
+    """Return the smoothed word distribution of each topic, (count + beta) / (topic count +
+    number of words * beta), as a matrix of shape (number of vocab words, number of topics).
+    Arguments:
+        topic_wordcounts (scipy.sparse matrix or numpy.ndarray): the counts of each vocabulary
+        word in each topic. Shape: (number of topics, number of vocab words)
+        beta (float, optional): Dirichlet prior over the words of a topic. Default is 0.01."""
+    word_topic_counts = np.asarray(
+        topic_wordcounts.T.todense() if hasattr(topic_wordcounts, "todense") else topic_wordcounts.T,
+        dtype=np.float64)
+    n_words = word_topic_counts.shape[0]
+    return (word_topic_counts + beta) / (word_topic_counts.sum(axis=0) + n_words * beta)
+
+
+def estimate_alpha(doc_topic_proportions, doc_lengths):
+    """Return the sum of the Dirichlet prior over the topics of a document (alpha) implied by the
+    topic proportions of a trained model. The smallest topic proportion of a document is at
+    least (alpha / number of topics) / (document length + alpha), with equality when the topic
+    has no tokens in the document, so each document gives an upper bound on alpha. The 1st
+    percentile of the bounds is returned, which is exact for a symmetric prior and tolerates
+    rounding in Mallet output files.
+    Arguments:
+        doc_topic_proportions (numpy.ndarray): the topic proportions of each training document.
+        Shape: (number of documents, number of topics)
+        doc_lengths (numpy.ndarray of int): the number of tokens in each training document.
+    Raises:
+        ValueError: If no document has tokens and non-uniform topic proportions, so that alpha
+        can't be estimated and has to be given."""
+    n_topics = doc_topic_proportions.shape[1]
+    min_proportions = doc_topic_proportions.min(axis=1)
+    doc_lengths = np.asarray(doc_lengths)
+    usable = (doc_lengths > 0) & (min_proportions * n_topics < 1)
+    if not usable.any():
+        raise ValueError("alpha can't be estimated: no document has tokens and non-uniform "
+                         "topic proportions. Pass alpha explicitly.")
+    doc_alphas = min_proportions[usable] * doc_lengths[usable] / \
+        (1 - n_topics * min_proportions[usable])
+    return float(np.percentile(doc_alphas, 1)) * n_topics
+
+
+def _fold_in_batch(doc_term_matrix, word_topic_dists, alpha, iterations, tolerance):
+    """Return the inferred topic proportions of the documents of a batch (see
+    infer_doc_topic_proportions)."""
+    n_docs = doc_term_matrix.shape[0]
+    n_topics = word_topic_dists.shape[1]
+    doc_alpha = alpha / n_topics
+    doc_lengths = np.asarray(doc_term_matrix.sum(axis=1), dtype=np.float64)
+    counts = doc_term_matrix.data.astype(np.float64)
+    # topic distributions of the words at the nonzero entries, gathered once per batch
+    entry_dists = word_topic_dists[doc_term_matrix.indices]
+    entry_docs = np.repeat(np.arange(n_docs), np.diff(doc_term_matrix.indptr))
+
+    doc_topic_proportions = np.full((n_docs, n_topics), 1 / n_topics)
+    for _ in range(iterations):
+        # E step: each term's count is split over the topics in proportion to
+        # doc topic proportion * topic word probability; M step: the expected counts
+        # are smoothed like the doc topics output of Mallet
+        entry_weights = counts / np.einsum(
+            "ij,ij->i", doc_topic_proportions[entry_docs], entry_dists)
+        weighted_terms = csr_matrix((entry_weights, doc_term_matrix.indices, doc_term_matrix.indptr),
+                                    shape=doc_term_matrix.shape)
+        expected_counts = doc_topic_proportions * weighted_terms.dot(word_topic_dists)
+        new_proportions = (expected_counts + doc_alpha) / (doc_lengths + alpha)
+        converged = np.abs(new_proportions - doc_topic_proportions).max(initial=0) < tolerance
+        doc_topic_proportions = new_proportions
+        if converged:
+            break
+    return doc_topic_proportions
+
+
+def _fold_in(doc_term_matrix, word_topic_dists, alpha, iterations, tolerance, batch_size):
+    """Return the inferred topic proportions of the documents of doc_term_matrix, batch_size
+    documents at a time (see infer_doc_topic_proportions)."""
+    n_words = word_topic_dists.shape[0]
+    doc_term_matrix = csr_matrix(doc_term_matrix)[:, :n_words]
+    n_docs = doc_term_matrix.shape[0]
+    doc_topic_proportions = np.empty((n_docs, word_topic_dists.shape[1]))
+    for start in range(0, n_docs, batch_size):
+        batch = slice(start, start + batch_size)
+        doc_topic_proportions[batch] = _fold_in_batch(
+            doc_term_matrix[batch], word_topic_dists, alpha, iterations, tolerance)
+    return doc_topic_proportions
+
+
+def infer_doc_topic_proportions(doc_term_matrix, topic_wordcounts, alpha=50.0, beta=0.01,
+                                iterations=100, tolerance=1e-6, batch_size=1024):
+    """Estimates the topic proportions of new documents with the topics of a trained model held
+    fixed ("fold-in"), by expectation maximization over the doc term counts. Batches of
+    documents are processed at once with sparse matrix operations.
+    Arguments:
+        doc_term_matrix (scipy.sparse.csr_matrix): counts of each vocabulary word in each new
+        document. Columns past the vocabulary of topic_wordcounts are ignored.
+        Shape: (number of documents, at least the number of vocab words)
+        topic_wordcounts (scipy.sparse matrix or numpy.ndarray): the counts of each vocabulary
+        word in each topic of the trained model. Shape: (number of topics, number of vocab words)
+        alpha (float, optional): sum of the symmetric Dirichlet prior over the topics of a
+        document, like the alpha of Mallet. Default is 50.0.
+        beta (float, optional): Dirichlet prior over the words of a topic. Default is 0.01.
+        iterations (int, optional): maximum number of EM iterations per batch. Default is 100.
+        tolerance (float, optional): a batch stops iterating when no topic proportion changes
+        by tolerance or more. Default is 1e-6.
+        batch_size (int, optional): number of documents processed at once. Default is 1024.
+    Returns:
+        doc_topic_proportions (numpy.ndarray of float64): the topic proportions of each document,
+        (expected topic count + alpha / number of topics) / (number of vocab tokens + alpha).
+        Documents without vocabulary words get uniform proportions.
+        Shape: (number of documents, number of topics)"""
+    return _fold_in(doc_term_matrix, topic_word_distributions(topic_wordcounts, beta),
+                    alpha, iterations, tolerance, batch_size)
+
+
+class TopicInferencer():
+    """Infers the topic proportions of new documents with the topics of a trained topic model,
+    like infer_doc_topic_proportions. The topic word distributions and alpha are computed once,
+    so that many batches of new documents can be scored against the same model.
+
+    Arguments:
+        topic_model (TopicModel): the trained topic model.
+        alpha (float, optional): sum of the Dirichlet prior over the topics of a document. If
+        None, it is estimated from the topic proportions of topic_model with estimate_alpha.
+        Default is None.
+        beta (float, optional): Dirichlet prior over the words of a topic. Default is 0.01.
+        stop_words (iterable of str, optional): words to remove from new documents. Should
+        match the stopwords removed when making topic_model. Default is empty.
+        iterations (int, optional): maximum number of EM iterations per batch. Default is 100.
+        tolerance (float, optional): a batch stops iterating when no topic proportion changes
+        by tolerance or more. Default is 1e-6.
+        batch_size (int, optional): number of documents processed at once. Default is 1024.
+
+    Attributes:
+        alpha (float): sum of the Dirichlet prior over the topics of a document.
+        vocabulary (list of str): the vocabulary of the topic model.
+        word_topic_dists (numpy.ndarray): the smoothed word distribution of each topic, see
+        topic_word_distributions. Shape: (number of vocab words, number of topics)
+
+    Raises:
+        ValueError: If alpha is None and can't be estimated, see estimate_alpha.
+    """
+
+    def __init__(self, topic_model, alpha=None, beta=0.01, stop_words=(), iterations=100,
+                 tolerance=1e-6, batch_size=1024):
+        if alpha is None:
+            alpha = estimate_alpha(topic_model.doc_topic_proportions,
+                                   topic_model.docs.doc_lengths)
+        self._alpha = alpha
+        self._vocabulary = list(topic_model.vocabulary)
+        self._word_topic_dists = topic_word_distributions(
+            topic_model.topic_wordcounts_csr, beta)
+        self._stop_words = set(stop_words)
+        self._iterations = iterations
+        self._tolerance = tolerance
+        self._batch_size = batch_size
+
+    @property
+    def alpha(self):
+        """Get the sum of the Dirichlet prior over the topics of a document"""
+        return self._alpha
+
+    @property
+    def vocabulary(self):
+        """Get the vocabulary of the topic model"""
+        return self._vocabulary
+
+    @property
+    def word_topic_dists(self):
+        """Get the smoothed word distribution of each topic"""
+        return self._word_topic_dists
+
+    def prepare_docs(self, docs):
+        """Return a DocumentStore of the new documents docs (an ordered mapping of unique
+        document IDs to texts), see prepare_docs."""
+        return prepare_docs(docs, self._vocabulary, self._stop_words)
+
+    def infer(self, doc_term_matrix):
+        """Return the topic proportions of the new documents of doc_term_matrix, see
+        infer_doc_topic_proportions."""
+        return _fold_in(doc_term_matrix, self._word_topic_dists, self._alpha,
+                        self._iterations, self._tolerance, self._batch_size)
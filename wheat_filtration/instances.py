@@ -0,0 +1,405 @@
+import mmap
+import struct
+
+import numpy as np
+
+from docstore import DocumentStore
+
+# Java object serialization stream constants
+# (https://docs.oracle.com/javase/8/docs/platform/serialization/spec/protocol.html)
+STREAM_MAGIC = b"\xac\xed\x00\x05"
+TC_NULL = 0x70
+TC_REFERENCE = 0x71
+TC_CLASSDESC = 0x72
+TC_OBJECT = 0x73
+TC_STRING = 0x74
+TC_ARRAY = 0x75
+TC_CLASS = 0x76
+TC_BLOCKDATA = 0x77
+TC_ENDBLOCKDATA = 0x78
+TC_BLOCKDATALONG = 0x7A
+TC_LONGSTRING = 0x7C
+TC_ENUM = 0x7E
+BASE_WIRE_HANDLE = 0x7E0000
+SC_WRITE_METHOD = 0x01
+
+PRIMITIVE_FORMATS = {"B": ">b", "C": ">H", "D": ">d", "F": ">f",
+                     "I": ">i", "J": ">q", "S": ">h", "Z": ">?"}
+PRIMITIVE_ARRAY_DTYPES = {"B": ">i1", "C": ">u2", "D": ">f8", "F": ">f4",
+                          "I": ">i4", "J": ">i8", "S": ">i2", "Z": "?"}
+
+# marks the end of an object annotation
+_END_BLOCK = object()
+
+
+class _JavaClassDesc():
+    """A class description read from a Java serialization stream."""
+
+    def __init__(self, name, flags):
+        self.name = name
+        self.flags = flags
+        self.fields = []
+        self.super_desc = None
+
+
+class _JavaObject():
+    """An object read from a Java serialization stream. fields holds the values of
+    default serialized fields and annotations holds, per class name, the blocks of
+    primitive data (bytes) and objects written by that class's writeObject method."""
+
+    def __init__(self, class_desc):
+        self.class_desc = class_desc
+        self.fields = {}
+        self.annotations = {}
+
+
+class _JavaStreamReader():
+    """Reads the contents of a Java object serialization stream, without a JVM.
+    Classes with a custom writeObject method only have their default fields read if
+    they are JDK classes (java.*), which call defaultWriteObject; Mallet's classes
+    write everything themselves, so their data is left as annotations.
+    data can be any buffer, such as bytes or a memory-mapped file."""
+
+    def __init__(self, data):
+        if data[:4] != STREAM_MAGIC:
+            raise ValueError("Not a Java serialization stream.")
+        self._data = data
+        self._position = 4
+        # handle number -> object, so objects that are no longer referenced can be released
+        self._handles = {}
+        self._n_handles = 0
+
+    @property
+    def n_handles(self):
+        """Get the number of handles assigned so far"""
+        return self._n_handles
+
+    def _new_handle(self, value):
+        handle = self._n_handles
+        self._handles[handle] = value
+        self._n_handles = handle + 1
+        return handle
+
+    def release_handles(self, values, first_handle=0):
+        """Forget the handles of values (matched by identity) assigned from first_handle on,
+        so they can be garbage collected. They must not be referenced later in the stream."""
+        value_ids = {id(value) for value in values if value is not None}
+        handles = self._handles
+        for handle in range(first_handle, self._n_handles):
+            if id(handles.get(handle)) in value_ids:
+                del handles[handle]
+
+    def _unpack(self, fmt):
+        value = struct.unpack_from(fmt, self._data, self._position)[0]
+        self._position += struct.calcsize(fmt)
+        return value
+
+    def _read_utf(self, length):
+        start = self._position
+        self._position += length
+        return self._data[start:self._position].decode("utf-8", "surrogatepass")
+
+    def _read_bytes(self, length):
+        start = self._position
+        self._position += length
+        return self._data[start:self._position]
+
+    def read_content(self):
+        """Return the next item in the stream."""
+        type_code = self._data[self._position]
+        self._position += 1
+        if type_code == TC_NULL:
+            return None
+        if type_code == TC_REFERENCE:
+            return self._handles[self._unpack(">I") - BASE_WIRE_HANDLE]
+        if type_code == TC_STRING or type_code == TC_LONGSTRING:
+            length = self._unpack(">H" if type_code == TC_STRING else ">Q")
+            string = self._read_utf(length)
+            self._handles[self._n_handles] = string
+            self._n_handles += 1
+            return string
+        if type_code == TC_BLOCKDATA:
+            return self._read_bytes(self._unpack(">B"))
+        if type_code == TC_BLOCKDATALONG:
+            return self._read_bytes(self._unpack(">I"))
+        if type_code == TC_ENDBLOCKDATA:
+            return _END_BLOCK
+        if type_code == TC_OBJECT:
+            return self._read_object()
+        if type_code == TC_ARRAY:
+            return self._read_array()
+        if type_code == TC_CLASSDESC:
+            return self._read_class_desc()
+        if type_code == TC_CLASS:
+            class_desc = self.read_content()
+            self._new_handle(class_desc)
+            return class_desc
+        if type_code == TC_ENUM:
+            self.read_content()  # enum class description
+            handle = self._new_handle(None)
+            self._handles[handle] = self.read_content()  # constant name
+            return self._handles[handle]
+        raise ValueError("Unsupported type code {:#x} at byte {} of Java serialization stream.".format(
+            type_code, self._position - 1))
+
+    def _read_class_desc(self):
+        name = self._read_utf(self._unpack(">H"))
+        self._position += 8  # serialVersionUID
+        class_desc = _JavaClassDesc(name, self._unpack(">B"))
+        self._new_handle(class_desc)
+        for _ in range(self._unpack(">H")):
+            type_code = chr(self._unpack(">B"))
+            field_name = self._read_utf(self._unpack(">H"))
+            if type_code in "[L":
+                self.read_content()  # field class name
+            class_desc.fields.append((type_code, field_name))
+        self._read_annotation()  # class annotation
+        class_desc.super_desc = self.read_content()
+        return class_desc
+
+    def _read_annotation(self):
+        annotation = []
+        content = self.read_content()
+        while content is not _END_BLOCK:
+            annotation.append(content)
+            content = self.read_content()
+        return annotation
+
+    def _read_array(self):
+        class_desc = self.read_content()
+        length = self._unpack(">i")
+        element_type = class_desc.name[1]
+        if element_type in PRIMITIVE_ARRAY_DTYPES:
+            # copied, so the array does not hold on to the buffer
+            array = np.frombuffer(self._data, dtype=PRIMITIVE_ARRAY_DTYPES[element_type],
+                                  count=length, offset=self._position).copy()
+            self._position += array.nbytes
+            self._new_handle(array)
+            return array
+        array = []
+        self._new_handle(array)
+        for _ in range(length):
+            array.append(self.read_content())
+        return array
+
+    def _read_object(self):
+        java_object = self._read_new_object()
+        for class_desc in self.class_hierarchy(java_object):
+            if class_desc.fields:
+                self.read_class_fields(java_object, class_desc)
+            if class_desc.flags & SC_WRITE_METHOD:
+                java_object.annotations[class_desc.name] = self._read_annotation()
+        return java_object
+
+    def read_object_start(self):
+        """Read the type code and class description of the object starting at the current
+        position. The caller must read its class data, see _read_object."""
+        if self._data[self._position] != TC_OBJECT:
+            raise ValueError("Expected an object at byte {} of Java serialization stream.".format(
+                self._position))
+        self._position += 1
+        return self._read_new_object()
+
+    def _read_new_object(self):
+        java_object = _JavaObject(self.read_content())
+        self._new_handle(java_object)
+        return java_object
+
+    @staticmethod
+    def class_hierarchy(java_object):
+        """Return the class descriptions of java_object in the order their data is written:
+        from the topmost serializable superclass down."""
+        class_hierarchy = []
+        class_desc = java_object.class_desc
+        while class_desc is not None:
+            class_hierarchy.append(class_desc)
+            class_desc = class_desc.super_desc
+        return class_hierarchy[::-1]
+
+    def read_class_fields(self, java_object, class_desc):
+        """Read the default serialized fields of java_object declared by class_desc, if written."""
+        if not class_desc.flags & SC_WRITE_METHOD or class_desc.name.startswith("java."):
+            for type_code, field_name in class_desc.fields:
+                if type_code in "[L":
+                    java_object.fields[field_name] = self.read_content()
+                else:
+                    java_object.fields[field_name] = self._unpack(
+                        PRIMITIVE_FORMATS[type_code])
+
+    def iter_annotation(self):
+        """Yield the items of the object annotation starting at the current position."""
+        content = self.read_content()
+        while content is not _END_BLOCK:
+            yield content
+            content = self.read_content()
+
+
+def _annotation_ints(annotation):
+    """Return the primitive data blocks of an annotation as an array of ints."""
+    return np.frombuffer(b"".join(block for block in annotation if isinstance(block, bytes)),
+                         dtype=">i4")
+
+
+def _alphabet_entries(alphabet):
+    """Return the list of entries of a cc.mallet.types.Alphabet object."""
+    annotation = alphabet.annotations["cc.mallet.types.Alphabet"]
+    # version and size come first, followed by the entries
+    size = int(_annotation_ints(annotation[:1])[1])
+    return annotation[1:size + 1]
+
+
+def iter_instances(mallet_instance_filepath):
+    """Yields the instances of a Mallet instance list file (typically ends in ".mallet") containing
+    feature sequences, as made by "mallet import-file --keep-sequence", one at a time and without
+    running Mallet. The file is memory-mapped and each instance is released once it is read,
+    so memory use does not grow with the number of instances.
+    Arguments:
+        mallet_instance_filepath (str): the filepath of the Mallet instance list.
+    Yields:
+        doc_id (str): the unique ID (instance name) of the document.
+        token_ids (numpy.ndarray of int32): the token IDs of the document, which may be empty.
+            Token IDs are indices into alphabet.
+        alphabet (list of str): the word corresponding with each token ID, the same list for
+            every instance.
+    Raises:
+        ValueError: If the file is not a serialized instance list of feature sequences."""
+    with open(mallet_instance_filepath, "rb") as in_file:
+        if not in_file.read(len(STREAM_MAGIC)):  # an empty file cannot be memory-mapped
+            raise ValueError("Not a Java serialization stream.")
+        with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield from _iter_instances(_JavaStreamReader(data), mallet_instance_filepath)
+
+
+def _iter_instances(reader, mallet_instance_filepath):
+    """Yields the instances read by reader, see iter_instances."""
+    try:
+        instance_list = reader.read_object_start()
+    except (ValueError, IndexError, struct.error):
+        instance_list = None
+    if instance_list is None or instance_list.class_desc.name != "cc.mallet.types.InstanceList":
+        raise ValueError("{} is not a Mallet instance list.".format(
+            mallet_instance_filepath))
+
+    alphabet = None
+    alphabet_entries = None
+    for class_desc in reader.class_hierarchy(instance_list):
+        reader.read_class_fields(instance_list, class_desc)
+        if class_desc.name != "java.util.ArrayList":
+            continue
+        # the ArrayList annotation holds the list capacity followed by the instances;
+        # the rest of the instance list (e.g. its pipe) is not needed
+        annotation = reader.iter_annotation()
+        next(annotation)
+        first_handle = reader.n_handles
+        for instance in annotation:
+            # version, data, target, name, source, properties, locked
+            _, data, _, name, source, _, _ = instance.annotations["cc.mallet.types.Instance"]
+            if not isinstance(data, _JavaObject) or \
+                    data.class_desc.name != "cc.mallet.types.FeatureSequence":
+                raise ValueError("Instance data is not a Mallet FeatureSequence.")
+            # version, dictionary, then features.length, features, length
+            feature_annotation = data.annotations["cc.mallet.types.FeatureSequence"]
+            if alphabet is None:
+                alphabet = feature_annotation[1]
+                alphabet_entries = _alphabet_entries(alphabet)
+            elif feature_annotation[1] is not alphabet:
+                raise ValueError("Instances do not share one Mallet Alphabet.")
+            sequence = _annotation_ints(feature_annotation[2:])
+            doc_name = name
+            if isinstance(name, _JavaObject):  # e.g. java.net.URI
+                doc_name = name.fields.get("string")
+            if not isinstance(doc_name, str):
+                raise ValueError("Instance name is not a string.")
+            # objects belonging to this instance alone are not referenced again
+            reader.release_handles([instance, data, name, doc_name, source], first_handle)
+            first_handle = reader.n_handles
+            yield doc_name, sequence[1:sequence[-1] + 1].astype(np.int32), alphabet_entries
+        return
+    raise ValueError("{} is not a Mallet instance list.".format(
+        mallet_instance_filepath))
+
+
+def read_instance_list(mallet_instance_filepath):
+    """Reads a Mallet instance list file (typically ends in ".mallet") containing
+    feature sequences, as made by "mallet import-file --keep-sequence", without running Mallet.
+    Instances with no tokens are kept, so that documents line up with the rows of the Mallet
+    doc topics file.
+    Arguments:
+        mallet_instance_filepath (str): the filepath of the Mallet instance list.
+    Returns:
+        doc_ids (list of str): the unique IDs (instance names) of the documents.
+        token_ids (numpy.ndarray of int32): the token IDs of all documents, one document after
+            the other. Token IDs are indices into alphabet.
+        offsets (numpy.ndarray of int64): the position of the first token of each document
+            in token_ids, followed by the total number of tokens.
+        alphabet (list of str): the word corresponding with each token ID.
+    Raises:
+        ValueError: If the file is not a serialized instance list of feature sequences."""
+    doc_ids = []
+    doc_token_ids = []
+    offsets = [0]
+    alphabet = []
+    for doc_id, token_ids, alphabet in iter_instances(mallet_instance_filepath):
+        doc_ids.append(doc_id)
+        doc_token_ids.append(token_ids)
+        offsets.append(offsets[-1] + len(token_ids))
+
+    token_ids = np.concatenate(doc_token_ids) if doc_token_ids \
+        else np.zeros(0, dtype=np.int32)
+    return doc_ids, token_ids, np.array(offsets, dtype=np.int64), alphabet
+
+
+def read_printed_instances(lines):
+    """Reads the output of "mallet info --print-instances" line by line, e.g. from a pipe.
+    Each document is printed as "<name> <target> 0: <word> (<id>)", followed by one
+    "<i>: <word> (<id>)" line per remaining token and an empty line. A document with no
+    tokens is printed as "<name> <target>" and is kept, with an empty list of tokens.
+    Arguments:
+        lines (iterable of str): the lines of output.
+    Returns:
+        doc_ids (list of str): the unique IDs of the documents.
+        doc_tokens (list of list of str): the tokens of each document."""
+    doc_ids = []
+    doc_tokens = []
+    current_doc = None
+    for line in lines:
+        separator = line.find(": ")
+        word_end = line.find(" ", separator + 2)
+        if separator == -1 or word_end == -1:
+            if current_doc is not None:  # the empty line after a doc
+                doc_tokens.append(current_doc)
+                current_doc = None
+            elif line.strip():  # a doc with no tokens
+                doc_ids.append(line.split(None, 1)[0])
+                doc_tokens.append([])
+            continue
+        if current_doc is None:  # the first line of the doc
+            doc_ids.append(line.split(None, 1)[0])
+            current_doc = []
+        current_doc.append(line[separator + 2:word_end])
+    if current_doc is not None:
+        doc_tokens.append(current_doc)
+    return doc_ids, doc_tokens
+
+
+def load_document_store(mallet_instance_filepath, vocabulary):
+    """Returns a DocumentStore with the documents of a Mallet instance list file, with
+    token IDs following vocabulary (instance words missing from vocabulary are appended).
+    Arguments:
+        mallet_instance_filepath (str): the filepath of the Mallet instance list.
+        vocabulary (iterable of str): the vocabulary of the topic model.
+    Raises:
+        ValueError: If the file is not a serialized instance list of feature sequences."""
+    doc_ids, token_ids, offsets, alphabet = read_instance_list(
+        mallet_instance_filepath)
+    vocabulary = list(vocabulary)
+    if alphabet != vocabulary[:len(alphabet)]:
+        term_index = {word: i for i, word in enumerate(vocabulary)}
+        alphabet_to_vocabulary = np.empty(len(alphabet), dtype=np.int32)
+        for i, word in enumerate(alphabet):
+            if word not in term_index:
+                term_index[word] = len(vocabulary)
+                vocabulary.append(word)
+            alphabet_to_vocabulary[i] = term_index[word]
+        token_ids = alphabet_to_vocabulary[token_ids]
+    return DocumentStore(doc_ids, token_ids, offsets, vocabulary)
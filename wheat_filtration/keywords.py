@@ -11,27 +11,27 @@ def rel_ent_key_list(topic_model, n_top_keywords, relevant_topics):
      Returns:
        keyword_list (iterable of str): list of the top n keywords, sorted
      """
-    topic_word_matrix = topic_model.topic_wordcounts.tocsr()
-    # Log of probabilities of vocab words
-
-    vocab_logs = np.log(topic_word_matrix.sum(
-        axis=0) / topic_word_matrix.sum())
-
-    # Log of probabilities of vocab words given they were in each relevant topic
-    topic_logs = np.log(topic_word_matrix[relevant_topics, :].sum(
-        axis=0) / topic_word_matrix[relevant_topics, :].sum())
-
+    # probabilities of vocab words, cached by the topic model
+    vocab_props = topic_model.word_distribution
+    relevant_counts = np.asarray(
+        topic_model.topic_wordcounts_csr[relevant_topics, :].sum(axis=0)).ravel()
+    # words that never occur in the relevant topics get a score of -inf
+    with np.errstate(divide="ignore"):
+        # Log of probabilities of vocab words
+        vocab_logs = np.log(vocab_props)
+        # Log of probabilities of vocab words given they were in each relevant topic
+        topic_logs = np.log(relevant_counts / relevant_counts.sum())
     # relative entropy proportions, unsorted
-    unsorted_props = np.asarray(topic_word_matrix.sum(axis=0) /
-                                topic_word_matrix.sum()) * np.asarray(topic_logs - vocab_logs)
-
-    unsorted_props = np.matrix.flatten(unsorted_props)
-
-    sorted_props_and_voc = sorted([(unsorted_props[i], topic_model.vocabulary[i]) for i in list(
-        np.argpartition(unsorted_props, topic_model.n_voc_words - n_top_keywords))[-n_top_keywords:]], reverse=True)
-    ordered_vocab = []
-    for (_, voc) in sorted_props_and_voc:
-        ordered_vocab.append(voc)
-    return ordered_vocab
+    unsorted_props = vocab_props * (topic_logs - vocab_logs)
+
+    n_top_keywords = min(n_top_keywords, len(unsorted_props))
+    if n_top_keywords <= 0:
+        return []
+    top_indices = np.argpartition(
+        unsorted_props, len(unsorted_props) - n_top_keywords)[-n_top_keywords:]
+    top_words = [topic_model.vocabulary[i] for i in top_indices]
+    # sorted by descending score, then descending word
+    order = np.lexsort((np.array(top_words), unsorted_props[top_indices]))[::-1]
+    return [top_words[i] for i in order]
 
 # TODO (faunam|6/19/19): implement tfidf and logtf
@@ -1,24 +1,153 @@
+from array import array
 from collections import OrderedDict
-import os
-import re
+import functools
 import warnings
 
 from scipy.sparse import coo_matrix
-import gensim.corpora as corpora
-from gensim.models.wrappers import LdaMallet
 import numpy as np
-from nltk.corpus import stopwords
 
+import cache
+from docstore import DocumentStore, MalletInputDocuments
+import gibbs
+import instances
 import munge
 import util
 
 MALLET_PATH = "/Users/fauma/Mallet-master/bin/mallet"
+# ways of training a topic model when Mallet output files are not provided
+TRAINING_BACKENDS = ("mallet", "gensim", "gibbs")
+
+
+@functools.lru_cache(maxsize=None)
+def _probe_mallet(path_to_mallet):
+    """Tests that the Mallet command path_to_mallet can be run, once per process and command
+    (failures are not cached)."""
+    try:
+        # tests that mallet is there, doesnt run it
+        util.call_command_line(path_to_mallet)
+    except:
+        raise RuntimeError("Unable to locate mallet command {}. Please \
+        make sure Mallet is added to your PATH variable, or add the path to \
+        your Mallet installation to the MALLET_PATH variable at the top \
+        of mallet.py.".format(path_to_mallet))
+
+
+def find_mallet():
+    """Return the command that runs Mallet: MALLET_PATH, or "mallet" if it is None. The command
+    is tested the first time it is looked up in a process.
+    Raises:
+        RuntimeError: If Mallet is not on path and MALLET_PATH isn't set to Mallet location."""
+    path_to_mallet = MALLET_PATH
+    if path_to_mallet is None:
+        path_to_mallet = "mallet"
+    _probe_mallet(path_to_mallet)
+    return path_to_mallet
+
+
+def preprocess_corpus(corpus_filepath, remove_stopwords=False, corpus_language="english"):
+    """Reads the corpus, splits it into documents, lowercases them and removes stopwords in a
+    single pass, building the gensim dictionary as it goes. The keys for the document
+    dictionaries are unique document ids of the format "doc<i>" where <i> is the number of
+    the document in the corpus. Unlike gensim.corpora.Dictionary(documents), the dictionary
+    is not pruned to its prune_at (2,000,000) most frequent words while it grows, so every
+    word of the corpus keeps its ID; use id_to_word.filter_extremes to shrink it.
+    Arguments:
+        corpus_filepath (str): filepath to where corpus is stored (directory
+            containing documents or single file).
+        remove_stopwords (bool, optional): Whether to remove stopwords. Default is False.
+        corpus_language (str, optional): Language of the stopwords. Default is "english".
+    Returns:
+        docs (DocumentStore): the preprocessed corpus documents. Token IDs are dictionary IDs.
+        full_docs (OrderedDict): the corpus documents.
+        id_to_word (gensim.corpora.Dictionary): the dictionary of the preprocessed corpus.
+        term_document_frequency (list of list of (int, int)): the bag-of-words corpus."""
+    # gensim and nltk are slow to import, and only needed to train a topic model
+    import gensim.corpora as corpora
+    if remove_stopwords:
+        from nltk.corpus import stopwords
+        stop_words = set(stopwords.words(corpus_language))
+    else:
+        stop_words = set()
+    # TODO (7/12/19 faunam): make lowercasing corpus optional
+
+    id_to_word = corpora.Dictionary()
+    term_document_frequency = []
+    full_docs = OrderedDict()
+    token_ids = array("i")
+    offsets = [0]
+    for i, doc in enumerate(munge.iter_doc_tokens(corpus_filepath)):
+        full_docs["doc" + str(i)] = " ".join(doc)
+        # make document lowercase, remove stopwords
+        prepped_doc = [word for word in (word.lower() for word in doc)
+                       if word not in stop_words]
+        term_document_frequency.append(
+            id_to_word.doc2bow(prepped_doc, allow_update=True))
+        token_ids.extend([id_to_word.token2id[word]
+                          for word in prepped_doc])
+        offsets.append(len(token_ids))
+
+    vocabulary = [word for word in id_to_word.values()]
+    docs = DocumentStore(full_docs.keys(), np.frombuffer(token_ids, dtype=np.intc),
+                         offsets, vocabulary)
+    return docs, full_docs, id_to_word, term_document_frequency
+
+
+def train_topics(docs, id_to_word, term_document_frequency, num_topics, backend="mallet",
+                 path_to_mallet=None, **kwargs):
+    """Trains an LDA topic model of a preprocessed corpus (see preprocess_corpus) with backend
+    (see TopicModel) and returns its outputs.
+    Arguments:
+        docs (DocumentStore): the preprocessed corpus documents.
+        id_to_word (gensim.corpora.Dictionary): the dictionary of the preprocessed corpus.
+        term_document_frequency (list of list of (int, int)): the bag-of-words corpus.
+        num_topics (int): Number of topics.
+        backend (str, optional): one of TRAINING_BACKENDS. Default is "mallet".
+        path_to_mallet (str, optional): the command that runs Mallet, for the "mallet" backend.
+            Default is None (see find_mallet).
+        Other keyword arguments are passed to the backend.
+    Returns:
+        doc_topic_proportions (numpy.ndarray of float64): the topic proportions of each document.
+            Shape: (number of documents, num_topics)
+        topic_wordcounts (scipy.sparse.coo_matrix): the counts of each vocabulary word in each
+            topic. Shape: (num_topics, number of vocab words)
+    Raises:
+        ValueError: If backend is not one of TRAINING_BACKENDS."""
+    # gensim is slow to import, and only needed by the "mallet" and "gensim" backends
+    if backend == "mallet":
+        from gensim.models.wrappers import LdaMallet
+        if path_to_mallet is None:
+            path_to_mallet = find_mallet()
+        mallet_model = LdaMallet(path_to_mallet, corpus=term_document_frequency,
+                                 id2word=id_to_word, num_topics=num_topics, **kwargs)
+        doc_topic_proportions = np.zeros((len(docs), num_topics))
+        for i, line in enumerate(mallet_model.load_document_topics()):
+            # extracting proportion from label tuple
+            doc_topic_proportions[i] = [topic_prop[1] for topic_prop in line]
+        topic_wordcounts = mallet_model.load_word_topics()
+    elif backend == "gensim":
+        from gensim.models import LdaMulticore
+        lda_model = LdaMulticore(corpus=term_document_frequency, id2word=id_to_word,
+                                 num_topics=num_topics, **kwargs)
+        # variational parameters of each document's topic distribution
+        doc_topic_params, _ = lda_model.inference(term_document_frequency)
+        doc_topic_params = doc_topic_params.astype(np.float64)
+        doc_topic_proportions = doc_topic_params / \
+            doc_topic_params.sum(axis=1, keepdims=True)
+        topic_wordcounts = lda_model.state.sstats
+    elif backend == "gibbs":
+        doc_topic_proportions, topic_wordcounts = gibbs.train_lda(
+            docs.token_ids, docs.offsets, len(docs.vocabulary), num_topics, **kwargs)
+    else:
+        raise ValueError("Unknown training backend {}. Choose one of {}.".format(
+            backend, ", ".join(TRAINING_BACKENDS)))
+    # coo_matrix for storage simplicity
+    return doc_topic_proportions, coo_matrix(topic_wordcounts)
 
 
 class TopicModel():
     """Creates an object with attributes of an LDA topic model based on corpus.
     If Mallet output files are not provided, topic model will be created with gensim wrapper,
-    according to any optional keyword arguments.
+    or in process with the given training backend, according to any optional keyword arguments.
     If you are inputting Mallet output files, you must provide input mallet_doctopic_filepath,
     mallet_topic_wordcount_filepath, mallet_instance_filepath, and mallet_input_filepath
     and you can ignore all other optional arguments. If you are not inputting Mallet
@@ -42,6 +171,20 @@ class TopicModel():
             supported languages (https://pypi.org/project/stop-words/), and in lowercase letters, e.g. "english".
             Default is "english".
         n_topics (int, optional): Number of topics. Default is 20.
+        doc_topic_dtype (numpy.dtype, optional): Data type of doc_topic_proportions. Use
+            numpy.float32 to halve its memory on large corpora. Default is numpy.float64.
+        cache_dir (str, optional): Directory in which to cache the matrices, vocabulary and documents
+            parsed from Mallet output files, in binary form. Later TopicModels made from the same
+            files load them from the cache (memory-mapped) instead of parsing the files again; the
+            cache is rebuilt when the size or modification time of any of the files changes. Only
+            used when inputting Mallet files. Default is None (no cache).
+        backend (str, optional): How to train the topic model when not inputting Mallet files:
+            "mallet" runs Mallet through the gensim wrapper, "gensim" trains gensim's LdaMulticore
+            in process (keyword arguments are passed to LdaMulticore, e.g. workers, passes), and
+            "gibbs" trains in process with the NumPy sampler gibbs.train_lda (keyword arguments
+            alpha, iterations, random_seed, block_size). Mallet is only needed for "mallet".
+            With "gensim", topic_wordcounts holds expected (fractional) counts. Default is "mallet".
+        The following keyword arguments are used by the "mallet" backend:
         alpha (int, optional): Alpha parameter of LDA. Default is 50.
         workers (int, optional): Number of threads that will be used for training. Default is 4.
         prefix (str, optional): Prefix for produced temporary files. Defaul is None.
@@ -53,198 +196,249 @@ class TopicModel():
         random_seed (int, optional): Random seed to ensure consistent results, if 0 - use system clock. Default is 0.
 
     Attributes:
-        docs (OrderedDict): an ordered dictionary containing the (preprocessed) documents of the corpus
-            as values and corresponding document unique IDs as keys.
+        docs (DocumentStore): a read-only ordered mapping containing the (preprocessed) documents
+            of the corpus as values and corresponding document unique IDs as keys. Documents are
+            stored as token IDs over vocabulary and joined into strings on access.
+        doc_term_matrix (scipy.sparse.csr_matrix): a CSR sparse matrix containing the counts of each
+            term in each preprocessed document, built on first access. Shape: (number of documents
+            in docs, number of terms in term_index)
         doc_topic_proportions (numpy.ndarray): a matrix containing the topic
             proportions of each document. Shape: (number of documents, number of topics)
-        full_docs (OrderedDict): an ordered dictionary containing the documents of the corpus
-            as values and corresponding document unique IDs as keys. None if user
-            gave inputs for all Mallet parameters excepting mallet_input_filepath.
+        full_docs (OrderedDict or MalletInputDocuments): an ordered mapping containing the documents
+            of the corpus as values and corresponding document unique IDs as keys. When inputting
+            Mallet files, documents are read from mallet_input_filepath on access.
         n_docs (int): Number of documents in corpus.
         n_topics (int): Number of topics used to make LDA topic model.
         n_voc_words (int): Number of vocabulary words in corpus.
+        term_index (dict): a dictionary mapping each term of the preprocessed documents to its
+            column in doc_term_matrix. Vocabulary words map to their index in vocabulary; any other
+            terms found in the documents are numbered after them.
         topic_wordcounts (numpy.ndarray): a COO sparse matrix containing the counts of each
             vocabulary word in each topic. Shape: (number of topics, number of vocab words)
         vocabulary (iterable of str): a list containing all vocabulary words. Indeces match column
             indeces of topic_wordcounts.
     Raises:
-        RuntimeError: If Mallet is not on path and MALLET_PATH isn't set to Mallet location.
+        RuntimeError: If Mallet is needed (to train with the "mallet" backend, or to print an
+        instance list that instances.read_instance_list does not support) but is not on path
+        and MALLET_PATH isn't set to Mallet location. Loading Mallet output files does not
+        run Mallet otherwise.
         # appropriate error type?
         RuntimeError: If only one of mallet_doctopic_filepath, mallet_topic_wordcount_filepath,
         and mallet_instance_filepath is passed an argument. Must pass all an argument, or none.
+        ValueError: If backend is not one of TRAINING_BACKENDS.
+        ValueError: If the number of documents in the instance list differs from the number of
+        rows in the doc topics file.
         UserWarning: If corpus is unusually small (less than 100 documents).
     """
 
-    def _make_doc_dictionary(self, path_to_mallet, mallet_instance_filepath):
-        """Assigns class attribute _docs, an Ordered Dictionary containing document
+    def _make_doc_dictionary(self, mallet_instance_filepath):
+        """Assigns class attribute _docs, a DocumentStore containing document
         unique IDs as keys and preprocessed document text as values, for all documents in the corpus.
-        Creates and deletes a temporary file in the current directory called "temp_docs_will_be_deleted.txt". """
-        command = "{} info --input {} --print-instances".format(path_to_mallet,
-                                                                mallet_instance_filepath)
-        outfile = open("temp_docs_will_be_deleted.txt", "w")
-        util.call_command_line(command, stdout=outfile)
-        outfile.close()
-
-        docs_dictionary = OrderedDict()
-        with open("temp_docs_will_be_deleted.txt", "r") as in_file:
-            current_doc_id = ""
-            current_doc = []
-            for line in in_file:
-                word_search = re.search(": (.*?) ", line)
-                if word_search is None:  # doc contains nothing or empty line
-                    if current_doc_id != "":
-                        docs_dictionary[current_doc_id] = " ".join(current_doc)
-                        current_doc_id = ""
-                        current_doc = []
-                    continue
-                else:
-                    if current_doc_id == "":  # the first line of the doc
-                        current_doc_id = line.split()[0]
-                    word = word_search.group(1)
-                    current_doc.append(word)
-        os.remove("temp_docs_will_be_deleted.txt")
-        self._docs = docs_dictionary
+        Token IDs follow the order of the vocabulary, so _vocabulary must be assigned first.
+        The instance file is read directly; if it contains instance data that
+        instances.read_instance_list does not support, the instances are printed with
+        "mallet info" and read from its output as it is written."""
+        try:
+            self._docs = instances.load_document_store(
+                mallet_instance_filepath, self.vocabulary)
+        except ValueError:
+            command = "{} info --input {} --print-instances".format(find_mallet(),
+                                                                    mallet_instance_filepath)
+            doc_ids, doc_tokens = instances.read_printed_instances(
+                util.stream_command_line(command))
+            self._docs = DocumentStore.from_token_lists(
+                doc_ids, doc_tokens, self.vocabulary)
 
     def _make_wordcount_and_vocab(self, mallet_topic_wordcount_filepath, n_topics):
         """Assigns class attributes _topic_wordcounts (a COO sparse matrix of topic wordcounts)
         _vocabulary (the corpus vocabulary), _n_voc_words (size of the vocabulary).
-        The matrix has topics as columns and words as rows, so each entry is the
+        The matrix has topics as rows and words as columns, so each entry is the
         total word count for that word in that topic. The column index of the worcount
-        matches the index of that word in the vocabulary array."""
+        matches the index of that word in the vocabulary array. The file is read line by line
+        into growable integer arrays, so memory scales with the number of nonzero counts."""
+        topics = array("i")
+        words = array("i")
+        word_counts = array("i")
+        vocab = []
         with open(mallet_topic_wordcount_filepath, "r") as in_file:
-            lines = in_file.readlines()
-            n_voc_words = len(lines)
-            topic_wordcounts_matrix = np.zeros(
-                (n_topics, n_voc_words))
-            vocab = []
-            for word, line in enumerate(lines):
+            for word, line in enumerate(in_file):
                 # format of line: <index> <word> <topic>:<count> <topic>:<count> ...
                 term_and_counts = line.split()
                 # the vocab term
                 vocab += term_and_counts[1:2]
                 topic_wordcount_pairs = term_and_counts[2:]
-                for pair in topic_wordcount_pairs:
-                    topic, word_count = [int(num)
-                                         for num in pair.split(':')]
-                    topic_wordcounts_matrix[topic, word] += word_count
-        # coo_matrix for storage simplicity
-        self._topic_wordcounts = coo_matrix(topic_wordcounts_matrix)
+                topics_and_counts = " ".join(
+                    topic_wordcount_pairs).replace(":", " ").split()
+                topics.extend(map(int, topics_and_counts[0::2]))
+                word_counts.extend(map(int, topics_and_counts[1::2]))
+                words.extend([word] * len(topic_wordcount_pairs))
+        n_voc_words = len(vocab)
+        # coo_matrix for storage simplicity; repeated (topic, word) pairs are summed on conversion
+        self._topic_wordcounts = coo_matrix((np.frombuffer(word_counts, dtype=np.intc),
+                                             (np.frombuffer(topics, dtype=np.intc),
+                                              np.frombuffer(words, dtype=np.intc))),
+                                            shape=(n_topics, n_voc_words))
         # TODO topic_keys
         self._vocabulary = vocab
         self._n_voc_words = n_voc_words
 
-    def _make_doctopic_matrix(self, mallet_doctopic_filepath):
+    def _make_doctopic_matrix(self, mallet_doctopic_filepath, dtype=np.float64, chunk_size=2**24):
         """Assigns class attributes _doc_topic_proportions (a matrix of document-topic
         proportions), _n_docs (number of documents in the corpus), and _n_topics
         (number of topics). The matrix has topics as columns and documents as rows,
-        so each entry is the proportion of the given document that that topic comprises."""
+        so each entry is the proportion of the given document that that topic comprises.
+        The file is parsed in chunks of about chunk_size bytes, which are converted by NumPy
+        and written into a preallocated matrix of the given dtype."""
+        n_docs = util.count_lines(mallet_doctopic_filepath)
         with open(mallet_doctopic_filepath, "r") as in_file:
-            corpus_doc_topics = in_file.readlines()
-            n_docs = len(corpus_doc_topics)
             # the number of topics of the first line of the file
-            n_topics = len(corpus_doc_topics[0].split()[2:])
-            doc_topic_matrix = np.zeros((n_docs, n_topics))
-            for i, line in enumerate(corpus_doc_topics):
-                topics = line.split()[2:]
-                doc_topic_matrix[i] = [
-                    float(topic_prop) for topic_prop in topics]
+            n_topics = len(in_file.readline().split()[2:])
+        doc_topic_matrix = np.empty((n_docs, n_topics), dtype=dtype)
+        n_read = 0
+        for _, topic_props in util.iter_doctopic_chunks(mallet_doctopic_filepath, dtype, chunk_size):
+            doc_topic_matrix[n_read:n_read + len(topic_props)] = topic_props
+            n_read += len(topic_props)
 
         self._doc_topic_proportions = doc_topic_matrix
         self._n_docs = n_docs
         self._n_topics = n_topics
 
-    def _make_mallet_model(self, corpus_filepath, path_to_mallet, remove_stopwords, corpus_language, num_topics, **kwargs):
-        """Returns a gensim-created topic model (class LdaMallet), and assigns class
-        attributes _docs (an OrderedDict containing the preprocessed corpus documents)
-        and _vocabulary (the corpus vocabulary (iter of str)). This function lowercases
-        all words in the corpus, and removes stopwords if remove_stopwords is True.
-        The keys for the document dictionary are unique document ids of the format
-        "doc<i>" where <i> is the number of the document in the corpus."""
-        munged_corpus = munge.corpus_to_doc_tokens(corpus_filepath)
-
-        # make corpus lowercase, remove stopwords
-        if remove_stopwords:
-            stop_words = stopwords.words(corpus_language)
-            prepped_corpus = [
-                [word.lower() for word in doc if word.lower() not in stop_words] for doc in munged_corpus]
-        else:
-            prepped_corpus = [[word.lower() for word in doc]
-                              for doc in munged_corpus]
-        # TODO (7/12/19 faunam): make lowercasing corpus optional
-
-        id_to_word = corpora.Dictionary(prepped_corpus)
-        term_document_frequency = [
-            id_to_word.doc2bow(doc) for doc in prepped_corpus]
-        mallet_model = LdaMallet(path_to_mallet, corpus=term_document_frequency,
-                                 id2word=id_to_word, num_topics=num_topics, **kwargs)
-
-        docs = OrderedDict(("doc" + str(i), " ".join(doc))
-                           for i, doc in enumerate(prepped_corpus))
-        full_corpus = munge.corpus_to_documents(corpus_filepath)
-        full_docs = OrderedDict(("doc" + str(i), doc)
-                                for i, doc in enumerate(full_corpus))
-
-        self._docs = docs
-        self._full_docs = full_docs
-        self._vocabulary = [word for word in id_to_word.values()]
-
-        return mallet_model
+    def _load_cache(self, model_cache_path, cache_sources):
+        """Assigns the class attributes parsed from Mallet files (_doc_topic_proportions, _n_docs,
+        _n_topics, _topic_wordcounts, _vocabulary, _n_voc_words, _docs, _full_docs) from the
+        cache in model_cache_path, memory-mapping its arrays. Returns False, leaving the
+        attributes unassigned, if there is no cache for the current version of cache_sources."""
+        cached = cache.load_arrays(model_cache_path, cache_sources)
+        if cached is None:
+            return False
+        arrays, string_lists, _ = cached
+
+        self._doc_topic_proportions = arrays["doc_topic_proportions"]
+        self._n_docs, self._n_topics = self._doc_topic_proportions.shape
+        self._vocabulary = string_lists["vocabulary"]
+        self._n_voc_words = len(self._vocabulary)
+        self._topic_wordcounts = coo_matrix((arrays["topic_wordcount_data"],
+                                             (arrays["topic_wordcount_rows"], arrays["topic_wordcount_cols"])),
+                                            shape=(self._n_topics, self._n_voc_words))
+        self._docs = DocumentStore(string_lists["doc_ids"], arrays["token_ids"], arrays["doc_offsets"],
+                                   string_lists["doc_vocabulary"])
+        # the input file is the last cache source
+        self._full_docs = MalletInputDocuments(cache_sources[-1], string_lists["full_doc_ids"],
+                                               arrays["full_doc_starts"], arrays["full_doc_lengths"])
+        return True
+
+    def _save_cache(self, model_cache_path, source_fingerprint):
+        """Writes the class attributes parsed from Mallet files to the cache in model_cache_path,
+        with the cache.source_fingerprint of the files taken before they were parsed."""
+        cache.save_arrays(model_cache_path, source_fingerprint,
+                          {"doc_topic_proportions": self.doc_topic_proportions,
+                           "topic_wordcount_rows": self.topic_wordcounts.row,
+                           "topic_wordcount_cols": self.topic_wordcounts.col,
+                           "topic_wordcount_data": self.topic_wordcounts.data,
+                           "token_ids": self.docs.token_ids,
+                           "doc_offsets": self.docs.offsets,
+                           "full_doc_starts": self.full_docs.starts,
+                           "full_doc_lengths": self.full_docs.lengths},
+                          {"vocabulary": self.vocabulary,
+                           "doc_ids": self.docs.doc_ids,
+                           "doc_vocabulary": self.docs.vocabulary,
+                           "full_doc_ids": self.full_docs.doc_ids})
+
+    def _set_topics(self, doc_topic_proportions, topic_wordcounts, doc_topic_dtype=np.float64):
+        """Assigns class attributes _doc_topic_proportions, _topic_wordcounts, _n_docs,
+        _n_voc_words and _n_topics from the outputs of a trained topic model."""
+        self._doc_topic_proportions = np.asarray(
+            doc_topic_proportions).astype(doc_topic_dtype, copy=False)
+        self._topic_wordcounts = topic_wordcounts
+        self._n_docs = len(self.docs)
+        self._n_voc_words = len(self.vocabulary)
+        self._n_topics = self._doc_topic_proportions.shape[1]
+
+    def _check_doc_count(self):
+        """Raises a ValueError if docs don't line up with the rows of doc_topic_proportions."""
+        if len(self._docs) != self._doc_topic_proportions.shape[0]:
+            raise ValueError("The corpus has {} documents, but there are topic proportions for {}.".format(
+                len(self._docs), self._doc_topic_proportions.shape[0]))
+
+    def _init_caches(self):
+        """Assigns the caches built on first use, see chunk_index, topic_wordcounts_csr and
+        word_distribution."""
+        self._chunk_index = None
+        self._topic_wordcounts_csr = None
+        self._word_distribution = None
+
+    @classmethod
+    def from_topics(cls, docs, full_docs, doc_topic_proportions, topic_wordcounts,
+                    doc_topic_dtype=np.float64):
+        """Return a TopicModel of an already preprocessed corpus (see preprocess_corpus) and the
+        outputs of a topic model trained on it (see train_topics), without training.
+        Arguments:
+            docs (DocumentStore): the preprocessed corpus documents; its vocabulary is the
+                vocabulary of the topic model.
+            full_docs (OrderedDict or MalletInputDocuments): the corpus documents.
+            doc_topic_proportions (numpy.ndarray): the topic proportions of each document.
+            topic_wordcounts (scipy.sparse.coo_matrix): the counts of each vocabulary word in
+                each topic.
+            doc_topic_dtype (numpy.dtype, optional): the dtype of doc_topic_proportions.
+                Default is numpy.float64."""
+        topic_model = cls.__new__(cls)
+        topic_model._docs = docs
+        topic_model._full_docs = full_docs
+        topic_model._vocabulary = docs.vocabulary
+        topic_model._set_topics(
+            doc_topic_proportions, topic_wordcounts, doc_topic_dtype)
+        topic_model._check_doc_count()
+        topic_model._init_caches()
+        return topic_model
 
     def __init__(self, corpus_filepath, mallet_doctopic_filepath=None,
                  mallet_topic_wordcount_filepath=None, mallet_instance_filepath=None,
                  mallet_input_filepath=None, remove_stopwords=False,
-                 corpus_language="english", num_topics=20, **kwargs):
-
-        path_to_mallet = MALLET_PATH
-        try:
-            if path_to_mallet is None:
-                path_to_mallet = "mallet"
-            # tests that mallet is there, doesnt run it
-            util.call_command_line(path_to_mallet)
-        except:
-            raise RuntimeError("Unable to locate mallet command {}. Please \
-            make sure Mallet is added to your PATH variable, or add the path to \
-            your Mallet installation to the MALLET_PATH variable at the top \
-            of mallet.py.".format(path_to_mallet))
-
-        # topic model outputs using model created with gensim wrapper
-        if mallet_doctopic_filepath is None and mallet_topic_wordcount_filepath is None \
-                and mallet_instance_filepath is None and mallet_input_filepath is None:
-
-            # self._docs and self._vocabulary are assigned in the body of this class method call
-            mallet_model = self._make_mallet_model(
-                corpus_filepath, path_to_mallet, remove_stopwords, corpus_language, num_topics, **kwargs)
-            self._n_docs = len(self.docs)
-            self._n_voc_words = len(self.vocabulary)
-            self._n_topics = num_topics
-
-            doc_topic_prop_matrix = np.zeros((self.n_docs, self.n_topics))
-            for i, line in enumerate(mallet_model.load_document_topics()):
-                # extracting proportion from label tuple
-                doc_topics = [topic_prop[1] for topic_prop in line]
-                doc_topic_prop_matrix[i] = doc_topics
-
-            self._doc_topic_proportions = doc_topic_prop_matrix
-            # coo_matrix for storage simplicity
-            self._topic_wordcounts = coo_matrix(
-                mallet_model.load_word_topics())
+                 corpus_language="english", num_topics=20, doc_topic_dtype=np.float64, cache_dir=None,
+                 backend="mallet", **kwargs):
+        if backend not in TRAINING_BACKENDS:
+            raise ValueError("Unknown training backend {}. Choose one of {}.".format(
+                backend, ", ".join(TRAINING_BACKENDS)))
+        no_mallet_files = mallet_doctopic_filepath is None and mallet_topic_wordcount_filepath is None \
+            and mallet_instance_filepath is None and mallet_input_filepath is None
+
+        # topic model trained with backend: the gensim Mallet wrapper, or in process
+        if no_mallet_files:
+            self._docs, self._full_docs, id_to_word, term_document_frequency = preprocess_corpus(
+                corpus_filepath, remove_stopwords, corpus_language)
+            self._vocabulary = self._docs.vocabulary
+            doc_topic_proportions, topic_wordcounts = train_topics(
+                self._docs, id_to_word, term_document_frequency, num_topics, backend, **kwargs)
+            # assigns self._doc_topic_proportions, self._topic_wordcounts, self._n_docs,
+            # self._n_voc_words and self._n_topics
+            self._set_topics(doc_topic_proportions,
+                             topic_wordcounts, doc_topic_dtype)
 
         # topic model outputs using MALLET output files
         elif mallet_doctopic_filepath is not None and mallet_topic_wordcount_filepath is not None \
                 and mallet_instance_filepath is not None and mallet_input_filepath is not None:
-            # assigns self._docs
-            self._make_doc_dictionary(
-                path_to_mallet, mallet_instance_filepath)
-            # assigns self._doc_topic_proportions, self._n_docs, self._n_topics
-            self._make_doctopic_matrix(mallet_doctopic_filepath)
-            # assigns self._topic_wordcounts, self._vocabulary, self._n_voc_words
-            self._make_wordcount_and_vocab(
-                mallet_topic_wordcount_filepath, self.n_topics)
-            # assign self._full_docs
-            with open(mallet_input_filepath, "r") as in_file:
-                full_docs = OrderedDict((line.split("\t")[0], line.split("\t")[
-                    2].strip()) for line in in_file.readlines())
-            self._full_docs = full_docs
+            cache_sources = [mallet_doctopic_filepath, mallet_topic_wordcount_filepath,
+                             mallet_instance_filepath, mallet_input_filepath]
+            if cache_dir is not None:
+                model_cache_path = cache.cache_path(
+                    cache_dir, cache_sources, doc_topic_dtype=np.dtype(doc_topic_dtype).name)
+            # assigns self._doc_topic_proportions, self._n_docs, self._n_topics,
+            # self._topic_wordcounts, self._vocabulary, self._n_voc_words, self._docs, self._full_docs
+            if cache_dir is None or not self._load_cache(model_cache_path, cache_sources):
+                source_fingerprint = cache.source_fingerprint(cache_sources)
+                # assigns self._doc_topic_proportions, self._n_docs, self._n_topics
+                self._make_doctopic_matrix(
+                    mallet_doctopic_filepath, doc_topic_dtype)
+                # assigns self._topic_wordcounts, self._vocabulary, self._n_voc_words
+                self._make_wordcount_and_vocab(
+                    mallet_topic_wordcount_filepath, self.n_topics)
+                # assigns self._docs
+                self._make_doc_dictionary(mallet_instance_filepath)
+                # assign self._full_docs, read from the input file on access
+                self._full_docs = MalletInputDocuments.from_file(
+                    mallet_input_filepath)
+                if cache_dir is not None:
+                    self._save_cache(model_cache_path, source_fingerprint)
 
         else:
             raise RuntimeError(
@@ -252,6 +446,9 @@ class TopicModel():
                 for all four parameters starting with \"mallet\"! If you don't have Mallet files, don't \
                 input any arguments for these parameters.")
 
+        self._check_doc_count()
+        self._init_caches()
+
         if self.n_docs < 100:  # an abnormally low corpus size
             warnings.warn(
                 "Corpus is abnormally small (below 100 documents).")
@@ -266,11 +463,51 @@ class TopicModel():
         """Get full corpus documents"""
         return self._full_docs
 
+    @property
+    def doc_term_matrix(self):
+        """Get the document term count matrix"""
+        return self._docs.doc_term_matrix
+
+    @property
+    def term_index(self):
+        """Get the dictionary mapping terms to doc_term_matrix columns"""
+        return self._docs.term_index
+
+    @property
+    def chunk_index(self):
+        """Get the dictionary mapping each vocabulary word and each of its chunks (the parts of a
+        phrase such as "home_prices" separated by "_") to the sorted vocabulary IDs of the words
+        containing it. Built on first access and shared by all filters using this model."""
+        if self._chunk_index is None:
+            chunk_index = {}
+            for word_id, word in enumerate(self._vocabulary):
+                chunk_index.setdefault(word, []).append(word_id)
+                if "_" in word:
+                    for chunk in set(word.split("_")) - {word}:
+                        chunk_index.setdefault(chunk, []).append(word_id)
+            self._chunk_index = chunk_index
+        return self._chunk_index
+
     @property
     def topic_wordcounts(self):
         """Get the topic wordcounts matrix"""
         return self._topic_wordcounts
 
+    @property
+    def topic_wordcounts_csr(self):
+        """Get the topic wordcounts matrix in CSR format, converted on first access"""
+        if self._topic_wordcounts_csr is None:
+            self._topic_wordcounts_csr = self._topic_wordcounts.tocsr()
+        return self._topic_wordcounts_csr
+
+    @property
+    def word_distribution(self):
+        """Get the proportion of each vocabulary word in the whole corpus, computed on first access"""
+        if self._word_distribution is None:
+            word_counts = np.asarray(self.topic_wordcounts_csr.sum(axis=0)).ravel()
+            self._word_distribution = word_counts / word_counts.sum()
+        return self._word_distribution
+
     @property
     def doc_topic_proportions(self):
         """Get the document topic proportions matrix"""
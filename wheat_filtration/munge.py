@@ -1,9 +1,13 @@
+import bz2
+import fnmatch
+import functools
+import gzip
+import lzma
+import multiprocessing
 from typing import List
 import os
 import string
 
-import nltk.data
-
 
 def _make_punctuation_dict():
     """Return a dictionary for punctuation removal. Maps all punctuation to an empty
@@ -35,99 +39,238 @@ def clean_punc(phrase):
     return phrase.translate(PUNC_DICT)
 
 
-def import_corpus(corpus_filepath: str):
-    """Load corpus from corpus_filepath into one string.
+def _open_corpus_file(filepath):
+    """Return a text file object for filepath, decompressing .gz, .bz2 and .xz files."""
+    if filepath.endswith(".gz"):
+        return gzip.open(filepath, "rt")
+    if filepath.endswith(".bz2"):
+        return bz2.open(filepath, "rt")
+    if filepath.endswith(".xz"):
+        return lzma.open(filepath, "rt")
+    return open(filepath, "r")
+
+
+def corpus_filepaths(corpus_filepath: str, include=None):
+    """Return the sorted list of corpus files at corpus_filepath.
     Arguments:
         corpus_filepath (str): the path to the text file or directory (containing text files)
-            where the corpus is located. If corpus_filepath is a directory, it must end in /
-            or \\ (whichever is appropriate to your system)! This function will parse all
-            files in the given directory that are not system files.
+            where the corpus is located. In a directory, system files (starting with ".") and
+            subdirectories are skipped.
+        include (str or re.Pattern, optional): only include files in a directory whose name matches
+            this glob pattern (e.g. "*.txt.gz") or regular expression. Default is None (all files).
     Returns:
-        full_corp (str): a string containing the corpus"""
-
-    full_corp = ""
+        (list of str): paths of the corpus files."""
     if not os.path.isdir(corpus_filepath):
-        with open(corpus_filepath, "r") as in_file:
-            full_corp += in_file.read()
-    else:
-        directory = os.fsencode(corpus_filepath)
-        for thisfile in os.listdir(directory):
-            filename = os.fsdecode(thisfile)
-            # skip system files
-            # TODO add functionality enabling a regex input for the kinds of files they want to parse
-            if filename[0] == ".":  # eg or regex not in filename
+        return [corpus_filepath]
+    filepaths = []
+    for filename in sorted(os.listdir(corpus_filepath)):
+        # skip system files
+        if filename[0] == ".":
+            continue
+        if include is not None:
+            if isinstance(include, str) and not fnmatch.fnmatch(filename, include):
                 continue
-            if not os.path.isdir(corpus_filepath + filename):
-                with open(corpus_filepath + filename, "r") as in_file:
-                    full_corp += in_file.read()
-            else:
+            if not isinstance(include, str) and include.search(filename) is None:
                 continue
-    return full_corp
+        filepath = os.path.join(corpus_filepath, filename)
+        if not os.path.isdir(filepath):
+            filepaths.append(filepath)
+    return filepaths
 
 
-def corpus_to_doc_tokens(corpus_filepath: str, doc_size_range=(250, 500)):
-    """Splits corpus into tokenized documents, in the form of lists of strings, of appropriate size
-    (number of words within doc_size_range).
+def iter_corpus(corpus_filepath: str, include=None):
+    """Yields the contents of the corpus one file at a time, so that only one file is
+    held in memory. Files ending in .gz, .bz2 or .xz are decompressed.
+    Arguments:
+        corpus_filepath (str): the path to the text file or directory (containing text files)
+            where the corpus is located.
+        include (str or re.Pattern, optional): see corpus_filepaths. Default is None.
+    Returns:
+        (iterator of str): the text of each corpus file"""
+    for filepath in corpus_filepaths(corpus_filepath, include):
+        with _open_corpus_file(filepath) as in_file:
+            yield in_file.read()
+
+
+def import_corpus(corpus_filepath: str, include=None):
+    """Load corpus from corpus_filepath into one string.
     Arguments:
         corpus_filepath (str): the path to the text file or directory (containing text files)
-            where the corpus is located. If corpus_filepath is a directory, it must end in /
-            or \\ (whichever is appropriate to your system)
+            where the corpus is located. This function will parse all files in the given
+            directory that are not system files. Files ending in .gz, .bz2 or .xz are decompressed.
+        include (str or re.Pattern, optional): see corpus_filepaths. Default is None.
+    Returns:
+        full_corp (str): a string containing the corpus"""
+    return "".join(iter_corpus(corpus_filepath, include))
+
+
+@functools.lru_cache(maxsize=None)
+def load_sentence_detector():
+    """Return the English NLTK Punkt sentence tokenizer, loaded once per process."""
+    # nltk is slow to import, and only needed to split raw text into sentences
+    import nltk.data
+    return nltk.data.load('tokenizers/punkt/english.pickle')
+
+
+def split_sentences(corpus: str, sentence_detector=None):
+    """Yields the sentences of corpus one by one, as detected by the NLTK Punkt tokenizer.
+    Arguments:
+        corpus (str): the corpus text.
+        sentence_detector (nltk.tokenize.punkt.PunktSentenceTokenizer, optional): the sentence
+            tokenizer. Default is the English Punkt tokenizer.
+    Returns:
+        (iterator of str): the sentences of the corpus; tokens have punctuation attached."""
+    if sentence_detector is None:
+        sentence_detector = load_sentence_detector()
+    corpus = corpus.strip()
+    for start, end in sentence_detector.span_tokenize(corpus):
+        yield corpus[start:end]
+
+
+def sentences_to_doc_tokens(sentences, doc_size_range=(250, 500)):
+    """Groups a stream of sentences into tokenized documents (lists of strings) of appropriate size
+    (number of words within doc_size_range), yielding each document once it is complete.
+    Runs in time linear in the number of words.
+    Arguments:
+        sentences (iterable of str): the sentences of the corpus, with punctuation.
         doc_size_range ((int,int), optional): a tuple containing the min and the
         max number of words to be included in a document. Default is (250, 500).
     Returns:
-        corpus_documents (iterable of iterable of str): a list of tokenized documents.
-        Document lengths fall within doc_size_range, except possibly for the last document in the corpus.
-        They end on the next sentence punctuation after the minimum number of words, or at
-        the maximum number of words, whichever comes first. If the sentence following
-        a document is the last in the corpus, it is also included in the document."""
+        (iterator of list of str): tokenized documents, as described in corpus_to_doc_tokens."""
+    return sentence_tokens_to_doc_tokens((clean_punc(sentence).split() for sentence in sentences),
+                                         doc_size_range)
+
 
-    corpus = import_corpus(corpus_filepath)
-    sentence_detector = nltk.data.load('tokenizers/punkt/english.pickle')
-    sentences = sentence_detector.tokenize(
-        corpus.strip())  # tokens have punc attached
+def sentence_tokens_to_doc_tokens(sentence_tokens, doc_size_range=(250, 500)):
+    """Like sentences_to_doc_tokens, for sentences that are already cleaned of punctuation and
+    split into tokens.
+    Arguments:
+        sentence_tokens (iterable of list of str): the tokens of each sentence of the corpus.
+        doc_size_range ((int,int), optional): a tuple containing the min and the
+        max number of words to be included in a document. Default is (250, 500).
+    Returns:
+        (iterator of list of str): tokenized documents, as described in corpus_to_doc_tokens."""
     min_words = doc_size_range[0]
     max_words = doc_size_range[1]
 
-    corpus_documents = []
+    # the last document is held back, since leftover words at the end of the corpus are added to it
+    last_document = None
     document_in_progress = []
-    for sentence in sentences:
-        while len(document_in_progress) > max_words:
-            corpus_documents.append(document_in_progress[:max_words])
-            document_in_progress = document_in_progress[max_words:]
+    for tokens in sentence_tokens:
+        if len(document_in_progress) > max_words:
+            # split off documents of max_words while more than max_words are left
+            n_full_documents = (len(document_in_progress) - 1) // max_words
+            for i in range(n_full_documents):
+                if last_document is not None:
+                    yield last_document
+                last_document = document_in_progress[i *
+                                                     max_words:(i + 1) * max_words]
+            document_in_progress = document_in_progress[n_full_documents * max_words:]
         if len(document_in_progress) < min_words:
-            document_in_progress.extend(clean_punc(sentence).split())
+            document_in_progress.extend(tokens)
         else:
             # add document to corpus once it is between min_words and max_words
-            corpus_documents.append(document_in_progress)
+            if last_document is not None:
+                yield last_document
+            last_document = document_in_progress
             document_in_progress = []
     # adds leftover at end of corpus to last document
-    try:
-        corpus_documents[-1].extend(document_in_progress)
+    if last_document is not None:
+        last_document.extend(document_in_progress)
+        yield last_document
     # allow user to import an abnormally small corpus; warn at time of topic model creation
-    except IndexError:
-        corpus_documents.append(document_in_progress)
+    else:
+        yield document_in_progress
+
+
+def _tokenize_corpus_file(filepath):
+    """Return the tokens of each sentence of the corpus file at filepath, cleaned of punctuation.
+    Runs in the worker processes of iter_sentence_tokens."""
+    with _open_corpus_file(filepath) as in_file:
+        text = in_file.read()
+    return [clean_punc(sentence).split() for sentence in split_sentences(text)]
+
+
+def iter_sentence_tokens(corpus_filepath: str, include=None, processes=None):
+    """Yields the tokens of each sentence of the corpus, cleaned of punctuation. Files are
+    read, sentence-tokenized and cleaned in parallel by a pool of worker processes (each loading
+    the sentence tokenizer once); sentences are yielded in file order, like the serial path.
+    Arguments:
+        corpus_filepath (str): the path to the text file or directory (containing text files)
+            where the corpus is located.
+        include (str or re.Pattern, optional): see corpus_filepaths. Default is None.
+        processes (int, optional): number of worker processes. Default is None (one per CPU).
+    Returns:
+        (iterator of list of str): the tokens of each sentence."""
+    with multiprocessing.Pool(processes, initializer=load_sentence_detector) as pool:
+        for file_sentence_tokens in pool.imap(_tokenize_corpus_file,
+                                              corpus_filepaths(corpus_filepath, include)):
+            yield from file_sentence_tokens
 
-    return corpus_documents
 
+def iter_doc_tokens(corpus, doc_size_range=(250, 500), include=None, processes=1):
+    """Yields the tokenized documents of corpus one by one, reading and sentence-tokenizing
+    one corpus file at a time, so that memory use is bounded by the largest file.
+    Arguments:
+        corpus (str or iterable of str): the path to the text file or directory (containing text
+            files) where the corpus is located, or a stream of texts such as iter_corpus(...).
+            Each text is split into sentences separately.
+        doc_size_range ((int,int), optional): a tuple containing the min and the
+        max number of words to be included in a document. Default is (250, 500).
+        include (str or re.Pattern, optional): see corpus_filepaths. Only used if corpus is a path.
+            Default is None.
+        processes (int, optional): number of worker processes tokenizing corpus files in parallel,
+            see iter_sentence_tokens. None uses one per CPU. Only used if corpus is a path. The
+            documents are the same for any number of processes. Default is 1 (no worker processes).
+    Returns:
+        (iterator of list of str): tokenized documents, as described in corpus_to_doc_tokens."""
+    if isinstance(corpus, str):
+        if processes != 1:
+            return sentence_tokens_to_doc_tokens(
+                iter_sentence_tokens(corpus, include, processes), doc_size_range)
+        corpus = iter_corpus(corpus, include)
+    # tokens have punc attached
+    sentences = (sentence for text in corpus
+                 for sentence in split_sentences(text))
+    return sentences_to_doc_tokens(sentences, doc_size_range)
 
-def corpus_to_documents(corpus_filepath: str, doc_size_range=(250, 500)):
+
+def corpus_to_doc_tokens(corpus_filepath, doc_size_range=(250, 500), include=None, processes=1):
+    """Splits corpus into tokenized documents, in the form of lists of strings, of appropriate size
+    (number of words within doc_size_range).
+    Arguments:
+        corpus_filepath (str or iterable of str): the path to the text file or directory (containing
+            text files) where the corpus is located, or a stream of texts such as iter_corpus(...).
+        doc_size_range ((int,int), optional): a tuple containing the min and the
+        max number of words to be included in a document. Default is (250, 500).
+        include (str or re.Pattern, optional): see corpus_filepaths. Default is None.
+        processes (int, optional): number of worker processes, see iter_doc_tokens. Default is 1.
+    Returns:
+        corpus_documents (iterable of iterable of str): a list of tokenized documents.
+        Document lengths fall within doc_size_range, except possibly for the last document in the corpus.
+        They end on the next sentence punctuation after the minimum number of words, or at
+        the maximum number of words, whichever comes first. If the sentence following
+        a document is the last in the corpus, it is also included in the document."""
+    return list(iter_doc_tokens(corpus_filepath, doc_size_range, include, processes))
+
+
+def corpus_to_documents(corpus_filepath, doc_size_range=(250, 500), include=None, processes=1):
     """Splits corpus into appropriately sized documents in the form of strings with
     a length falling within doc_size_range.
     Arguments:
-        corpus_filepath (str): the path to the text file or directory (containing text files)
-            where the corpus is located. If corpus_filepath is a directory, it must end in /
-            or \\ (whichever is appropriate to your system)
+        corpus_filepath (str or iterable of str): the path to the text file or directory (containing
+            text files) where the corpus is located, or a stream of texts such as iter_corpus(...).
         doc_size_range ((int,int), optional): a tuple containing the min and the
         max number of words to be included in a document. Default is (250, 500).
+        include (str or re.Pattern, optional): see corpus_filepaths. Default is None.
+        processes (int, optional): number of worker processes, see iter_doc_tokens. Default is 1.
     Returns:
         corpus_documents (iterable of str): a list containing strings representing documents in the corpus.
         Document lengths fall within doc_size_range, except possibly for the last document in the corpus.
         They end on the next sentence punctuation after the minimum number of words, or at
         the maximum number of words, whichever comes first. If the sentence following
         a document is the last in the corpus, it is also included in the document."""
-    tokenized_corpus = corpus_to_doc_tokens(corpus_filepath, doc_size_range)
-    corpus_documents = [(" ").join(doc) for doc in tokenized_corpus]
-    return corpus_documents
+    return [(" ").join(doc) for doc in iter_doc_tokens(corpus_filepath, doc_size_range, include, processes)]
 
 
 def write_clean_corpus(split_corpus_list: List[str], doc_uniq_ids: list,
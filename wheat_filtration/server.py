@@ -0,0 +1,386 @@
+import asyncio
+from collections import deque
+import json
+import time
+
+import numpy as np
+
+import filter
+import inference
+
+# HTTP status lines used by the server
+_STATUS_LINES = {200: "200 OK", 400: "400 Bad Request", 404: "404 Not Found",
+                 405: "405 Method Not Allowed", 413: "413 Payload Too Large",
+                 500: "500 Internal Server Error"}
+
+
+class ServerMetrics():
+    """Latency and throughput statistics of a ScoringServer.
+
+    Arguments:
+        max_latencies (int, optional): number of most recent request latencies kept for the
+        latency percentiles. Default is 10000.
+
+    Attributes:
+        n_requests (int): number of scoring requests answered.
+        n_docs (int): number of documents scored.
+        n_batches (int): number of vectorized scoring calls.
+    """
+
+    def __init__(self, max_latencies=10000):
+        self._start_time = time.perf_counter()
+        self._latencies = deque(maxlen=max_latencies)
+        self._n_requests = 0
+        self._n_docs = 0
+        self._n_batches = 0
+        self._scoring_seconds = 0.0
+
+    @property
+    def n_requests(self):
+        """Get the number of scoring requests answered"""
+        return self._n_requests
+
+    @property
+    def n_docs(self):
+        """Get the number of documents scored"""
+        return self._n_docs
+
+    @property
+    def n_batches(self):
+        """Get the number of vectorized scoring calls"""
+        return self._n_batches
+
+    def record_request(self, latency):
+        """Records the latency in seconds of an answered scoring request."""
+        self._n_requests += 1
+        self._latencies.append(latency)
+
+    def record_batch(self, n_docs, seconds):
+        """Records a scoring call over n_docs documents that took seconds."""
+        self._n_batches += 1
+        self._n_docs += n_docs
+        self._scoring_seconds += seconds
+
+    def snapshot(self):
+        """Return the current statistics as a JSON-serializable dictionary: request, document
+        and batch counts, the mean batch size, latency percentiles in milliseconds over the
+        most recent requests, and throughput in documents per second since the server started
+        and per second spent scoring."""
+        uptime = time.perf_counter() - self._start_time
+        latencies = np.array(self._latencies) * 1000
+        latency_ms = {}
+        if len(latencies):
+            for name, percentile in [("p50", 50), ("p95", 95), ("p99", 99), ("max", 100)]:
+                latency_ms[name] = float(np.percentile(latencies, percentile))
+        return {"uptime_seconds": uptime,
+                "requests": self._n_requests,
+                "docs": self._n_docs,
+                "batches": self._n_batches,
+                "mean_batch_size": self._n_docs / self._n_batches if self._n_batches else 0.0,
+                "latency_ms": latency_ms,
+                "docs_per_second": self._n_docs / uptime if uptime > 0 else 0.0,
+                "docs_per_scoring_second": self._n_docs / self._scoring_seconds
+                if self._scoring_seconds > 0 else 0.0}
+
+
+class _Query():
+    """A pending scoring request: documents of the corpus (by position) and new texts to score
+    with one filter, and the future its results are set on."""
+
+    def __init__(self, filter_name, doc_ids, doc_positions, texts, future):
+        self.filter_name = filter_name
+        self.doc_ids = doc_ids
+        self.doc_positions = doc_positions
+        self.texts = texts
+        self.future = future
+
+    def __len__(self):
+        return len(self.doc_positions) + len(self.texts)
+
+
+class ScoringServer():
+    """A resident relevance scoring service over HTTP on localhost. The topic model and filters
+    are loaded once, and concurrent requests are micro-batched: requests that arrive while a
+    batch is scored, or within max_batch_delay of the first request of a batch, are scored
+    together with vectorized calls.
+
+    Endpoints:
+        POST /score: scores a JSON object with "doc_ids" (a list of unique IDs of documents of
+        the topic model corpus) and/or "texts" (an object mapping IDs to new document texts,
+        scored with fold-in inference), and optionally "filter" (the name of the filter).
+        Returns {"results": [...]} with an object per document: "id", "relevant",
+        "total_topic_prop", "keyword_prop" and "has_superkeyword".
+        GET /metrics: returns ServerMetrics.snapshot().
+
+    Arguments:
+        topic_model (TopicModel): the topic model of the corpus.
+        filter_helpers (FilterHelper or dict): a FilterHelper, or a dictionary mapping filter
+        names to FilterHelper objects, made for topic_model. The first filter is used when a
+        request names none.
+        inferencer (inference.TopicInferencer, optional): infers the topic proportions of new
+        texts. Default is None (one is made from topic_model with default settings).
+        host (str, optional): the address to listen on. Default is "127.0.0.1" (local only).
+        port (int, optional): the port to listen on; 0 picks a free port. Default is 8765.
+        max_batch_size (int, optional): maximum number of documents scored in one batch; larger
+        requests are scored alone. Default is 1024.
+        max_batch_delay (float, optional): seconds to wait for more requests after the first
+        request of a batch. Default is 0.002.
+        max_request_bytes (int, optional): maximum size of a request body. Default is 2**24.
+
+    Attributes:
+        address (tuple): the (host, port) the server listens on, once started.
+        metrics (ServerMetrics): latency and throughput statistics.
+    Raises:
+        ValueError: if there are no filters, or a filter was not made for topic_model.
+    """
+
+    def __init__(self, topic_model, filter_helpers, inferencer=None, host="127.0.0.1", port=8765,
+                 max_batch_size=1024, max_batch_delay=0.002, max_request_bytes=2**24):
+        if isinstance(filter_helpers, filter.FilterHelper):
+            filter_helpers = {"default": filter_helpers}
+        if not filter_helpers:
+            raise ValueError("At least one filter is required.")
+        self._topic_model = topic_model
+        self._filter_helpers = dict(filter_helpers)
+        self._default_filter = next(iter(self._filter_helpers))
+        if inferencer is None:
+            inferencer = inference.TopicInferencer(topic_model)
+        self._inferencer = inferencer
+        self._host = host
+        self._port = port
+        self._max_batch_size = max_batch_size
+        self._max_batch_delay = max_batch_delay
+        self._max_request_bytes = max_request_bytes
+        self._metrics = ServerMetrics()
+        self._server = None
+        self._queue = None
+        self._batch_task = None
+
+        # computing the masks once fills the per-document feature caches of all filters,
+        # which requests for corpus documents are answered from
+        filter.relevance_masks(topic_model, self._filter_helpers.values())
+
+    @property
+    def address(self):
+        """Get the (host, port) the server listens on"""
+        return self._server.sockets[0].getsockname()[:2] if self._server else None
+
+    @property
+    def metrics(self):
+        """Get the latency and throughput statistics"""
+        return self._metrics
+
+    async def start(self):
+        """Starts listening for requests and scoring batches."""
+        self._queue = asyncio.Queue()
+        self._batch_task = asyncio.ensure_future(self._score_batches())
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+
+    async def close(self):
+        """Stops listening and scoring."""
+        self._server.close()
+        await self._server.wait_closed()
+        self._batch_task.cancel()
+        try:
+            await self._batch_task
+        except asyncio.CancelledError:
+            pass
+
+    async def serve_forever(self):
+        """Starts the server and serves requests until cancelled."""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def score(self, doc_ids=(), texts=None, filter_name=None):
+        """Return the scores of the documents of the corpus with unique IDs doc_ids and of the new
+        texts (a dictionary mapping IDs to texts) with the filter named filter_name, as listed by
+        POST /score. The request is batched with other concurrent requests.
+        Raises:
+            KeyError: if the filter or a document ID is unknown.
+            ValueError: if a text is not a string."""
+        start = time.perf_counter()
+        if filter_name is None:
+            filter_name = self._default_filter
+        if filter_name not in self._filter_helpers:
+            raise KeyError("Unknown filter {}".format(filter_name))
+        doc_ids = list(doc_ids)
+        docs = self._topic_model.docs
+        for doc_id in doc_ids:
+            if doc_id not in docs:
+                raise KeyError("Unknown document {}".format(doc_id))
+        texts = dict(texts or {})
+        if not all(isinstance(text, str) for text in texts.values()):
+            raise ValueError("Texts must be strings")
+        query = _Query(filter_name, doc_ids, [docs.position(doc_id) for doc_id in doc_ids],
+                       texts, asyncio.get_running_loop().create_future())
+        await self._queue.put(query)
+        results = await query.future
+        self._metrics.record_request(time.perf_counter() - start)
+        return results
+
+    async def _next_batch(self):
+        """Return the queries of the next batch: the first waiting query, and the queries that
+        arrive within max_batch_delay after it while the batch is below max_batch_size."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        n_docs = len(batch[0])
+        deadline = loop.time() + self._max_batch_delay
+        while n_docs < self._max_batch_size:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    query = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                query = self._queue.get_nowait()
+            batch.append(query)
+            n_docs += len(query)
+        return batch
+
+    async def _score_batches(self):
+        """Scores batches of queries one after the other, in a worker thread so that requests
+        keep being accepted (and queued into the next batch) meanwhile."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            start = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(None, self._score_batch, batch)
+            except Exception as error:
+                for query in batch:
+                    if not query.future.done():
+                        query.future.set_exception(error)
+                continue
+            self._metrics.record_batch(sum(len(query) for query in batch),
+                                       time.perf_counter() - start)
+            for query, query_results in zip(batch, results):
+                if not query.future.done():
+                    query.future.set_result(query_results)
+
+    def _score_batch(self, batch):
+        """Return the results of each query of batch, scoring the queries of each filter with
+        one call over all of their corpus documents and one call over all of their new texts."""
+        results = [[] for _ in batch]
+        for filter_name in {query.filter_name for query in batch}:
+            filter_helper = self._filter_helpers[filter_name]
+            queries = [i for i, query in enumerate(batch) if query.filter_name == filter_name]
+
+            doc_positions = np.concatenate([batch[i].doc_positions for i in queries]).astype(np.int64)
+            features = [filter_helper.total_topic_props[doc_positions],
+                        filter_helper.keyword_props[doc_positions],
+                        filter_helper.has_superkeyword[doc_positions]]
+            doc_ids = [doc_id for i in queries for doc_id in batch[i].doc_ids]
+
+            # new texts are renamed by position, since IDs may repeat across queries
+            texts = [text for i in queries for text in batch[i].texts.values()]
+            if texts:
+                new_features = filter.new_doc_proportion_lists(
+                    filter_helper, {str(j): text for j, text in enumerate(texts)}, self._inferencer)
+                features = [np.concatenate((old, new)) for old, new in zip(features, new_features)]
+                doc_ids += [text_id for i in queries for text_id in batch[i].texts]
+
+            total_topic_props, keyword_props, has_superkeyword = features
+            relevant = filter._passes(filter_helper, total_topic_props, keyword_props, has_superkeyword)
+            records = [{"id": doc_id, "relevant": bool(is_relevant),
+                        "total_topic_prop": float(total_topic_prop), "keyword_prop": float(keyword_prop),
+                        "has_superkeyword": bool(superkeyword)}
+                       for doc_id, is_relevant, total_topic_prop, keyword_prop, superkeyword in zip(
+                           doc_ids, relevant, total_topic_props, keyword_props, has_superkeyword)]
+
+            # hand the records back in query order: corpus documents, then texts
+            n_corpus_docs = len(doc_positions)
+            corpus_records, text_records = iter(records[:n_corpus_docs]), iter(records[n_corpus_docs:])
+            for i in queries:
+                results[i] = [next(corpus_records) for _ in batch[i].doc_positions] + \
+                    [next(text_records) for _ in batch[i].texts]
+        return results
+
+    async def _handle_connection(self, reader, writer):
+        """Answers the HTTP requests of a connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    content_length = int(headers.get("content-length", 0))
+                except ValueError:
+                    content_length = -1
+                if content_length < 0:
+                    # the body can't be found, so neither can the next request
+                    status, response = 400, {"error": "Invalid Content-Length"}
+                    self._write_response(writer, status, response, keep_alive=False)
+                    break
+                if content_length > self._max_request_bytes:
+                    status, response = 413, {"error": "Request body is too large"}
+                    self._write_response(writer, status, response, keep_alive=False)
+                    break
+                body = await reader.readexactly(content_length)
+                status, response = await self._respond(request_line, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, request_line, body):
+        """Return the status code and JSON response of an HTTP request."""
+        try:
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            return 400, {"error": "Malformed request line"}
+        if path == "/metrics":
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            return 200, self._metrics.snapshot()
+        if path != "/score":
+            return 404, {"error": "Unknown path {}".format(path)}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            request = json.loads(body)
+            results = await self.score(request.get("doc_ids", ()), request.get("texts"),
+                                       request.get("filter"))
+        except (ValueError, TypeError, AttributeError) as error:
+            return 400, {"error": "Malformed request: {}".format(error)}
+        except KeyError as error:
+            return 400, {"error": error.args[0]}
+        except Exception as error:
+            return 500, {"error": "Scoring failed: {}".format(error)}
+        return 200, {"results": results}
+
+    @staticmethod
+    def _write_response(writer, status, response, keep_alive=True):
+        """Writes an HTTP response with a JSON body."""
+        body = json.dumps(response).encode("utf-8")
+        writer.write("HTTP/1.1 {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n"
+                     "Connection: {}\r\n\r\n".format(_STATUS_LINES[status], len(body),
+                                                     "keep-alive" if keep_alive else "close")
+                     .encode("latin-1") + body)
+
+
+def serve(topic_model, filter_helpers, **kwargs):
+    """Runs a ScoringServer for topic_model and filter_helpers until interrupted. Keyword
+    arguments are passed to ScoringServer (e.g. host, port, max_batch_size, max_batch_delay)."""
+    server = ScoringServer(topic_model, filter_helpers, **kwargs)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,143 @@
+import concurrent.futures
+import os
+import time
+
+import numpy as np
+
+import inference
+import mallet
+
+# the preprocessed corpus and training options shared by the worker processes of sweep_topic_models
+_worker_corpus = {}
+
+
+def _init_sweep_worker(corpus):
+    """Receives the preprocessed corpus once per worker process."""
+    _worker_corpus.update(corpus)
+
+
+def _train_setting(setting):
+    """Return the outputs of a topic model trained on the worker's corpus with setting (a dict
+    with "num_topics" and backend keyword arguments), and the seconds it took to train."""
+    kwargs = dict(setting)
+    num_topics = kwargs.pop("num_topics")
+    start = time.perf_counter()
+    doc_topic_proportions, topic_wordcounts = mallet.train_topics(
+        _worker_corpus["docs"], _worker_corpus["id_to_word"], _worker_corpus["term_document_frequency"],
+        num_topics, _worker_corpus["backend"], _worker_corpus["path_to_mallet"], **kwargs)
+    return doc_topic_proportions, topic_wordcounts, time.perf_counter() - start
+
+
+def log_likelihood(topic_model, beta=0.01, batch_size=1024):
+    """Return the mean log probability of the tokens of the corpus of topic_model: the log of
+    sum over topics of (document topic proportion * smoothed topic word probability), averaged
+    over all vocabulary tokens. Higher is better; comparable between models of one corpus.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object.
+        beta (float, optional): Dirichlet prior over the words of a topic, used to smooth the
+        topic word probabilities (see inference.topic_word_distributions). Default is 0.01.
+        batch_size (int, optional): number of documents evaluated at once. Default is 1024."""
+    word_topic_dists = inference.topic_word_distributions(topic_model.topic_wordcounts_csr, beta)
+    doc_term_matrix = topic_model.doc_term_matrix[:, :topic_model.n_voc_words]
+    doc_topic_proportions = topic_model.doc_topic_proportions
+    total_log_prob = 0.0
+    for start in range(0, doc_term_matrix.shape[0], batch_size):
+        batch = doc_term_matrix[start:start + batch_size]
+        entry_docs = start + np.repeat(np.arange(batch.shape[0]), np.diff(batch.indptr))
+        token_probs = np.einsum("ij,ij->i", doc_topic_proportions[entry_docs],
+                                word_topic_dists[batch.indices])
+        total_log_prob += np.dot(batch.data, np.log(token_probs))
+    return float(total_log_prob / max(doc_term_matrix.sum(), 1))
+
+
+def umass_coherence(topic_model, n_words=10):
+    """Return the UMass coherence of each topic of topic_model: the mean over pairs of its n_words
+    most frequent words, w_i ranked above w_j, of log((D(w_i, w_j) + 1) / D(w_i)), where D counts
+    the documents containing all given words. Higher (closer to 0) is more coherent.
+    Arguments:
+        topic_model (TopicModel): a TopicModel object.
+        n_words (int, optional): number of top words of each topic. Default is 10.
+    Returns:
+        (numpy.ndarray of float): the coherence of each topic."""
+    topic_wordcounts = topic_model.topic_wordcounts_csr.toarray()
+    n_words = min(n_words, topic_wordcounts.shape[1])
+    top_words = np.argsort(-topic_wordcounts, axis=1, kind="stable")[:, :n_words]
+    words, top_columns = np.unique(top_words, return_inverse=True)
+    top_columns = top_columns.reshape(top_words.shape)
+
+    # document co-occurrence counts of the top words of all topics
+    doc_word_presence = (topic_model.doc_term_matrix[:, words] > 0).astype(np.int64)
+    co_doc_counts = doc_word_presence.T.dot(doc_word_presence).toarray()
+    doc_counts = np.maximum(np.diag(co_doc_counts), 1)
+
+    higher, lower = np.triu_indices(n_words, k=1)
+    pair_scores = np.log((co_doc_counts[top_columns[:, higher], top_columns[:, lower]] + 1) /
+                         doc_counts[top_columns[:, higher]])
+    return pair_scores.mean(axis=1)
+
+
+def sweep_topic_models(corpus_filepath, settings, backend="mallet", processes=None,
+                       remove_stopwords=False, corpus_language="english", doc_topic_dtype=np.float64):
+    """Trains one topic model of the corpus per setting, to choose the number of topics (or other
+    hyperparameters). The corpus is preprocessed once and sent once to each worker process;
+    up to processes models are trained at the same time, so a sweep takes about as long as its
+    slowest models rather than the sum of all of them.
+    Arguments:
+        corpus_filepath (str): filepath to where corpus is stored (directory
+            containing documents or single file).
+        settings (iterable of int or dict): the number of topics of each model, or dictionaries
+            with "num_topics" and keyword arguments of the training backend (see TopicModel),
+            e.g. [10, 20, {"num_topics": 20, "alpha": 5.0}].
+        backend (str, optional): the training backend, one of mallet.TRAINING_BACKENDS.
+            Default is "mallet".
+        processes (int, optional): maximum number of models trained at the same time, each in
+            a worker process. None means one per CPU. 1 trains the models one after another in
+            this process. Default is None.
+        remove_stopwords (bool, optional): Whether to remove stopwords. Default is False.
+        corpus_language (str, optional): Language of the stopwords. Default is "english".
+        doc_topic_dtype (numpy.dtype, optional): the dtype of the doc topic proportions of the
+            models. Default is numpy.float64.
+    Returns:
+        (dict): "models", a list with a dictionary per setting, in the order of settings:
+        "settings" (the setting, as a dict), "model" (the TopicModel), "train_seconds",
+        "log_likelihood" (see log_likelihood) and "coherence" (the mean of umass_coherence);
+        as well as "preprocess_seconds" and "wall_seconds" (the whole sweep).
+    Raises:
+        ValueError: If backend is not one of mallet.TRAINING_BACKENDS."""
+    if backend not in mallet.TRAINING_BACKENDS:
+        raise ValueError("Unknown training backend {}. Choose one of {}.".format(
+            backend, ", ".join(mallet.TRAINING_BACKENDS)))
+    settings = [setting if isinstance(setting, dict) else {"num_topics": setting}
+                for setting in settings]
+    start = time.perf_counter()
+    docs, full_docs, id_to_word, term_document_frequency = mallet.preprocess_corpus(
+        corpus_filepath, remove_stopwords, corpus_language)
+    preprocess_seconds = time.perf_counter() - start
+    corpus = {"docs": docs, "id_to_word": id_to_word,
+              "term_document_frequency": term_document_frequency, "backend": backend,
+              "path_to_mallet": mallet.find_mallet() if backend == "mallet" else None}
+
+    if processes is None:
+        processes = os.cpu_count()
+    processes = max(1, min(processes, len(settings)))
+    if processes == 1:
+        _init_sweep_worker(corpus)
+        try:
+            outputs = [_train_setting(setting) for setting in settings]
+        finally:
+            _worker_corpus.clear()
+    else:
+        # a process pool whose workers may start their own processes, like gensim's LdaMulticore
+        with concurrent.futures.ProcessPoolExecutor(processes, initializer=_init_sweep_worker,
+                                                    initargs=(corpus,)) as executor:
+            outputs = list(executor.map(_train_setting, settings))
+
+    models = []
+    for setting, (doc_topic_proportions, topic_wordcounts, train_seconds) in zip(settings, outputs):
+        topic_model = mallet.TopicModel.from_topics(docs, full_docs, doc_topic_proportions,
+                                                    topic_wordcounts, doc_topic_dtype)
+        models.append({"settings": setting, "model": topic_model, "train_seconds": train_seconds,
+                       "log_likelihood": log_likelihood(topic_model),
+                       "coherence": float(umass_coherence(topic_model).mean())})
+    return {"models": models, "preprocess_seconds": preprocess_seconds,
+            "wall_seconds": time.perf_counter() - start}
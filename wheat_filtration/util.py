@@ -1,6 +1,58 @@
 import subprocess
 
+import numpy as np
+
 
 def call_command_line(string, **kwargs):
     """Executes string as a command line prompt. stdout and stderr are keyword args."""
     return subprocess.run(string.split(" "), **kwargs)
+
+
+def count_lines(filepath, chunk_size=2**24):
+    """Returns the number of lines in the file at filepath, reading it in binary chunks of chunk_size bytes."""
+    n_lines = 0
+    last_chunk = b"\n"
+    with open(filepath, "rb") as in_file:
+        chunk = in_file.read(chunk_size)
+        while chunk:
+            n_lines += chunk.count(b"\n")
+            last_chunk = chunk
+            chunk = in_file.read(chunk_size)
+    # count a last line without a newline
+    if not last_chunk.endswith(b"\n"):
+        n_lines += 1
+    return n_lines
+
+
+def stream_command_line(string):
+    """Executes string as a command line prompt and yields the lines of its stdout as they are written.
+    Raises:
+        subprocess.CalledProcessError: if the command exits with a non-zero status, once its
+        output has been read."""
+    with subprocess.Popen(string.split(" "), stdout=subprocess.PIPE, universal_newlines=True) as process:
+        for line in process.stdout:
+            yield line
+        return_code = process.wait()
+    if return_code != 0:
+        raise subprocess.CalledProcessError(return_code, string)
+
+
+def iter_doctopic_chunks(mallet_doctopic_filepath, dtype=np.float64, chunk_size=2**24):
+    """Yields the rows of a Mallet doc topics file in chunks of about chunk_size bytes.
+    Each line of the file is "<index> <doc_id> <proportion> <proportion> ...".
+    Arguments:
+        mallet_doctopic_filepath (str): the filepath of the Mallet doc topics file.
+        dtype (numpy dtype, optional): dtype of the proportions. Default is numpy.float64.
+        chunk_size (int, optional): number of bytes of lines to read at a time. Default is 2**24.
+    Yields:
+        doc_ids (list of str): the unique IDs of the documents in the chunk.
+        doc_topic_proportions (numpy.ndarray): the topic proportions of each document in the chunk.
+            Shape: (number of documents in the chunk, number of topics)"""
+    with open(mallet_doctopic_filepath, "r") as in_file:
+        lines = in_file.readlines(chunk_size)
+        while lines:
+            index_id_props = [line.split(None, 2) for line in lines]
+            topic_props = np.fromstring(" ".join(props for _, _, props in index_id_props),
+                                        dtype=dtype, sep=" ")
+            yield [doc_id for _, doc_id, _ in index_id_props], topic_props.reshape(len(lines), -1)
+            lines = in_file.readlines(chunk_size)